@@ -1,3 +1,4 @@
+import mysql.connector
 import streamlit as st
 from src.config.settings import CUSTOM_STYLES
 
@@ -46,5 +47,8 @@ def main():
             BacktestBuilder(portfolio_manager, backtest_manager).display()
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except mysql.connector.Error as e:
+        st.error("Database error: " + str(e))
 
@@ -0,0 +1,169 @@
+"""EXPLAIN every SELECT the services issue against a seeded database and flag full table scans.
+
+    python -m benchmarks.explain_queries
+
+Uses the same scratch MySQL server as benchmarks.run (BENCHMARK_MYSQL_HOST and friends); the
+benchmark database is recreated from schema.sql and seeded with synthetic users, portfolios and
+prices. Queries are captured by running the service methods themselves, so a new or edited query
+is checked without being listed here. Exits non-zero if any query reads a whole table.
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from benchmarks.run import PORTFOLIO_NAME, SyntheticPortfolioManager, benchmark_connection, connection_pool, fixture_provider, reset_database
+from benchmarks.synthetic_data import synthetic_ohlcv, ticker_names
+from src.services.backtest_service import SIGNAL_FACTORS, BacktestManager
+from src.services.live_statistics import LiveStatistics
+from src.services.market_data_refresh import MarketDataRefresher
+from src.services.portfolio_summary import portfolio_summaries
+from src.services.simulation_inputs import simulation_inputs
+
+# Access types that read every row of a table or every entry of an index
+FULL_SCANS = {'ALL': 'full table scan', 'index': 'full index scan'}
+
+
+class ExplainingCursor:
+    """Wraps a cursor, running EXPLAIN on each SELECT before executing it."""
+    def __init__(self, cursor, explain_cursor, plans):
+        self._cursor = cursor
+        self._explain_cursor = explain_cursor
+        self._plans = plans
+
+    def execute(self, query, params=()):
+        if query.lstrip().upper().startswith('SELECT'):
+            self._explain_cursor.execute('EXPLAIN ' + query, params)
+            self._plans.append((' '.join(query.split()), self._explain_cursor.fetchall()))
+        return self._cursor.execute(query, params)
+
+    def close(self):
+        self._explain_cursor.close()
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class ExplainingConnection:
+    """Wraps a connection so every cursor it opens is an ExplainingCursor."""
+    def __init__(self, connection, plans):
+        self._connection = connection
+        self._plans = plans
+
+    def cursor(self, **kwargs):
+        return ExplainingCursor(self._connection.cursor(**kwargs), self._connection.cursor(dictionary=True, buffered=True), self._plans)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+def seed(connection, users, portfolios_per_user, tickers, years):
+    """Fill the benchmark database; returns the user_id whose queries are explained."""
+    stock_data = synthetic_ohlcv(tickers, years)
+    names = ticker_names(tickers)
+    user_ids = [reset_database(connection)]
+    cursor = connection.cursor()
+    for user in range(1, users):
+        cursor.execute("INSERT INTO User (username, password, email, last_login) VALUES (%s, '', %s, NOW())",
+                       (f'user{user}', f'user{user}@example.com'))
+        user_ids.append(cursor.lastrowid)
+    connection.commit()
+
+    with fixture_provider(stock_data) as provider:
+        for i, user_id in enumerate(user_ids):
+            portfolio_manager = SyntheticPortfolioManager(connection, user_id, provider)
+            for portfolio in range(portfolios_per_user):
+                portfolio_name = PORTFOLIO_NAME if portfolio == 0 else f'{PORTFOLIO_NAME} {portfolio}'
+                portfolio_manager.add_portfolio(portfolio_name)
+                # Overlapping slices of the ticker universe, so tickers are shared between portfolios
+                start = (i * portfolios_per_user + portfolio) * 3 % tickers
+                for stock_name in (names[start:] + names[:start])[:10]:
+                    portfolio_manager.add_stock_to_portfolio(portfolio_name, stock_name)
+    return user_ids[0]
+
+
+def explain_service_queries(connection, user_id):
+    """(query, EXPLAIN rows) for every SELECT the hot service methods run."""
+    plans = []
+    pool = connection_pool(ExplainingConnection(connection, plans))
+
+    portfolio_manager = SyntheticPortfolioManager(connection, user_id, None)
+    portfolio_manager.pool = pool
+    portfolio_id = portfolio_manager.get_portfolio_id(PORTFOLIO_NAME)
+    # Drop any cached summaries so the summary query itself runs
+    portfolio_summaries.clear()
+    portfolio_manager.fetch_portfolio_summaries()
+    portfolio_manager.fetch_all_stocks(portfolio_id)
+    portfolio_manager.last_price_dates(portfolio_manager.fetch_all_stocks(portfolio_id))
+    # A week ahead, so every seeded ticker is due for a refresh
+    MarketDataRefresher(portfolio_manager).due_tickers(datetime.now().date() + timedelta(days=7))
+
+    backtest_manager = BacktestManager.__new__(BacktestManager)
+    backtest_manager.pool = pool
+    backtest_manager.user_id = user_id
+    simulation_inputs.clear()
+    backtest_manager.get_simulation_data(PORTFOLIO_NAME)
+    start_date = datetime.now().date() - timedelta(days=90)
+    backtest_manager.get_simulation_data(PORTFOLIO_NAME, backtest_manager.warm_up_start(start_date, SIGNAL_FACTORS), datetime.now().date())
+    backtest_manager.get_all_simulation_data()
+
+    stats = LiveStatistics.__new__(LiveStatistics)
+    stats.pool = pool
+    stats.count_all_portfolios()
+    stats.count_all_stocks()
+
+    # The same statement run twice (with different parameters) is reported once
+    return list({query: rows for query, rows in plans}.items())
+
+
+def full_scans(plans, allow=()):
+    """(query, table, access type) for plan rows that read a whole table.
+
+    Derived tables and allowed tables are skipped. A full index scan is only flagged when the
+    query filters rows; an unfiltered aggregate such as COUNT(*) reads every entry by design.
+    """
+    flagged = []
+    for query, rows in plans:
+        filtered = ' WHERE ' in query.upper()
+        for row in rows:
+            table = row.get('table') or ''
+            if table.startswith('<') or table in allow:
+                continue
+            if row.get('type') == 'ALL' or (row.get('type') == 'index' and filtered):
+                flagged.append((query, table, row['type']))
+    return flagged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--portfolios-per-user', type=int, default=3)
+    parser.add_argument('--tickers', type=int, default=100)
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--allow', nargs='*', default=[], help="Tables allowed to be scanned in full.")
+    args = parser.parse_args(argv)
+
+    connection = benchmark_connection()
+    if connection is None:
+        print("No MySQL server; set BENCHMARK_MYSQL_HOST to a scratch server.", file=sys.stderr)
+        return 2
+    try:
+        user_id = seed(connection, args.users, args.portfolios_per_user, args.tickers, args.years)
+        plans = explain_service_queries(connection, user_id)
+    finally:
+        connection.close()
+
+    for query, rows in plans:
+        print(query[:120] + ('...' if len(query) > 120 else ''))
+        for row in rows:
+            print(f"    {row.get('table') or '-':<20} {row.get('type') or '-':<8} key={row.get('key') or '-':<28} rows={row.get('rows') or '-':<8} {row.get('Extra') or ''}")
+
+    flagged = full_scans(plans, args.allow)
+    for query, table, access_type in flagged:
+        print(f"FULL SCAN {table} ({FULL_SCANS[access_type]}): {query[:100]}", file=sys.stderr)
+    print(f"{len(plans)} queries explained, {len(flagged)} full scan(s).")
+    return 1 if flagged else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,345 @@
+"""Benchmarks for the backtest and ingestion hot paths.
+
+    python -m benchmarks.run --suite standard --save-baseline
+    python -m benchmarks.run --suite standard --check --tolerance 0.25
+
+The database benchmarks need a MySQL server the suite may wipe: set BENCHMARK_MYSQL_HOST
+(and optionally BENCHMARK_MYSQL_PORT, BENCHMARK_MYSQL_USER, BENCHMARK_MYSQL_PASSWORD,
+BENCHMARK_MYSQL_DATABASE). The benchmark database is dropped and recreated on every run.
+Without a server those benchmarks are reported as skipped.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic_data import START_DATE, as_yfinance_history, synthetic_ohlcv, ticker_names
+from src.config.settings import BACKTEST_WORKERS
+from src.database.connection import ConnectionPool
+from src.database.migrate import initialize
+from src.services.backtest_service import SIGNAL_FACTORS, BacktestManager
+from src.services.indicator_cache import indicator_cache
+from src.services.market_data import LocalFileProvider
+from src.services.price_cache import BAR_DTYPE, PriceCache, decode_rows, history_frames
+from src.services.portfolio_service import PortfolioManager
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+
+# Dataset sizes per suite; ingestion runs on its own, smaller ticker count
+SUITES = {
+    'quick': {'tickers': 5, 'years': 2, 'ingestion_tickers': 2, 'repeats': 3},
+    'standard': {'tickers': 50, 'years': 5, 'ingestion_tickers': 5, 'repeats': 5},
+    'full': {'tickers': 500, 'years': 20, 'ingestion_tickers': 20, 'repeats': 3},
+}
+PORTFOLIO_NAME = 'Benchmark'
+# Portfolios compared by the simulate_all benchmarks
+SIMULATE_ALL_PORTFOLIOS = 8
+
+
+class SyntheticBacktestManager(BacktestManager):
+    """Serves synthetic rows in place of the database so the simulation is timed on its own."""
+    def __init__(self, stock_data):
+        self.user_id = None
+        self.stock_data = stock_data
+
+    def get_simulation_data(self, portfolio_name, start_date=None, end_date=None):
+        # The same range the SQL query would apply
+        sim_data = self.stock_data[self.stock_data['transaction_date'].between(start_date or date.min, end_date or date.max)].copy()
+        historical_data_list = [group[1] for group in sim_data.groupby('stock_name')]
+        sim_data.sort_values(by='transaction_date', inplace=True)
+        return historical_data_list, sim_data
+
+
+    def get_all_simulation_data(self, start_date=None, end_date=None):
+        # Overlapping ten-ticker slices of the universe, so tickers are shared between portfolios
+        sim_data = self.stock_data[self.stock_data['transaction_date'].between(start_date or date.min, end_date or date.max)]
+        ticker_data = dict(list(sim_data.groupby('stock_name')))
+        names = sorted(ticker_data)
+        portfolio_tickers = {f'{PORTFOLIO_NAME} {portfolio}': (names[portfolio * 3 % len(names):] + names[:portfolio * 3 % len(names)])[:10]
+                             for portfolio in range(SIMULATE_ALL_PORTFOLIOS)}
+        return portfolio_tickers, ticker_data
+
+
+class SyntheticPortfolioManager(PortfolioManager):
+    """Ingests synthetic histories from local fixture files in place of yfinance downloads."""
+    def __init__(self, connection, user_id, provider):
+        self.pool = connection_pool(connection)
+        self.user_id = user_id
+        self.provider = provider
+
+    def get_stock_data(self, stock_name, start_date=START_DATE, end_date=None):
+        return super().get_stock_data(stock_name, start_date, end_date)
+
+
+@contextlib.contextmanager
+def fixture_provider(stock_data):
+    """A LocalFileProvider over a temporary directory holding one Parquet fixture per synthetic ticker."""
+    with tempfile.TemporaryDirectory() as directory:
+        provider = LocalFileProvider(directory)
+        for stock_name, group in stock_data.groupby('stock_name'):
+            provider.save(stock_name, as_yfinance_history(group))
+        yield provider
+
+
+def time_call(function, repeats, setup=None):
+    """Run function repeats times after one warm-up call, returning wall-clock seconds per run."""
+    timings = []
+    for run in range(repeats + 1):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        if run:
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(timings, params):
+    return {
+        'median_s': statistics.median(timings),
+        'min_s': min(timings),
+        'max_s': max(timings),
+        'repeats': len(timings),
+        'params': params,
+    }
+
+
+def bench_signals(stock_data, repeats):
+    historical_data_list = [group for _, group in stock_data.groupby('stock_name')]
+
+    def run():
+        for historical_data in historical_data_list:
+            BacktestManager.generate_signals(historical_data, SIGNAL_FACTORS)
+    return time_call(run, repeats, setup=indicator_cache.clear)
+
+
+def bench_simulation(stock_data, repeats, warm=False):
+    manager = SyntheticBacktestManager(stock_data)
+    run = lambda: manager.simulate_trading(PORTFOLIO_NAME, 10000.00, None, None, SIGNAL_FACTORS)
+    # Cold runs recompute every indicator; warm runs are served from the indicator cache
+    return time_call(run, repeats, setup=None if warm else indicator_cache.clear)
+
+
+def bench_simulate_all(stock_data, repeats, max_workers):
+    """Compare every synthetic portfolio, with the trading runs in max_workers worker processes (1 runs them inline)."""
+    manager = SyntheticBacktestManager(stock_data)
+    run = lambda: manager.simulate_all_portfolios(10000.00, None, None, SIGNAL_FACTORS, max_workers=max_workers)
+    # Signals come from the indicator cache, as on every click after the first; the warm-up run also starts the worker pool
+    return time_call(run, repeats)
+
+
+def connection_pool(connection):
+    """A pool that always lends the benchmark's own connection."""
+    return ConnectionPool(lambda: connection, size=1)
+
+
+def bench_cache_load(stock_data, repeats):
+    """Build the per-ticker frames of a portfolio from current price cache files, as get_simulation_data does on a hit."""
+    with tempfile.TemporaryDirectory() as directory:
+        cache, last_dates = PriceCache(directory), {}
+        for stock_name, group in stock_data.groupby('stock_name'):
+            bars = np.zeros(len(group), dtype=BAR_DTYPE)
+            for field in BAR_DTYPE.names:
+                bars[field] = group[field].to_numpy()
+            cache.store(stock_name, bars)
+            last_dates[stock_name] = group['transaction_date'].iloc[-1]
+        # Every file is current, so no query is issued and no cursor is needed
+        return time_call(lambda: history_frames(cache.bars(None, last_dates)), repeats)
+
+
+def bench_price_decode(stock_data, repeats):
+    """Decode a portfolio's price rows as a raw cursor returns them, the work of a price cache miss after the query."""
+    rows = [tuple(str(value).encode() for value in row) for row in stock_data.itertuples(index=False, name=None)]
+    return time_call(lambda: decode_rows(rows), repeats)
+
+
+def bench_ingest_prepare(stock_data, repeats):
+    """Read every ticker's fixture in one batch and build its StockPrice rows, the work of an ingestion before the INSERTs."""
+    with fixture_provider(stock_data) as provider:
+        stock_names = stock_data['stock_name'].unique().tolist()
+
+        def prepare():
+            for stock_name, history in provider.history(stock_names, START_DATE).items():
+                PortfolioManager.price_rows(stock_name, history)
+        return time_call(prepare, repeats)
+
+
+def benchmark_connection(database=None):
+    if not os.environ.get('BENCHMARK_MYSQL_HOST'):
+        return None
+    import mysql.connector
+    try:
+        return mysql.connector.connect(
+            host=os.environ['BENCHMARK_MYSQL_HOST'],
+            port=int(os.environ.get('BENCHMARK_MYSQL_PORT', 3306)),
+            user=os.environ.get('BENCHMARK_MYSQL_USER', 'root'),
+            password=os.environ.get('BENCHMARK_MYSQL_PASSWORD', ''),
+            database=database,
+            # Pooled connections run in autocommit mode, as in the app
+            autocommit=True,
+        )
+    except mysql.connector.Error as e:
+        print(f"MySQL unavailable, skipping database benchmarks: {e}", file=sys.stderr)
+        return None
+
+
+def reset_database(connection):
+    """Recreate the benchmark database as a new install and add one user; returns its user_id."""
+    database = os.environ.get('BENCHMARK_MYSQL_DATABASE', 'backtestdb_benchmark')
+    cursor = connection.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+    cursor.execute(f"CREATE DATABASE `{database}`")
+    cursor.execute(f"USE `{database}`")
+    initialize(connection)
+    cursor.execute("INSERT INTO User (username, password, email, last_login) VALUES ('benchmark', '', 'benchmark@example.com', NOW())")
+    connection.commit()
+    return cursor.lastrowid
+
+
+def ingest(connection, user_id, provider, stock_names):
+    portfolio_manager = SyntheticPortfolioManager(connection, user_id, provider)
+    portfolio_manager.add_portfolio(PORTFOLIO_NAME)
+    for success, message in portfolio_manager.add_stocks_to_portfolio(PORTFOLIO_NAME, list(stock_names)).values():
+        if not success:
+            raise RuntimeError(message)
+
+
+def bench_db_load(connection, stock_data, repeats):
+    user_id = reset_database(connection)
+    with fixture_provider(stock_data) as provider:
+        ingest(connection, user_id, provider, stock_data['stock_name'].unique())
+    manager = BacktestManager.__new__(BacktestManager)
+    manager.pool = connection_pool(connection)
+    manager.user_id = user_id
+    return time_call(lambda: manager.get_simulation_data(PORTFOLIO_NAME), repeats)
+
+
+def bench_ingestion(connection, stock_data, repeats):
+    state = {}
+
+    def setup():
+        state['user_id'] = reset_database(connection)
+    with fixture_provider(stock_data) as provider:
+        stock_names = stock_data['stock_name'].unique()
+        return time_call(lambda: ingest(connection, state['user_id'], provider, stock_names), repeats, setup=setup)
+
+
+def run_suite(tickers, years, ingestion_tickers, repeats, only=None, seed=0):
+    stock_data = synthetic_ohlcv(tickers, years, seed)
+    ingestion_data = stock_data[stock_data['stock_name'].isin(ticker_names(ingestion_tickers))]
+    params = {'tickers': tickers, 'years': years, 'rows': len(stock_data), 'seed': seed}
+    ingestion_params = dict(params, tickers=ingestion_tickers, rows=len(ingestion_data))
+
+    benchmarks = {
+        'signals': (lambda: bench_signals(stock_data, repeats), params),
+        'simulation_cold': (lambda: bench_simulation(stock_data, repeats), params),
+        'simulation_warm': (lambda: bench_simulation(stock_data, repeats, warm=True), params),
+        'simulate_all_inline': (lambda: bench_simulate_all(stock_data, repeats, 1), params),
+        'simulate_all_workers': (lambda: bench_simulate_all(stock_data, repeats, BACKTEST_WORKERS), dict(params, workers=BACKTEST_WORKERS)),
+        'cache_load': (lambda: bench_cache_load(stock_data, repeats), params),
+        'price_decode': (lambda: bench_price_decode(stock_data, repeats), params),
+        'ingest_prepare': (lambda: bench_ingest_prepare(ingestion_data, repeats), ingestion_params),
+        'db_load': (lambda connection: bench_db_load(connection, stock_data, repeats), params),
+        'ingestion': (lambda connection: bench_ingestion(connection, ingestion_data, repeats), ingestion_params),
+    }
+    database_benchmarks = {'db_load', 'ingestion'}
+    selected = [name for name in benchmarks if not only or name in only]
+
+    connection = benchmark_connection() if database_benchmarks & set(selected) else None
+    results, skipped = {}, []
+    try:
+        for name in selected:
+            bench, bench_params = benchmarks[name]
+            if name in database_benchmarks:
+                if connection is None:
+                    skipped.append(name)
+                    continue
+                timings = bench(connection)
+            else:
+                timings = bench()
+            results[name] = summarize(timings, bench_params)
+            print(f"{name:<18} median {results[name]['median_s'] * 1000:10.1f} ms   min {results[name]['min_s'] * 1000:10.1f} ms")
+    finally:
+        if connection is not None:
+            connection.close()
+    for name in skipped:
+        print(f"{name:<18} skipped (no MySQL; set BENCHMARK_MYSQL_HOST)")
+
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'cpus': os.cpu_count(),
+        },
+        'benchmarks': results,
+        'skipped': skipped,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Benchmarks whose median is more than tolerance slower than the baseline run on the same parameters."""
+    regressions = []
+    for name, result in results['benchmarks'].items():
+        reference = baseline.get('benchmarks', {}).get(name)
+        if reference is None or reference['params'] != result['params']:
+            continue
+        ratio = result['median_s'] / reference['median_s']
+        if ratio > 1 + tolerance:
+            regressions.append((name, reference['median_s'], result['median_s'], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--suite', choices=SUITES, default='standard')
+    parser.add_argument('--tickers', type=int, help="Override the suite's ticker count (1-500).")
+    parser.add_argument('--years', type=int, help="Override the suite's years of history (1-20).")
+    parser.add_argument('--repeats', type=int, help="Timed runs per benchmark, after one warm-up run.")
+    parser.add_argument('--only', nargs='+', help="Run only these benchmarks.")
+    parser.add_argument('--output', help="Write this run's results to a JSON file.")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline JSON to save to or check against.")
+    parser.add_argument('--save-baseline', action='store_true', help="Save this run as the baseline.")
+    parser.add_argument('--check', action='store_true', help="Exit non-zero if any benchmark regressed past the tolerance.")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed slowdown before --check fails (0.25 = 25%%).")
+    args = parser.parse_args(argv)
+
+    suite = SUITES[args.suite]
+    results = run_suite(args.tickers or suite['tickers'], args.years or suite['years'],
+                        min(suite['ingestion_tickers'], args.tickers or suite['ingestion_tickers']),
+                        args.repeats or suite['repeats'], args.only)
+
+    for path in filter(None, [args.output, args.baseline if args.save_baseline else None]):
+        with open(path, 'w') as results_file:
+            json.dump(results, results_file, indent=2)
+        print(f"Results written to {path}")
+
+    if args.check:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}; run with --save-baseline first.", file=sys.stderr)
+            return 2
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        for name, reference, current, ratio in regressions:
+            print(f"REGRESSION {name}: {reference * 1000:.1f} ms -> {current * 1000:.1f} ms ({ratio:.2f}x)", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%}.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
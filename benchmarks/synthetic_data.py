@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+MAX_TICKERS = 500
+MAX_YEARS = 20
+TRADING_DAYS_PER_YEAR = 252
+# Before HISTORY_START, so requests for synthetic history must name their start date
+START_DATE = '2004-01-02'
+
+STOCK_DATA_COLUMNS = ['stock_name', 'transaction_date', 'open_price', 'high_price', 'low_price', 'closing_price', 'volume', 'dividends', 'stock_splits']
+
+
+def ticker_names(n_tickers):
+    return [f'SYN{i:03d}' for i in range(n_tickers)]
+
+
+def synthetic_ohlcv(n_tickers=10, years=5, seed=0, start_date=START_DATE):
+    """Deterministic daily OHLCV bars in the StockData column layout, one block of rows per ticker.
+
+    Closes follow a geometric random walk with a per-ticker drift and volatility, so the
+    same (n_tickers, years, seed) always produces the same frame.
+    """
+    if not 1 <= n_tickers <= MAX_TICKERS:
+        raise ValueError(f"n_tickers must be between 1 and {MAX_TICKERS}, got {n_tickers}.")
+    if not 1 <= years <= MAX_YEARS:
+        raise ValueError(f"years must be between 1 and {MAX_YEARS}, got {years}.")
+
+    rng = np.random.default_rng(seed)
+    n_days = int(years * TRADING_DAYS_PER_YEAR)
+    dates = pd.bdate_range(start_date, periods=n_days).date
+
+    drift = rng.normal(0.0003, 0.0002, n_tickers)
+    volatility = rng.uniform(0.01, 0.03, n_tickers)
+    first_close = rng.uniform(10, 500, n_tickers)
+    log_returns = rng.normal(drift, volatility, (n_days, n_tickers))
+    close = first_close * np.exp(np.cumsum(log_returns, axis=0))
+    open_ = close * np.exp(rng.normal(0, volatility / 2, (n_days, n_tickers)))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, volatility / 2, (n_days, n_tickers))))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, volatility / 2, (n_days, n_tickers))))
+    volume = rng.integers(100_000, 10_000_000, (n_days, n_tickers))
+    # Roughly quarterly dividends on a third of the tickers
+    dividends = np.where((rng.random((n_days, n_tickers)) < 1 / 63) & (np.arange(n_tickers) % 3 == 0), np.round(close * 0.005, 2), 0.0)
+
+    # Ticker-major order, the way rows arrive when a portfolio is loaded stock by stock
+    return pd.DataFrame({
+        'stock_name': np.repeat(ticker_names(n_tickers), n_days),
+        'transaction_date': np.tile(dates, n_tickers),
+        'open_price': np.round(open_.T.ravel(), 2),
+        'high_price': np.round(high.T.ravel(), 2),
+        'low_price': np.round(low.T.ravel(), 2),
+        'closing_price': np.round(close.T.ravel(), 2),
+        'volume': volume.T.ravel(),
+        'dividends': dividends.T.ravel(),
+        'stock_splits': 0,
+    }, columns=STOCK_DATA_COLUMNS)
+
+
+def as_yfinance_history(stock_data):
+    """One ticker's synthetic rows in the shape yfinance's Ticker.history returns."""
+    return pd.DataFrame({
+        'Open': stock_data['open_price'].to_numpy(),
+        'High': stock_data['high_price'].to_numpy(),
+        'Low': stock_data['low_price'].to_numpy(),
+        'Close': stock_data['closing_price'].to_numpy(),
+        'Volume': stock_data['volume'].to_numpy(),
+        'Dividends': stock_data['dividends'].to_numpy(),
+        'Stock Splits': stock_data['stock_splits'].to_numpy(dtype=float),
+    }, index=pd.DatetimeIndex(pd.to_datetime(stock_data['transaction_date']), name='Date'))
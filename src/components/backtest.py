@@ -2,6 +2,15 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 from datetime import datetime
+from src.config.settings import PROFILE_SIMULATIONS
+from src.database.connection import pool_stats
+from src.services.backtest_service import SIGNAL_FACTORS
+from src.services.indicator_cache import indicator_cache
+from src.services.portfolio_summary import portfolio_summaries
+from src.services.simulation_inputs import simulation_inputs
+from src.utils.profiling import SimulationProfiler
+
+TRADE_LOG_PAGE_SIZE = 500
 
 class BacktestBuilder:
     def __init__(self, portfolio_manager, backtest_manager):
@@ -10,42 +19,110 @@ class BacktestBuilder:
         self.initial_fund = 0 
 
     def display(self):
-        portfolio_names = self.portfolio_manager.fetch_portfolio_names()  # Fetch portfolio names
+        if st.query_params.get('profile') == '1':
+            st.session_state['profile_simulations'] = True
+        summaries = {summary.portfolio_name: summary for summary in self.portfolio_manager.fetch_portfolio_summaries()}
+        portfolio_names = list(summaries)
 
         self.initial_fund = st.number_input("Enter initial investment amount:", value=10000.00, format="%.2f", step=100.00)
         if portfolio_names:
             portfolio_name = st.selectbox("Select a portfolio to simulate:", portfolio_names)
 
-            signal_factors = ['Relative Strength Index (RSI)', 'Moving Average Convergence/Divergence (MACD)', 'Bollinger Bands', 'Moving Average',
-                            'Daily Return', 'Volatility', 'Exponential Moving Average (EMA)',  'Log Return']
-            
             selected_factors = st.multiselect(
             "Select technical indicators to use:", 
-            signal_factors, 
-            default=signal_factors,
+            SIGNAL_FACTORS, 
+            default=SIGNAL_FACTORS,
             help="Choose one or more indicators to generate buy and sell actions based on historical data."
             )
 
             start_date = st.date_input("Start Date", value=pd.to_datetime('2020-01-01').date(), min_value=pd.to_datetime("2020-01-01").date(), max_value=datetime.now().date())
             end_date = st.date_input("End Date", value=datetime.now().date(), min_value=pd.to_datetime("2020-01-01").date(), max_value=datetime.now().date())
-            if st.button("Simulate"):
-                historical_data_list = self.backtest_manager.get_simulation_data(portfolio_name)
+            col1, col2 = st.columns([1, 4])
+            simulate_clicked = col1.button("Simulate")
+            simulate_all_clicked = col2.button("Simulate All Portfolios", help="Run the same settings over every portfolio and compare them.")
+            if simulate_all_clicked:
+                with st.spinner('Simulating all portfolios...'):
+                    comparison, daily_values_df = self.backtest_manager.simulate_all_portfolios(self.initial_fund, start_date, end_date, selected_factors)
+                if comparison.empty:
+                    st.error("None of your portfolios have stock prices in the selected range. Please add stocks or widen the dates before simulation.")
+                else:
+                    self.display_comparison(comparison, daily_values_df)
+            elif simulate_clicked:
+                stocks = summaries[portfolio_name].stocks
 
-                if not historical_data_list:  # Check if the list is empty
+                if not stocks:  # Check if the portfolio is empty
                     st.error("The selected portfolio has no stocks. Please add stocks to the portfolio before simulation.")
                 else:
-                    results, actions, daily_values_df = self.backtest_manager.simulate_trading(portfolio_name, self.initial_fund, start_date, end_date, selected_factors)
+                    st.session_state.pop('backtest_result', None)
+                    result = self.stream_results(portfolio_name, start_date, end_date, selected_factors)
+                    # Kept so paging through the trade log does not rerun the simulation
+                    st.session_state['backtest_result'] = (portfolio_name, result)
+            elif st.session_state.get('backtest_result', (None,))[0] == portfolio_name:
+                self.display_results(st.session_state['backtest_result'][1])
 
-                    # Visualization and metrics display
-                    self.display_results(results, actions, daily_values_df)
+            with st.expander("Robustness Test"):
+                col1, col2 = st.columns(2)
+                n_paths = col1.number_input("Synthetic paths", min_value=100, max_value=10000, value=1000, step=100)
+                block_size = col2.number_input("Block size (days)", min_value=1, max_value=252, value=20, step=1,
+                                               help="Daily returns are resampled in blocks of this many days to keep short-term autocorrelation.")
+                if st.button("Run Robustness Test"):
+                    with st.spinner(f'Simulating {n_paths:,} paths...'):
+                        robustness = self.backtest_manager.robustness_test(portfolio_name, n_paths, block_size, self.initial_fund,
+                                                                           start_date, end_date, selected_factors)
+                    if robustness.empty:
+                        st.error("The selected portfolio has too little data in this date range for a robustness test.")
+                    else:
+                        self.display_robustness(robustness)
+
+            if self.profiling_enabled():
+                self.display_profile()
 
         else:
             st.write("No portfolios available for simulation.")
 
-    def display_results(self, results, actions, daily_values_df):
-        # Visualization using Plotly
+    def profiling_enabled(self):
+        return PROFILE_SIMULATIONS or st.session_state.get('profile_simulations', False)
+
+    def stream_results(self, portfolio_name, start_date, end_date, selected_factors):
+        if not self.profiling_enabled():
+            return self.run_stream(portfolio_name, start_date, end_date, selected_factors)
+
+        profiler = SimulationProfiler()
+        self.backtest_manager.profiler = profiler
+        try:
+            with profiler:
+                return self.run_stream(portfolio_name, start_date, end_date, selected_factors)
+        finally:
+            self.backtest_manager.profiler = None
+            st.session_state['simulation_profile'] = profiler
+
+    def run_stream(self, portfolio_name, start_date, end_date, selected_factors):
+        progress_bar = st.progress(0.0, text="Starting simulation...")
+        # Clicking Cancel reruns the script, which stops the simulation in progress
+        cancel_button = st.empty()
+        cancel_button.button("Cancel", key="cancel_simulation")
+        chart = st.empty()
+        running_metric = st.empty()
+
+        for progress in self.backtest_manager.stream_simulation(portfolio_name, self.initial_fund, start_date, end_date, selected_factors):
+            with self.backtest_manager.stage("Render progress"):
+                progress_bar.progress(progress.fraction, text=progress.stage)
+                # The final step is drawn by display_results
+                if not progress.done and progress.values is not None and len(progress.values):
+                    chart.plotly_chart(self.value_figure(progress.dates, progress.values))
+                    running_value = progress.values[-1]
+                    running_metric.metric(f"Portfolio Value on {progress.dates[-1]}", f"${running_value:,.2f}", f"{running_value - self.initial_fund:+,.2f}")
+
+        progress_bar.empty()
+        cancel_button.empty()
+        running_metric.empty()
+        with self.backtest_manager.stage("Render results"):
+            self.display_results(progress.result, chart)
+        return progress.result
+
+    def value_figure(self, dates, values):
         fig = go.Figure()
-        fig.add_trace(go.Scatter(x=daily_values_df.index, y=daily_values_df['Portfolio Value'],
+        fig.add_trace(go.Scatter(x=dates, y=values,
                                  mode='lines',
                                  name='Portfolio Value',
                                  hoverinfo='x+y',
@@ -54,23 +131,114 @@ class BacktestBuilder:
                           xaxis_title='Date',
                           yaxis_title='Portfolio Value',
                           legend_title='Metric')
-        st.plotly_chart(fig)
+        return fig
+
+    def display_results(self, result, chart=None):
+        # Visualization using Plotly
+        (chart or st).plotly_chart(self.value_figure(result.dates, result.daily_values))
 
         # Metrics display
-        final_portfolio_value_str = results[0].split(": $")[1].replace(',', '')
-        final_portfolio_value = float(final_portfolio_value_str)
-        delta_value = final_portfolio_value - self.initial_fund
-        delta_percentage = (delta_value / self.initial_fund) * 100
+        delta_value = result.final_portfolio_value - result.initial_fund
+        delta_percentage = (delta_value / result.initial_fund) * 100
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Final Portfolio Value", f"${result.final_portfolio_value:,.2f}", f"{delta_value:+,.2f} ({delta_percentage:+.2f}%)")
+        col2.metric("Annualized Return", f"{result.annualized_return * 100:.2f}%")
+        col3.metric("Sharpe Ratio", f"{result.sharpe_ratio:.2f}")
+
+        money = st.column_config.NumberColumn(format="$%.2f")
+        if len(result.holding_tickers):
+            st.write("**Final Holdings**")
+            st.dataframe(result.holdings_df, hide_index=True, use_container_width=True,
+                         column_config={'Price': money, 'Value': money})
+
+        self.display_trade_log(result.trades, money)
+
+    def display_trade_log(self, trades, money):
+        st.write(f"**Trades** ({len(trades):,})")
+        if not len(trades):
+            st.write("*No trades were made*")
+            return
+
+        # Only one page of the ledger is turned into a frame; st.dataframe virtualizes its rows
+        pages = -(-len(trades) // TRADE_LOG_PAGE_SIZE)
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1, key="trade_log_page") if pages > 1 else 1
+        start = (page - 1) * TRADE_LOG_PAGE_SIZE
+        st.dataframe(trades.to_frame(start, start + TRADE_LOG_PAGE_SIZE), hide_index=True, use_container_width=True,
+                     column_config={'Date': st.column_config.DateColumn(), 'Price': money, 'Value': money, 'Cash': money})
+
+    def display_comparison(self, comparison, daily_values_df):
+        fig = go.Figure()
+        for portfolio_name in daily_values_df.columns:
+            portfolio_values = daily_values_df[portfolio_name].dropna()
+            fig.add_trace(go.Scatter(x=portfolio_values.index, y=portfolio_values,
+                                     mode='lines',
+                                     name=portfolio_name,
+                                     hovertemplate='<b>Date</b>: %{x}<br>' + '<b>Value</b>: $%{y:.2f}<extra></extra>'))
+        fig.update_layout(title='Portfolio Value Over Time',
+                          xaxis_title='Date',
+                          yaxis_title='Portfolio Value',
+                          legend_title='Portfolio')
+        st.plotly_chart(fig)
 
-        annualized_return = results[1].split(": ")[1]
-        sharpe_ratio = results[2].split(": ")[1]
+        st.dataframe(comparison.style.format({
+            'Final Portfolio Value': '${:,.2f}',
+            'Annualized Return': lambda value: f"{value * 100:.2f}%",
+            'Sharpe Ratio': '{:.2f}',
+        }), use_container_width=True)
 
+    def display_robustness(self, robustness):
         col1, col2, col3 = st.columns(3)
-        col1.metric("Final Portfolio Value", f"${final_portfolio_value:,.2f}", f"{delta_value:+,.2f} ({delta_percentage:+.2f}%)")
-        col2.metric("Annualized Return", annualized_return)
-        col3.metric("Sharpe Ratio", sharpe_ratio)
-
-        # Displaying actions taken
-        with st.container():
-            for action in actions:
-                st.text(action)
\ No newline at end of file
+        for col, column in zip((col1, col2, col3), robustness.columns):
+            fig = go.Figure(go.Histogram(x=robustness[column], nbinsx=50))
+            fig.update_layout(title=column, showlegend=False, margin=dict(l=10, r=10, t=40, b=10))
+            col.plotly_chart(fig, use_container_width=True)
+
+        summary = robustness.quantile([0.05, 0.25, 0.5, 0.75, 0.95])
+        summary.index = ['5th percentile', '25th percentile', 'Median', '75th percentile', '95th percentile']
+        st.dataframe(summary.style.format({
+            'Final Portfolio Value': '${:,.2f}',
+            'Sharpe Ratio': '{:.2f}',
+            'Max Drawdown': lambda value: f"{value * 100:.2f}%",
+        }), use_container_width=True)
+        st.caption(f"Share of paths ending above the initial investment: {(robustness['Final Portfolio Value'] > self.initial_fund).mean():.1%}")
+
+    def display_cache_stats(self):
+        caches = {'Indicators': indicator_cache.stats(), 'Simulation inputs': simulation_inputs.stats(), 'Portfolio summaries': portfolio_summaries.stats()}
+        st.write("**Process-wide caches** (since the server started)")
+        st.dataframe(pd.DataFrame([{
+            'Cache': name,
+            'Entries': stats['entries'],
+            'Used (MB)': stats['bytes'] / 2 ** 20,
+            'Cap (MB)': stats['max_bytes'] / 2 ** 20,
+            'Hits': stats['hits'],
+            'Misses': stats['misses'],
+            'Hit rate': stats['hit_rate'],
+            'Evictions': stats['evictions'],
+        } for name, stats in caches.items()]), hide_index=True, use_container_width=True,
+            column_config={'Used (MB)': st.column_config.NumberColumn(format="%.1f"), 'Cap (MB)': st.column_config.NumberColumn(format="%.0f"),
+                           'Hit rate': st.column_config.ProgressColumn(min_value=0.0, max_value=1.0, format="%.2f")})
+        st.caption(f"{indicator_cache.stats()['extensions']:,} indicator frames extended with new bars instead of recomputed.")
+
+    def display_profile(self):
+        profiler = st.session_state.get('simulation_profile')
+        with st.expander("Debug: Simulation Profile"):
+            pool = pool_stats()
+            st.caption(f"Database pool: {pool['in_use']} of {pool['open']} connections in use (max {pool['size']}, peak {pool['peak_in_use']}), "
+                       f"{pool['borrowed']:,} checkouts, {pool['waits']} waits ({pool['wait_seconds']:.2f}s), {pool['timeouts']} timeouts, "
+                       f"{pool['replaced']} replaced by health checks.")
+            self.display_cache_stats()
+            if profiler is None:
+                st.write("Run a simulation to profile it.")
+                return
+            st.write(f"Last simulation took **{profiler.wall_seconds:.2f}s** ({profiler.samples:,} stack samples).")
+            st.dataframe(profiler.breakdown(), hide_index=True, use_container_width=True,
+                         column_config={'Seconds': st.column_config.NumberColumn(format="%.3f"),
+                                        'Share': st.column_config.ProgressColumn(min_value=0.0, max_value=1.0, format="%.2f")})
+            if profiler.samples:
+                st.write("**Hottest functions** (share of samples)")
+                st.dataframe(profiler.top_functions(), hide_index=True, use_container_width=True,
+                             column_config={'Self': st.column_config.NumberColumn(format="%.3f"),
+                                            'Total': st.column_config.NumberColumn(format="%.3f")})
+                st.download_button("Download profile", profiler.collapsed_stacks(), file_name="simulation_profile.folded", mime="text/plain",
+                                   help="Collapsed stacks, viewable with speedscope or flamegraph.pl.")
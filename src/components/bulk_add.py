@@ -0,0 +1,36 @@
+import streamlit as st
+
+
+def download_progress(stock_symbols):
+    """A progress bar for downloading stock_symbols, and the callback that advances it."""
+    progress_bar = st.progress(0.0, text=f"Downloading prices for {len(stock_symbols)} stock(s)...")
+
+    def progress(stock_symbol, done, total):
+        progress_bar.progress(done / total, text=f"Downloaded {stock_symbol} ({done}/{total})")
+    return progress_bar, progress
+
+
+def show_results(results):
+    for stock_symbol, (success, message) in results.items():
+        if success:
+            st.success(message)
+        else:
+            st.error(message)
+
+
+def add_stocks_with_progress(portfolio_manager, portfolio_name, stock_symbols):
+    """Add stock_symbols to the portfolio in one batch, with a progress bar while prices download and a line per ticker after."""
+    progress_bar, progress = download_progress(stock_symbols)
+    results = portfolio_manager.add_stocks_to_portfolio(portfolio_name, stock_symbols, progress)
+    progress_bar.empty()
+    show_results(results)
+    return results
+
+
+def create_portfolio_with_progress(portfolio_manager, portfolio_name, description, stock_symbols):
+    """Create the portfolio holding stock_symbols in one unit of work; returns (success, message) and shows a line per ticker."""
+    progress_bar, progress = download_progress(stock_symbols)
+    success, message, results = portfolio_manager.create_portfolio_with_stocks(portfolio_name, description, stock_symbols, progress)
+    progress_bar.empty()
+    show_results(results)
+    return success, message
@@ -1,5 +1,6 @@
 import streamlit as st
 from ..utils.session_utils import SessionUtils
+from src.components.bulk_add import create_portfolio_with_progress
 
 class PortfolioBuilder:
     def __init__(self, portfolio_manager, ai_manager):
@@ -50,18 +51,12 @@ class PortfolioBuilder:
             if st.button("Create Portfolio", key="create_manual_portfolio"):
                 list_stocks = [stock.strip() for stock in stocks if stock.strip()]
                 if portfolio_name and list_stocks:
-                    creation_success, creation_message = self.portfolio_manager.add_portfolio(portfolio_name, portfolio_description)
+                    # The portfolio and its stocks are saved together, or not at all
+                    creation_success, creation_message = create_portfolio_with_progress(self.portfolio_manager, portfolio_name, portfolio_description, list_stocks)
                     if creation_success:
                         st.success(creation_message)
-                        # Attempt to add each stock to the newly created portfolio
-                        for stock in list_stocks:
-                            success, message = self.portfolio_manager.add_stock_to_portfolio(portfolio_name, stock)
-                            if success:
-                                st.success(message)
-                            else:
-                                st.error(message)
                     else:
-                        st.error("Failed to create the portfolio.")
+                        st.error(f"Failed to create the portfolio: {creation_message}")
                 else:
                     st.error("Please enter a valid portfolio name and at least one valid stock.")
 
@@ -126,15 +121,10 @@ class PortfolioBuilder:
             st.session_state.save_toggle = st.checkbox('Save Portfolio', value=st.session_state.save_toggle, key='save_portfolio_toggle')
             if st.session_state.save_toggle:
                 if 'portfolio_saved' not in st.session_state or not st.session_state.portfolio_saved:
-                    creation_success, creation_message = self.portfolio_manager.add_portfolio(parsed_data['portfolio_name'], parsed_data['description'])
+                    creation_success, creation_message = create_portfolio_with_progress(
+                        self.portfolio_manager, parsed_data['portfolio_name'], parsed_data['description'], parsed_data['stock_symbols'])
                     if creation_success:
                         st.success(f"AI-generated portfolio '{parsed_data['portfolio_name']}' saved successfully.")
-                        for stock in parsed_data['stock_symbols']:
-                            success, message = self.portfolio_manager.add_stock_to_portfolio(parsed_data['portfolio_name'], stock)
-                            if success:
-                                st.success(f"Added stock {stock} to '{parsed_data['portfolio_name']}' portfolio.")
-                            else:
-                                st.error(f"Failed to add stock {stock} to '{parsed_data['portfolio_name']}' portfolio: {message}")
                         st.session_state.portfolio_saved = True 
                     else:
                         st.error(f"Failed to save the portfolio '{parsed_data['portfolio_name']}': {creation_message}")
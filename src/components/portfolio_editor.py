@@ -1,4 +1,5 @@
 import streamlit as st
+from src.components.bulk_add import add_stocks_with_progress
 
 class EditBuilder:
     def __init__(self, portfolio_manager):
@@ -7,7 +8,8 @@ class EditBuilder:
     def display(self):
         stocks_to_add = []
         stocks_to_remove = []
-        portfolio_names = self.portfolio_manager.fetch_portfolio_names()  # Fetch portfolio names
+        summaries = {summary.portfolio_name: summary for summary in self.portfolio_manager.fetch_portfolio_summaries()}
+        portfolio_names = list(summaries)
         
         if portfolio_names:
             portfolio_name = st.selectbox("Select a portfolio:", portfolio_names)
@@ -28,19 +30,14 @@ class EditBuilder:
                                 stocks_to_add.append(stock_symbol.strip())
 
                 if st.button("Add Stock(s)"):
-                    for stock_symbol in stocks_to_add:
-                        success, message = self.portfolio_manager.add_stock_to_portfolio(portfolio_name, stock_symbol)
-                        if success:
-                            st.success(message)
-                        else:
-                            st.error(message)
+                    add_stocks_with_progress(self.portfolio_manager, portfolio_name, stocks_to_add)
 
             elif action == "Remove Stocks":
-                current_stocks = self.portfolio_manager.fetch_all_stocks(portfolio_name)
+                current_stocks = summaries[portfolio_name].stocks
                 stocks_to_remove = st.multiselect('Select stocks to remove:', current_stocks, help="Select the stocks you want to remove from the portfolio.")
                 if st.button("Remove Stock(s)"):
-                    for stock_symbol in stocks_to_remove:
-                        success, message = self.portfolio_manager.remove_stock_from_portfolio(portfolio_name, stock_symbol)
+                    results = self.portfolio_manager.remove_stocks_from_portfolio(portfolio_name, stocks_to_remove)
+                    for stock_symbol, (success, message) in results.items():
                         if success:
                             st.success(f"Removed {stock_symbol} from {portfolio_name}")
                         else:
@@ -1,8 +1,11 @@
 import streamlit as st
-import pandas as pd
+import numpy as np
 import plotly
 import plotly.graph_objects as go
 
+from src.config.settings import OVERVIEW_CHART_POINTS
+from src.utils.downsampling import lttb
+
 class OverviewBuilder:
     def __init__(self, portfolio_manager, backtest_manager):
         self.portfolio_manager = portfolio_manager
@@ -10,27 +13,35 @@ class OverviewBuilder:
 
     def display(self):
         with st.spinner('Waiting for Portfolios to load...'):
-            portfolios_info = self.portfolio_manager.fetch_all_portfolios()
-            self.portfolio_manager.update_stock_data()
+            summaries = self.portfolio_manager.fetch_portfolio_summaries()
             
-            if portfolios_info:
-                for portfolio_name, creation_date, stocks, portfolio_description in portfolios_info:
+            if summaries:
+                for summary in summaries:
+                    portfolio_name = summary.portfolio_name
                     with st.container():
                         with st.expander(f"{portfolio_name}"):
-                            st.write(f"**Creation Date:** {creation_date}")
-                            if portfolio_description:  # Check if the description is not empty
-                                st.write(f"**Description:** {portfolio_description}")
-                            if stocks:
-                                st.write(f"**Stocks:** {', '.join(stocks)}")
-                                historical_data_list, sim_data = self.backtest_manager.get_simulation_data(portfolio_name)
-                                sim_data['transaction_date'] = pd.to_datetime(sim_data['transaction_date'])
-                                fig = go.Figure()
-                                for stock in stocks:
-                                    stock_data = sim_data[sim_data['stock_name'] == stock]
-                                    fig.add_trace(go.Scatter(x=stock_data['transaction_date'], y=stock_data['closing_price'], mode='lines', name=stock))
-                                fig.update_layout(title=f'{portfolio_name} - Stock Prices Over Time', xaxis_title='Date', yaxis_title='Price', legend_title='Stock', colorway=plotly.colors.qualitative.D3)
-                                st.plotly_chart(fig, use_container_width=True)
+                            st.write(f"**Creation Date:** {summary.creation_date}")
+                            if summary.description:  # Check if the description is not empty
+                                st.write(f"**Description:** {summary.description}")
+                            if summary.stocks:
+                                st.write(f"**Stocks ({summary.stock_count}):** {', '.join(summary.stocks)}")
+                                if summary.last_date:
+                                    st.write(f"**Price Data:** {summary.first_date} to {summary.last_date}")
+                                    st.write("**Latest Close:** " + ', '.join(f"{stock} {close:,.2f}" for stock, close in summary.latest_closes.items()))
+                                # Prices are only loaded for the charts the user asks to see
+                                if st.toggle("Show price chart", key=f"overview_chart_{portfolio_name}"):
+                                    st.plotly_chart(self.price_chart(portfolio_name), use_container_width=True)
                             else:
                                 st.write("*No stocks in portfolio*")
             else:
-                st.write("No portfolios found.")
\ No newline at end of file
+                st.write("No portfolios found.")
+
+    def price_chart(self, portfolio_name):
+        histories = self.backtest_manager.get_price_histories(portfolio_name) or {}
+        fig = go.Figure()
+        for stock, bars in sorted(histories.items()):
+            # Downsampled to about one point per pixel, keeping the peaks and troughs, and drawn with WebGL
+            kept = lttb(bars['transaction_date'].astype(np.int64), bars['closing_price'], OVERVIEW_CHART_POINTS)
+            fig.add_trace(go.Scattergl(x=bars['transaction_date'][kept], y=bars['closing_price'][kept], mode='lines', name=stock))
+        fig.update_layout(title=f'{portfolio_name} - Stock Prices Over Time', xaxis_title='Date', yaxis_title='Price', legend_title='Stock', colorway=plotly.colors.qualitative.D3)
+        return fig
@@ -1,3 +1,5 @@
+import os
+
 CUSTOM_STYLES = '''
     <style>
     @import url('https://fonts.googleapis.com/css?family=Montserrat:400,700&display=swap');
@@ -10,4 +12,52 @@ CUSTOM_STYLES = '''
         visibility: hidden;
     }
     </style>
-'''
\ No newline at end of file
+'''
+
+# Memory cap for the process-wide indicator cache shared by all sessions
+INDICATOR_CACHE_MAX_BYTES = int(os.environ.get('INDICATOR_CACHE_MAX_MB', 256)) * 1024 * 1024
+
+# Worker processes for simulating all portfolios and parameter sweeps (1 runs them in the app process)
+BACKTEST_WORKERS = int(os.environ.get('BACKTEST_WORKERS', min(4, os.cpu_count() or 1)))
+
+# Working memory for one chunk of Monte Carlo paths in the robustness test
+MONTE_CARLO_MAX_BYTES = int(os.environ.get('MONTE_CARLO_MAX_MB', 512)) * 1024 * 1024
+
+# Profile every simulation (PROFILE_SIMULATIONS=1); a single session can opt in by opening the app with ?profile=1
+PROFILE_SIMULATIONS = os.environ.get('PROFILE_SIMULATIONS', '0') == '1'
+# Seconds between call-stack samples while a simulation is profiled
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', 0.005))
+
+# Rows per multi-row INSERT when ingesting price history; keeps each statement well under max_allowed_packet
+INGEST_BATCH_ROWS = int(os.environ.get('INGEST_BATCH_ROWS', 1000))
+
+# Process-wide MySQL connection pool: connections kept open, seconds to wait for a free one,
+# seconds allowed for opening one, and seconds a connection may sit idle before it is pinged on checkout
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+DB_CONNECT_TIMEOUT = int(os.environ.get('DB_CONNECT_TIMEOUT', 10))
+DB_POOL_PING_AFTER = float(os.environ.get('DB_POOL_PING_AFTER', 30))
+
+# Local on-disk copy of each ticker's price history (one memory-mapped .npy file per ticker); set to '' to disable
+PRICE_CACHE_DIR = os.environ.get('PRICE_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'backtestai', 'prices'))
+
+# Seconds between cycles of the market-data refresh worker (python -m src.services.market_data_refresh)
+MARKET_DATA_REFRESH_INTERVAL = float(os.environ.get('MARKET_DATA_REFRESH_INTERVAL', 3600))
+
+# Serve market data from a directory of <ticker>.parquet/.csv fixtures instead of yfinance (offline runs); unset to download
+MARKET_DATA_DIR = os.environ.get('MARKET_DATA_DIR', '')
+# Tickers per batched download in the refresh worker
+MARKET_DATA_BATCH_SIZE = int(os.environ.get('MARKET_DATA_BATCH_SIZE', 50))
+# Concurrent downloads when many tickers are added to a portfolio at once
+MARKET_DATA_WORKERS = int(os.environ.get('MARKET_DATA_WORKERS', 8))
+
+# Points kept per series in the Portfolio Overview charts, about one per pixel of chart width
+OVERVIEW_CHART_POINTS = int(os.environ.get('OVERVIEW_CHART_POINTS', 800))
+
+# Per-user cache of portfolio summaries (names, tickers, data range, latest closes): memory cap and
+# seconds an entry is trusted, so prices stored by the refresh worker show up without an app-side write
+PORTFOLIO_SUMMARY_CACHE_MAX_BYTES = int(os.environ.get('PORTFOLIO_SUMMARY_CACHE_MAX_MB', 16)) * 1024 * 1024
+PORTFOLIO_SUMMARY_TTL = float(os.environ.get('PORTFOLIO_SUMMARY_TTL', 300))
+
+# Memory cap for the process-wide cache of simulation inputs (a portfolio's price frames per data version and date range)
+SIMULATION_INPUT_CACHE_MAX_BYTES = int(os.environ.get('SIMULATION_INPUT_CACHE_MAX_MB', 256)) * 1024 * 1024
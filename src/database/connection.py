@@ -1,15 +1,220 @@
+import contextlib
+import threading
+import time
+
 import mysql.connector
 import streamlit as st
 
-def get_db_connection():
-    try:
-        conn = mysql.connector.connect(
-            host=st.secrets["mysql"]["host"],
-            user=st.secrets["mysql"]["user"],
-            password=st.secrets["mysql"]["password"],
-            database=st.secrets["mysql"]["database"]
-        )
-        return conn
-    except mysql.connector.Error as e:
-        st.error("Database connection failed: " + str(e))
-        raise e
+from src.config.settings import DB_CONNECT_TIMEOUT, DB_POOL_PING_AFTER, DB_POOL_SIZE, DB_POOL_TIMEOUT
+
+def get_db_connection(autocommit=False):
+    # Also opens connections for the refresh worker and the migration tool, so failures are raised
+    # for the caller to report; the app shows them in app.py
+    return mysql.connector.connect(
+        host=st.secrets["mysql"]["host"],
+        user=st.secrets["mysql"]["user"],
+        password=st.secrets["mysql"]["password"],
+        database=st.secrets["mysql"]["database"],
+        connection_timeout=DB_CONNECT_TIMEOUT,
+        autocommit=autocommit
+    )
+
+
+class UnitOfWork:
+    """The writes of one logical operation, made on a single transaction's cursor and committed once.
+
+    Work that must only happen once the writes are durable, such as refreshing or dropping a
+    cache, is registered with after_commit and runs after the commit; a rollback discards it.
+    """
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self._after_commit = []
+
+    def execute(self, query, params=()):
+        self.cursor.execute(query, params)
+        return self.cursor
+
+    def executemany(self, query, rows):
+        if rows:
+            self.cursor.executemany(query, rows)
+        return self.cursor
+
+    def after_commit(self, callback):
+        self._after_commit.append(callback)
+
+
+class ConnectionPool:
+    """A bounded set of connections shared by every session in the process.
+
+    Connections are opened on demand, up to size. Once size are borrowed, callers wait up to
+    timeout seconds for one to come back before a PoolError is raised. A connection that sat
+    idle for more than ping_after seconds is pinged before it is handed out and replaced if the
+    server has dropped it. Connections are expected to be in autocommit mode, so a borrowed
+    connection never carries a stale snapshot; transaction() groups writes explicitly.
+    """
+    def __init__(self, connect, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT, ping_after=DB_POOL_PING_AFTER):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self._idle = []
+        self._open = 0
+        self._in_use = 0
+        self._available = threading.Condition()
+        self._counters = {'borrowed': 0, 'opened': 0, 'replaced': 0, 'discarded': 0, 'waits': 0, 'timeouts': 0, 'peak_in_use': 0}
+        self._wait_seconds = 0.0
+
+    def acquire(self):
+        """Borrow a connection; give it back with release()."""
+        with self._available:
+            self._counters['borrowed'] += 1
+            waited_since = None
+            while not self._idle and self._open >= self.size:
+                if waited_since is None:
+                    waited_since = time.monotonic()
+                    self._counters['waits'] += 1
+                remaining = waited_since + self.timeout - time.monotonic()
+                if remaining <= 0 or not self._available.wait(remaining):
+                    if not self._idle and self._open >= self.size:
+                        self._wait_seconds += time.monotonic() - waited_since
+                        self._counters['timeouts'] += 1
+                        raise mysql.connector.errors.PoolError(
+                            f"No database connection became free within {self.timeout:g}s ({self.size} in use).")
+            if waited_since is not None:
+                self._wait_seconds += time.monotonic() - waited_since
+            connection, returned_at = self._idle.pop() if self._idle else (None, None)
+            if connection is None:
+                self._open += 1
+            self._in_use += 1
+            self._counters['peak_in_use'] = max(self._counters['peak_in_use'], self._in_use)
+
+        try:
+            if connection is None:
+                connection = self._new_connection()
+            elif time.monotonic() - returned_at > self.ping_after:
+                connection = self._checked(connection)
+        except Exception:
+            with self._available:
+                self._open -= 1
+                self._in_use -= 1
+                self._available.notify()
+            raise
+        return connection
+
+    def release(self, connection, broken=False):
+        """Return a borrowed connection. Broken connections are closed instead of being reused."""
+        if not broken and connection.in_transaction:
+            try:
+                connection.rollback()
+            except mysql.connector.Error:
+                broken = True
+        if broken:
+            self._close_quietly(connection)
+        with self._available:
+            self._in_use -= 1
+            if broken:
+                self._open -= 1
+                self._counters['discarded'] += 1
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._available.notify()
+
+    def _new_connection(self):
+        connection = self._connect()
+        with self._available:
+            self._counters['opened'] += 1
+        return connection
+
+    def _checked(self, connection):
+        try:
+            connection.ping(reconnect=False)
+            return connection
+        except mysql.connector.Error:
+            self._close_quietly(connection)
+            with self._available:
+                self._counters['replaced'] += 1
+            return self._new_connection()
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except mysql.connector.Error:
+            pass
+
+    @contextlib.contextmanager
+    def connection(self):
+        connection = self.acquire()
+        broken = False
+        try:
+            yield connection
+        except (mysql.connector.InterfaceError, mysql.connector.OperationalError):
+            # Lost or unusable connections are not handed to the next borrower
+            broken = True
+            raise
+        finally:
+            self.release(connection, broken)
+
+    @contextlib.contextmanager
+    def cursor(self, **kwargs):
+        """A cursor on a borrowed connection; both are given back when the block exits. Buffered unless told otherwise."""
+        kwargs.setdefault('buffered', True)
+        with self.connection() as connection:
+            cursor = connection.cursor(**kwargs)
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    @contextlib.contextmanager
+    def transaction(self, **kwargs):
+        """Like cursor(), inside a transaction that is committed if the block completes and rolled back if it raises."""
+        kwargs.setdefault('buffered', True)
+        with self.connection() as connection:
+            connection.start_transaction()
+            cursor = connection.cursor(**kwargs)
+            try:
+                yield cursor
+                connection.commit()
+            except BaseException:
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    @contextlib.contextmanager
+    def unit_of_work(self):
+        """A UnitOfWork whose writes commit together when the block completes, followed by its after_commit callbacks."""
+        with self.transaction() as cursor:
+            work = UnitOfWork(cursor)
+            yield work
+        for callback in work._after_commit:
+            callback()
+
+    def stats(self):
+        with self._available:
+            return dict(self._counters, size=self.size, open=self._open, in_use=self._in_use,
+                        idle=len(self._idle), wait_seconds=self._wait_seconds)
+
+    def close(self):
+        """Close the idle connections; borrowed ones are closed as they come back broken or left to the process."""
+        with self._available:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for connection, _ in idle:
+            self._close_quietly(connection)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """The process-wide pool, opened lazily so the secrets are only read once a query runs."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(lambda: get_db_connection(autocommit=True))
+        return _pool
+
+def pool_stats():
+    return get_pool().stats()
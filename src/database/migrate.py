@@ -0,0 +1,142 @@
+"""Apply the SQL files in src/database/migrations in order, once each.
+
+    python -m src.database.migrate --init     # create the schema in a new, empty database
+    python -m src.database.migrate            # apply pending migrations
+    python -m src.database.migrate --status   # list applied and pending migrations
+
+Applied migrations are recorded in the SchemaMigration table. schema.sql already contains every
+migration, so --init records them all as applied, and only does so on a database without tables.
+MySQL commits DDL as it runs, so a migration that fails part way must be finished by hand before
+it is run again.
+"""
+import argparse
+import os
+import re
+import sys
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+SCHEMA_PATH = os.path.join(os.path.dirname(MIGRATIONS_DIR), 'schema.sql')
+
+# Per migration, a query returning 1 when its changes are in the database, to catch migrations
+# recorded as applied that never ran (as schema.sql once recorded them on existing databases)
+MIGRATION_CHECKS = {
+    '001_shared_price_store': """
+        SELECT COUNT(*) = 0 FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name IN ('StockData', 'PortfolioStock')""",
+    '002_hot_query_indexes': """
+        SELECT COUNT(*) > 0 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = 'PortfolioTicker' AND index_name = 'idx_portfolioticker_stock'""",
+    '003_ticker_sync': """
+        SELECT COUNT(*) > 0 FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name = 'TickerSync'""",
+    '004_portfolio_data_version': """
+        SELECT COUNT(*) > 0 FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = 'Portfolio' AND column_name = 'data_version'""",
+}
+
+
+def migration_files():
+    return sorted(name for name in os.listdir(MIGRATIONS_DIR) if name.endswith('.sql'))
+
+
+def split_statements(sql):
+    sql = re.sub(r'--[^\n]*', '', sql)
+    return [statement.strip() for statement in sql.split(';') if statement.strip()]
+
+
+def schema_statements():
+    """The statements of schema.sql, without the CREATE DATABASE and USE that name its own database."""
+    with open(SCHEMA_PATH) as schema_file:
+        statements = split_statements(schema_file.read())
+    return [statement for statement in statements if not re.match(r'(CREATE DATABASE|USE)\b', statement, re.IGNORECASE)]
+
+
+def applied_migrations(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS SchemaMigration (
+            name VARCHAR(255) PRIMARY KEY,
+            applied_at DATETIME NOT NULL
+        )
+    """)
+    cursor.execute("SELECT name FROM SchemaMigration")
+    return {name for (name,) in cursor.fetchall()}
+
+
+def record_migrations(cursor, names):
+    cursor.executemany("INSERT INTO SchemaMigration (name, applied_at) VALUES (%s, NOW())", [(name,) for name in names])
+
+
+def unapplied_records(cursor, applied):
+    """Migrations recorded as applied whose changes are not in the database."""
+    missing = []
+    for name in sorted(applied):
+        if name in MIGRATION_CHECKS:
+            cursor.execute(MIGRATION_CHECKS[name])
+            if not cursor.fetchone()[0]:
+                missing.append(name)
+    return missing
+
+
+def initialize(connection):
+    """Create the schema in a database without tables, recording every migration as applied."""
+    cursor = connection.cursor()
+    cursor.execute("SHOW TABLES")
+    tables = sorted(name for (name,) in cursor.fetchall())
+    if tables:
+        raise RuntimeError(f"The database already has tables ({', '.join(tables)}); upgrade it with the migrations instead of --init.")
+    for statement in schema_statements():
+        cursor.execute(statement)
+    applied_migrations(cursor)
+    record_migrations(cursor, [file_name[:-len('.sql')] for file_name in migration_files()])
+    connection.commit()
+
+
+def migrate(connection, status_only=False):
+    cursor = connection.cursor()
+    applied = applied_migrations(cursor)
+    missing = unapplied_records(cursor, applied)
+    if missing:
+        names = ', '.join(f"'{name}'" for name in missing)
+        raise RuntimeError(f"Migrations {names} are recorded as applied but their changes are not in the database. "
+                           f"Remove them with DELETE FROM SchemaMigration WHERE name IN ({names}) and run the migrations again.")
+    pending = [file_name for file_name in migration_files() if file_name[:-len('.sql')] not in applied]
+    if status_only:
+        for file_name in migration_files():
+            print(f"{'pending' if file_name in pending else 'applied'}  {file_name}")
+        return pending
+
+    for file_name in pending:
+        print(f"Applying {file_name}...")
+        with open(os.path.join(MIGRATIONS_DIR, file_name)) as migration_file:
+            for statement in split_statements(migration_file.read()):
+                cursor.execute(statement)
+        record_migrations(cursor, [file_name[:-len('.sql')]])
+        connection.commit()
+    print(f"{len(pending)} migration(s) applied." if pending else "Database is up to date.")
+    return pending
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply pending database migrations.")
+    parser.add_argument('--status', action='store_true', help="List migrations without applying any.")
+    parser.add_argument('--init', action='store_true', help="Create the schema in a new, empty database.")
+    args = parser.parse_args(argv)
+
+    from src.database.connection import get_db_connection
+    connection = get_db_connection()
+    try:
+        if args.init:
+            initialize(connection)
+            print("Database created.")
+        else:
+            migrate(connection, args.status)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        connection.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
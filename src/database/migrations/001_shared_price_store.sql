@@ -0,0 +1,42 @@
+-- Replace the per-portfolio copies in StockData/PortfolioStock with one shared price row per
+-- (ticker, date) and a portfolio -> ticker membership table.
+
+CREATE TABLE IF NOT EXISTS StockPrice (
+    stock_name VARCHAR(255) NOT NULL,
+    transaction_date DATE NOT NULL,
+    open_price DECIMAL(10, 2),
+    high_price DECIMAL(10, 2),
+    low_price DECIMAL(10, 2),
+    closing_price DECIMAL(10, 2),
+    volume BIGINT,
+    dividends DECIMAL(10, 2),
+    stock_splits INT,
+    PRIMARY KEY (stock_name, transaction_date)
+);
+
+CREATE TABLE IF NOT EXISTS PortfolioTicker (
+    portfolio_id INT NOT NULL,
+    stock_name VARCHAR(255) NOT NULL,
+    FOREIGN KEY (portfolio_id) REFERENCES Portfolio(portfolio_id) ON DELETE CASCADE,
+    PRIMARY KEY (portfolio_id, stock_name)
+);
+
+-- Collapse duplicate bars, keeping the most recently inserted copy of each (ticker, date)
+INSERT IGNORE INTO StockPrice (stock_name, transaction_date, open_price, high_price, low_price, closing_price, volume, dividends, stock_splits)
+SELECT sd.stock_name, sd.transaction_date, sd.open_price, sd.high_price, sd.low_price, sd.closing_price, sd.volume, sd.dividends, sd.stock_splits
+FROM StockData sd
+JOIN (
+    SELECT MAX(stock_data_id) AS stock_data_id
+    FROM StockData
+    WHERE stock_name IS NOT NULL AND transaction_date IS NOT NULL
+    GROUP BY stock_name, transaction_date
+) latest ON latest.stock_data_id = sd.stock_data_id;
+
+INSERT IGNORE INTO PortfolioTicker (portfolio_id, stock_name)
+SELECT DISTINCT ps.portfolio_id, sd.stock_name
+FROM PortfolioStock ps
+JOIN StockData sd ON sd.stock_data_id = ps.stock_data_id
+WHERE sd.stock_name IS NOT NULL;
+
+-- The old tables are kept, renamed, until the migrated data has been checked
+RENAME TABLE PortfolioStock TO PortfolioStock_legacy, StockData TO StockData_legacy;
@@ -0,0 +1,5 @@
+-- Indexes for the hot portfolio/price queries. StockPrice's primary key (stock_name, transaction_date)
+-- already serves the per-ticker range scans, MAX(transaction_date) lookups and COUNT(DISTINCT stock_name),
+-- and PortfolioTicker's (portfolio_id, stock_name) a portfolio's tickers. This adds the reverse lookup:
+-- which portfolios hold a ticker, as used when a user's tickers are refreshed.
+CREATE INDEX idx_portfolioticker_stock ON PortfolioTicker (stock_name, portfolio_id);
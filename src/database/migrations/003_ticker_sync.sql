@@ -0,0 +1,13 @@
+-- Per-ticker watermark for the market-data refresh worker (src/services/market_data_refresh.py):
+-- the prices of stock_name are complete through synced_through, so the next refresh downloads
+-- only the days after it. Seeded from the prices already stored.
+CREATE TABLE IF NOT EXISTS TickerSync (
+    stock_name VARCHAR(255) PRIMARY KEY,
+    synced_through DATE NOT NULL,
+    synced_at DATETIME NOT NULL
+);
+
+INSERT IGNORE INTO TickerSync (stock_name, synced_through, synced_at)
+SELECT stock_name, MAX(transaction_date), NOW()
+FROM StockPrice
+GROUP BY stock_name;
@@ -0,0 +1,4 @@
+-- A counter per portfolio, bumped in the same transaction as any change to its inputs: a ticker
+-- added or removed, or new prices stored for a ticker it holds. Cached simulation inputs are keyed
+-- by (portfolio_id, data_version), so a bump makes every cached copy unreachable.
+ALTER TABLE Portfolio ADD COLUMN data_version INT UNSIGNED NOT NULL DEFAULT 0;
@@ -1,3 +1,7 @@
+-- The full current schema, for a new database. Create it with python -m src.database.migrate --init,
+-- which also records the migrations in src/database/migrations as applied; upgrade an existing
+-- database with python -m src.database.migrate instead.
+
 -- Create the database if it doesn't exist
 CREATE DATABASE IF NOT EXISTS backtestdb;
 USE backtestdb;
@@ -19,29 +23,38 @@ CREATE TABLE IF NOT EXISTS Portfolio (
     portfolio_name VARCHAR(255),
     creation_date DATETIME NOT NULL,
     description TEXT,
+    data_version INT UNSIGNED NOT NULL DEFAULT 0,
     UNIQUE (user_id, portfolio_name),
     FOREIGN KEY (user_id) REFERENCES User(user_id) ON DELETE CASCADE
 );
 
--- Create the StockData table
-CREATE TABLE IF NOT EXISTS StockData (
-    stock_data_id INT AUTO_INCREMENT PRIMARY KEY,
-    stock_name VARCHAR(255),
-    transaction_date DATE,
+-- Create the StockPrice table: one row per ticker per trading day, shared by every portfolio.
+-- The primary key serves per-ticker date ranges, MAX(transaction_date) and COUNT(DISTINCT stock_name).
+CREATE TABLE IF NOT EXISTS StockPrice (
+    stock_name VARCHAR(255) NOT NULL,
+    transaction_date DATE NOT NULL,
     open_price DECIMAL(10, 2),
     high_price DECIMAL(10, 2),
     low_price DECIMAL(10, 2),
     closing_price DECIMAL(10, 2),
     volume BIGINT,
     dividends DECIMAL(10, 2),
-    stock_splits INT
+    stock_splits INT,
+    PRIMARY KEY (stock_name, transaction_date)
 );
 
--- Create the PortfolioStock table
-CREATE TABLE IF NOT EXISTS PortfolioStock (
-    portfolio_id INT,
-    stock_data_id INT,
+-- Create the PortfolioTicker table: which tickers each portfolio holds
+CREATE TABLE IF NOT EXISTS PortfolioTicker (
+    portfolio_id INT NOT NULL,
+    stock_name VARCHAR(255) NOT NULL,
     FOREIGN KEY (portfolio_id) REFERENCES Portfolio(portfolio_id) ON DELETE CASCADE,
-    FOREIGN KEY (stock_data_id) REFERENCES StockData(stock_data_id) ON DELETE CASCADE,
-    PRIMARY KEY (portfolio_id, stock_data_id)
+    PRIMARY KEY (portfolio_id, stock_name),
+    INDEX idx_portfolioticker_stock (stock_name, portfolio_id)
+);
+
+-- Create the TickerSync table: how far each ticker's prices have been refreshed
+CREATE TABLE IF NOT EXISTS TickerSync (
+    stock_name VARCHAR(255) PRIMARY KEY,
+    synced_through DATE NOT NULL,
+    synced_at DATETIME NOT NULL
 );
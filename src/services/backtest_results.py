@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+
+class TradeLedger:
+    """Columnar log of executed trades, appended to by the trading loop and read back as arrays."""
+    COLUMNS = ['Date', 'Ticker', 'Side', 'Shares', 'Price', 'Value', 'Cash']
+
+    def __init__(self, dates, tickers):
+        self.dates = dates
+        self.tickers = tickers
+        self.day_index = []
+        self.ticker_index = []
+        self.is_buy = []
+        self.shares = []
+        self.price = []
+        self.value = []
+        self.cash = []
+
+    def record(self, day, ticker, is_buy, shares, price, value, cash):
+        self.day_index.append(day)
+        self.ticker_index.append(ticker)
+        self.is_buy.append(is_buy)
+        self.shares.append(shares)
+        self.price.append(price)
+        self.value.append(value)
+        self.cash.append(cash)
+
+    def __len__(self):
+        return len(self.day_index)
+
+    def columns(self, start=0, stop=None):
+        """The trades in [start, stop) as a dict of NumPy arrays keyed by COLUMNS."""
+        day_index = np.asarray(self.day_index[start:stop], dtype=np.int64)
+        ticker_index = np.asarray(self.ticker_index[start:stop], dtype=np.int64)
+        return {
+            'Date': self.dates[day_index],
+            'Ticker': self.tickers[ticker_index],
+            'Side': np.where(np.asarray(self.is_buy[start:stop], dtype=bool), 'Buy', 'Sell'),
+            'Shares': np.asarray(self.shares[start:stop], dtype=np.int64),
+            'Price': np.asarray(self.price[start:stop], dtype=float),
+            'Value': np.asarray(self.value[start:stop], dtype=float),
+            'Cash': np.asarray(self.cash[start:stop], dtype=float),
+        }
+
+    def to_frame(self, start=0, stop=None):
+        return pd.DataFrame(self.columns(start, stop), columns=self.COLUMNS)
+
+
+class BacktestResult:
+    """Outcome of one simulate_trading run with numeric metrics and array-backed series."""
+
+    def __init__(self, initial_fund, dates, daily_values, trades, holding_tickers, holding_shares, holding_prices,
+                 final_portfolio_value, annualized_return, sharpe_ratio):
+        self.initial_fund = initial_fund
+        self.dates = dates
+        self.daily_values = daily_values
+        self.trades = trades
+        self.holding_tickers = holding_tickers
+        self.holding_shares = holding_shares
+        self.holding_prices = holding_prices
+        self.final_portfolio_value = final_portfolio_value
+        self.annualized_return = annualized_return
+        self.sharpe_ratio = sharpe_ratio
+
+    @property
+    def daily_values_df(self):
+        return pd.DataFrame({'Portfolio Value': self.daily_values}, index=pd.DatetimeIndex(self.dates.astype('datetime64[ns]')))
+
+    @property
+    def trades_df(self):
+        return self.trades.to_frame()
+
+    @property
+    def holdings_df(self):
+        return pd.DataFrame({
+            'Ticker': self.holding_tickers,
+            'Shares': self.holding_shares,
+            'Price': self.holding_prices,
+            'Value': self.holding_shares * self.holding_prices,
+        })
@@ -1,54 +1,202 @@
+import contextlib
+import itertools
+import multiprocessing
+import threading
 import numpy as np
 import pandas as pd
-import datetime
-from src.database.connection import get_db_connection
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from src.config.settings import BACKTEST_WORKERS
+from src.database.connection import get_pool
+from src.services.backtest_results import BacktestResult, TradeLedger
+from src.services import monte_carlo
+from src.services.indicator_cache import indicator_cache
+from src.services.portfolio_summary import portfolio_summaries
+from src.services.price_cache import history_frames, price_cache
+from src.services.simulation_inputs import simulation_inputs
+
+SIGNAL_FACTORS = ['Relative Strength Index (RSI)', 'Moving Average Convergence/Divergence (MACD)', 'Bollinger Bands', 'Moving Average',
+                  'Daily Return', 'Volatility', 'Exponential Moving Average (EMA)', 'Log Return']
+
+# Columns of the result tables of robustness_test, simulate_all_portfolios and sweep
+ROBUSTNESS_COLUMNS = ['Final Portfolio Value', 'Sharpe Ratio', 'Max Drawdown']
+COMPARISON_COLUMNS = ['Final Portfolio Value', 'Annualized Return', 'Sharpe Ratio']
+SWEEP_COLUMNS = ['Factors', 'RSI Lower', 'RSI Upper', 'Threshold', 'Final Portfolio Value', 'Annualized Return', 'Sharpe Ratio']
+
+# Window sizes used by add_indicators; part of the indicator cache key
+INDICATOR_PARAMS = (('MA', 7, 30), ('Volatility', 30, 30), ('RSI', 14), ('EMA', 12, 26, 9), ('Bollinger', 20, 2))
+# Bars of history needed to recompute every rolling indicator for a new bar (Volatility_MA_30 over 30-day volatility)
+INDICATOR_LOOKBACK = 60
+
+def _ewm_warm_up(span):
+    # An EMA never fully forgets its starting value; after 3.5 * (span + 1) bars it weighs under 0.1%
+    return int(np.ceil(3.5 * (span + 1)))
+
+# Bars of history each factor's indicators need before their values at a date are settled
+FACTOR_WARM_UP_BARS = {
+    'Relative Strength Index (RSI)': 15,
+    'Moving Average Convergence/Divergence (MACD)': _ewm_warm_up(26) + _ewm_warm_up(9),
+    'Bollinger Bands': 20,
+    'Moving Average': 30,
+    'Daily Return': 1,
+    'Volatility': INDICATOR_LOOKBACK,
+    'Exponential Moving Average (EMA)': _ewm_warm_up(26),
+    'Log Return': 1,
+}
+
+class TradingPanel:
+    """Dense date x ticker arrays of closes and signals for one simulation."""
+    def __init__(self, dates, tickers, close, present, last_close, rows, date_index, ticker_index):
+        self.dates = dates
+        self.tickers = tickers
+        self.close = close
+        self.present = present
+        self.last_close = last_close
+        # Positions of the source rows that landed in the panel, and the cell each one fills
+        self.rows = rows
+        self.date_index = date_index
+        self.ticker_index = ticker_index
+        self.buy = np.zeros(close.shape, dtype=bool)
+        self.sell = np.zeros(close.shape, dtype=bool)
+
+    def set_signals(self, buy_signal, sell_signal):
+        self.buy[:] = False
+        self.sell[:] = False
+        self.buy[self.date_index, self.ticker_index] = buy_signal[self.rows]
+        self.sell[self.date_index, self.ticker_index] = sell_signal[self.rows]
+
+class SimulationProgress:
+    """One step of a streamed simulation; result is set on the final step only."""
+    def __init__(self, stage, fraction, dates=None, values=None, new_trades=None, result=None):
+        self.stage = stage
+        self.fraction = fraction
+        self.dates = dates
+        self.values = values
+        self.new_trades = new_trades
+        self.result = result
+
+    @property
+    def done(self):
+        return self.result is not None
 
 class BacktestManager:
+    # Set to a SimulationProfiler to time the stages of the simulations that follow
+    profiler = None
+
     def __init__(self, user_id=None):
-        self.db_connection = get_db_connection()
-        self.cursor = self.db_connection.cursor()
+        self.pool = get_pool()
         self.user_id = user_id
 
+    def stage(self, name):
+        return self.profiler.stage(name) if self.profiler else contextlib.nullcontext()
+
     def get_portfolio_id(self, portfolio_name):
         query = """
             SELECT portfolio_id FROM Portfolio
             WHERE user_id = %s AND portfolio_name = %s;
         """
-        self.cursor.execute(query, (self.user_id, portfolio_name))
-        result = self.cursor.fetchone()
+        with self.pool.cursor() as cursor:
+            cursor.execute(query, (self.user_id, portfolio_name))
+            result = cursor.fetchone()
         return result[0] if result else None
     
-    def get_simulation_data(self, portfolio_name):
-        portfolio_id = self.get_portfolio_id(portfolio_name)
-        if not portfolio_id:
-            return [], pd.DataFrame()
+    @staticmethod
+    def warm_up_start(start_date, selected_factors):
+        """The first date to load so the selected factors' indicators are settled by start_date."""
+        if not start_date:
+            return None
+        bars = max((FACTOR_WARM_UP_BARS[factor] for factor in selected_factors or ()), default=0)
+        # About 252 trading days to 365 calendar days, plus a week for holidays
+        days = int(np.ceil(bars * 365 / 252)) + 7 if bars else 0
+        return pd.Timestamp(start_date).date() - timedelta(days=days)
 
-        query = """
-        SELECT sd.stock_name, sd.transaction_date, sd.open_price, sd.high_price, sd.low_price, sd.closing_price, sd.volume, sd.dividends, sd.stock_splits
-        FROM StockData sd
-        JOIN PortfolioStock ps ON sd.stock_data_id = ps.stock_data_id
-        WHERE ps.portfolio_id = %s;
-        """
-        self.cursor.execute(query, (portfolio_id,))
-        rows = self.cursor.fetchall()
+    def portfolio_summary(self, portfolio_name):
+        """The portfolio's PortfolioSummary, from the user's cached summaries."""
+        for summary in portfolio_summaries.load(self.pool, self.user_id):
+            if summary.portfolio_name == portfolio_name:
+                return summary
+        return None
 
-        columns = [desc[0] for desc in self.cursor.description]
-        sim_data = pd.DataFrame(rows, columns=columns)
+    def get_price_histories(self, portfolio_name):
+        """{stock_name: bars} of every ticker in the portfolio, each a BAR_DTYPE array of its whole stored history."""
+        summary = self.portfolio_summary(portfolio_name)
+        if summary is None:
+            return None
 
-        historical_data_list = [group[1] for group in sim_data.groupby('stock_name')]
-        sim_data.sort_values(by='transaction_date', inplace=True)
+        with self.stage("Check price cache (SQL)"), self.pool.cursor() as cursor:
+            # One primary-key lookup per ticker tells whether its cached history is still current
+            cursor.execute("""
+            SELECT pt.stock_name,
+                   (SELECT MAX(sp.transaction_date) FROM StockPrice sp WHERE sp.stock_name = pt.stock_name)
+            FROM PortfolioTicker pt
+            WHERE pt.portfolio_id = %s;
+            """, (summary.portfolio_id,))
+            last_transaction_dates = dict(cursor.fetchall())
+        with self.stage("Load price history"):
+            return price_cache.bars(self.pool, last_transaction_dates)
 
+    def get_simulation_data(self, portfolio_name, start_date=None, end_date=None):
+        """The portfolio's stored rows between start_date and end_date, one frame per ticker plus all of them by date.
+
+        Results are cached by the portfolio's data_version, read fresh with a primary-key lookup so
+        prices stored by the refresh worker are picked up at once; repeating a load costs only that
+        query. The frames are shared and must not be modified.
+        """
+        summary = self.portfolio_summary(portfolio_name)
+        data_version = self.data_version(summary.portfolio_id) if summary else None
+        if data_version is None:
+            return [], pd.DataFrame()
+        cached = simulation_inputs.get(summary.portfolio_id, data_version, start_date, end_date)
+        if cached is not None:
+            return cached
+
+        histories = self.get_price_histories(portfolio_name)
+        with self.stage("Build frames"):
+            sim_data, historical_data_list = history_frames(histories, start_date, end_date)
+            sim_data = sim_data.sort_values(by='transaction_date', kind='stable')
+
+        simulation_inputs.put(summary.portfolio_id, data_version, start_date, end_date, (historical_data_list, sim_data))
         return historical_data_list, sim_data
-    
-    def generate_signals(self, stock_data, selected_factors):
 
+    def data_version(self, portfolio_id):
+        """The portfolio's current data_version, or None if it no longer exists."""
+        with self.pool.cursor() as cursor:
+            cursor.execute("SELECT data_version FROM Portfolio WHERE portfolio_id = %s", (portfolio_id,))
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    def get_all_simulation_data(self, start_date=None, end_date=None):
+        """The user's portfolios as {portfolio_name: [stock_name, ...]}, and {stock_name: rows} for every ticker they hold.
+
+        Each ticker's prices are loaded once, however many portfolios hold it.
+        """
+        with self.pool.cursor() as cursor:
+            cursor.execute("""
+            SELECT p.portfolio_name, pt.stock_name,
+                   (SELECT MAX(sp.transaction_date) FROM StockPrice sp WHERE sp.stock_name = pt.stock_name)
+            FROM Portfolio p
+            JOIN PortfolioTicker pt ON p.portfolio_id = pt.portfolio_id
+            WHERE p.user_id = %s
+            ORDER BY p.portfolio_name, pt.stock_name;
+            """, (self.user_id,))
+            memberships = cursor.fetchall()
+        histories = price_cache.bars(self.pool, {stock_name: last_transaction_date for _, stock_name, last_transaction_date in memberships})
 
-        stock_data['closing_price'] = stock_data['closing_price'].astype(float)
+        portfolio_tickers = {}
+        for portfolio_name, stock_name, _ in memberships:
+            portfolio_tickers.setdefault(portfolio_name, []).append(stock_name)
+        ticker_data = {frame['stock_name'].iloc[0]: frame for frame in history_frames(histories, start_date, end_date)[1]}
+        return portfolio_tickers, ticker_data
+    
+    @staticmethod
+    def add_indicators(stock_data):
         stock_data['Daily_Return'] = stock_data['closing_price'].pct_change()
         stock_data['Log_Return'] = np.log(stock_data['closing_price'] / stock_data['closing_price'].shift(1))
         stock_data['MA_7'] = stock_data['closing_price'].rolling(window=7).mean()
         stock_data['MA_30'] = stock_data['closing_price'].rolling(window=30).mean()
         stock_data['Volatility'] = stock_data['Daily_Return'].rolling(window=30).std()
+        stock_data['Volatility_MA_30'] = stock_data['Volatility'].rolling(window=30).mean()
         delta = stock_data['closing_price'].diff(1)
         gain = delta.where(delta > 0, 0).rolling(window=14).mean()
         loss = -delta.where(delta < 0, 0).rolling(window=14).mean()
@@ -63,141 +211,415 @@ class BacktestManager:
         stock_data['SMA20'] = stock_data['closing_price'].rolling(window=20).mean()
         stock_data['Upper_Band'] = stock_data['SMA20'] + (2 * stock_data['closing_price'].rolling(window=20).std())
         stock_data['Lower_Band'] = stock_data['SMA20'] - (2 * stock_data['closing_price'].rolling(window=20).std())
+        return stock_data
+
+    @staticmethod
+    def extend_indicators(indicator_data, new_data):
+        """Append indicators for bars that follow an add_indicators() frame without recomputing its history."""
+        history = indicator_data.iloc[-INDICATOR_LOOKBACK:][new_data.columns]
+        tail = BacktestManager.add_indicators(pd.concat([history, new_data])).iloc[len(history):].copy()
+
+        # EMAs depend on the whole history, so continue their recursion from the last cached values
+        def continue_ewm(values, previous, span):
+            seeded = pd.Series(np.concatenate([[previous], values])).ewm(span=span, adjust=False).mean()
+            return seeded.to_numpy()[1:]
+
+        closes = tail['closing_price'].to_numpy()
+        tail['EMA12'] = continue_ewm(closes, indicator_data['EMA12'].iloc[-1], 12)
+        tail['EMA26'] = continue_ewm(closes, indicator_data['EMA26'].iloc[-1], 26)
+        tail['MACD'] = tail['EMA12'] - tail['EMA26']
+        tail['MACD_signal'] = continue_ewm(tail['MACD'].to_numpy(), indicator_data['MACD_signal'].iloc[-1], 9)
+        return pd.concat([indicator_data, tail])
+
+    @staticmethod
+    def indicators(stock_data):
+        return indicator_cache.get_indicators(stock_data, BacktestManager.add_indicators, BacktestManager.extend_indicators, INDICATOR_PARAMS)
+
+    @staticmethod
+    def factor_votes(stock_data, selected_factors, rsi_lower_threshold=30, rsi_upper_threshold=70):
+        """Per-factor (buy, sell) boolean vote arrays.
+
+        stock_data is an indicator frame, or a mapping of indicator names to arrays with time
+        on the first axis (for batched paths); the average daily return is taken over time.
+        """
+        conditions = {}
+        if 'Relative Strength Index (RSI)' in selected_factors:
+            conditions['Relative Strength Index (RSI)'] = (stock_data['RSI'] < rsi_lower_threshold, stock_data['RSI'] > rsi_upper_threshold)
+        if 'Moving Average Convergence/Divergence (MACD)' in selected_factors:
+            conditions['Moving Average Convergence/Divergence (MACD)'] = (stock_data['MACD'] > stock_data['MACD_signal'], stock_data['MACD'] < stock_data['MACD_signal'])
+        if 'Bollinger Bands' in selected_factors:
+            conditions['Bollinger Bands'] = (stock_data['closing_price'] < stock_data['Lower_Band'], stock_data['closing_price'] > stock_data['Upper_Band'])
+        if 'Moving Average' in selected_factors:
+            conditions['Moving Average'] = (stock_data['MA_7'] < stock_data['MA_30'], stock_data['MA_7'] > stock_data['MA_30'])
+        if 'Daily Return' in selected_factors:
+            daily_return = stock_data['Daily_Return']
+            daily_return_avg = daily_return.mean() if isinstance(daily_return, pd.Series) else np.nanmean(daily_return, axis=0)
+            conditions['Daily Return'] = (daily_return > daily_return_avg, daily_return < daily_return_avg)
+        if 'Volatility' in selected_factors:
+            conditions['Volatility'] = (stock_data['Volatility'] < stock_data['Volatility_MA_30'], stock_data['Volatility'] > stock_data['Volatility_MA_30'])
+        if 'Exponential Moving Average (EMA)' in selected_factors:
+            conditions['Exponential Moving Average (EMA)'] = (stock_data['EMA12'] > stock_data['EMA26'], stock_data['EMA12'] < stock_data['EMA26'])
+        if 'Log Return' in selected_factors:
+            conditions['Log Return'] = (stock_data['Log_Return'] > 0, stock_data['Log_Return'] < 0)
+
+        # Comparisons against NaN are False, so warm-up bars cast no votes. The first
+        # bar never votes: it has no previous close to compare against.
+        votes = {}
+        for factor, (buy_condition, sell_condition) in conditions.items():
+            buy_vote = np.array(buy_condition, dtype=bool)
+            sell_vote = np.array(sell_condition, dtype=bool)
+            buy_vote[:1] = False
+            sell_vote[:1] = False
+            votes[factor] = (buy_vote, sell_vote)
+        return votes
 
-        stock_data['buy_signal'] = False
-        stock_data['sell_signal'] = False
-        stock_data['Buy_Votes'] = 0
-        stock_data['Sell_Votes'] = 0
-
-        rsi_lower_threshold = 30
-        rsi_upper_threshold = 70
-        daily_return_avg = stock_data['Daily_Return'].mean()
-
-        threshold = round(len(selected_factors) / 3)
-        for i in range(1, len(stock_data)):
-            buy_votes = 0
-            sell_votes = 0
-            if 'Relative Strength Index (RSI)' in selected_factors:
-                if stock_data['RSI'].iloc[i] < rsi_lower_threshold: buy_votes += 1
-                if stock_data['RSI'].iloc[i] > rsi_upper_threshold: sell_votes += 1
-            if 'Moving Average Convergence/Divergence (MACD)' in selected_factors:
-                if stock_data['MACD'].iloc[i] > stock_data['MACD_signal'].iloc[i]: buy_votes += 1
-                if stock_data['MACD'].iloc[i] < stock_data['MACD_signal'].iloc[i]: sell_votes += 1
-            if 'Bollinger Bands' in selected_factors:
-                if stock_data['closing_price'].iloc[i] < stock_data['Lower_Band'].iloc[i]: buy_votes += 1
-                if stock_data['closing_price'].iloc[i] > stock_data['Upper_Band'].iloc[i]: sell_votes += 1
-            if 'Moving Average' in selected_factors:
-                if stock_data['MA_7'].iloc[i] < stock_data['MA_30'].iloc[i]: buy_votes += 1
-                if stock_data['MA_7'].iloc[i] > stock_data['MA_30'].iloc[i]: sell_votes += 1
-            if 'Daily Return' in selected_factors:
-                if stock_data['Daily_Return'].iloc[i] > daily_return_avg: buy_votes += 1
-                if stock_data['Daily_Return'].iloc[i] < daily_return_avg: sell_votes += 1
-            if 'Volatility' in selected_factors:
-                if stock_data['Volatility'].iloc[i] < stock_data['Volatility'].rolling(window=30).mean().iloc[i]: buy_votes += 1
-                if stock_data['Volatility'].iloc[i] > stock_data['Volatility'].rolling(window=30).mean().iloc[i]: sell_votes += 1
-            if 'Exponential Moving Average (EMA)' in selected_factors:
-                if stock_data['EMA12'].iloc[i] > stock_data['EMA26'].iloc[i]: buy_votes += 1
-                if stock_data['EMA12'].iloc[i] < stock_data['EMA26'].iloc[i]: sell_votes += 1
-            if 'Log Return' in selected_factors:
-                if stock_data['Log_Return'].iloc[i] > 0: buy_votes += 1
-                if stock_data['Log_Return'].iloc[i] < 0: sell_votes += 1
-
-            stock_data.loc[stock_data.index[i], 'Buy_Votes'] = buy_votes
-            stock_data.loc[stock_data.index[i], 'Sell_Votes'] = sell_votes
-
-            if buy_votes > sell_votes + threshold:
-                stock_data.loc[stock_data.index[i], 'buy_signal'] = True
-            if sell_votes > buy_votes + threshold:
-                stock_data.loc[stock_data.index[i], 'sell_signal'] = True
+    @staticmethod
+    def tally_votes(votes, selected_factors, shape, threshold=None):
+        if threshold is None:
+            threshold = round(len(selected_factors) / 3)
+        buy_votes = np.zeros(shape, dtype=np.int64)
+        sell_votes = np.zeros(shape, dtype=np.int64)
+        for factor in selected_factors:
+            buy_vote, sell_vote = votes[factor]
+            buy_votes += buy_vote
+            sell_votes += sell_vote
+        return buy_votes, sell_votes, buy_votes > sell_votes + threshold, sell_votes > buy_votes + threshold
+
+    @staticmethod
+    def generate_signals(stock_data, selected_factors, rsi_lower_threshold=30, rsi_upper_threshold=70, threshold=None):
+        stock_data = BacktestManager.indicators(stock_data)
+        votes = BacktestManager.factor_votes(stock_data, selected_factors, rsi_lower_threshold, rsi_upper_threshold)
+        buy_votes, sell_votes, buy_signal, sell_signal = BacktestManager.tally_votes(votes, selected_factors, len(stock_data), threshold)
+
+        stock_data['Buy_Votes'] = buy_votes
+        stock_data['Sell_Votes'] = sell_votes
+        stock_data['buy_signal'] = buy_signal
+        stock_data['sell_signal'] = sell_signal
         return stock_data
 
-    def simulate_trading(self, portfolio_name, initial_fund=10000.00, start_date=None, end_date=None, selected_factors=None):
-        historical_data_list, sim_data = self.get_simulation_data(portfolio_name)
-        sim_data.sort_values('transaction_date', inplace=True)
+    @staticmethod
+    def build_price_panel(sim_data, start_date=None, end_date=None):
+        transaction_dates = pd.to_datetime(sim_data['transaction_date']).to_numpy().astype('datetime64[D]')
+        keep = ~sim_data.duplicated(['stock_name', 'transaction_date']).to_numpy()
+
+        # Final holdings are valued at each ticker's last loaded close; prices are loaded up to end_date,
+        # so that is its last close on or before it
+        last_rows = sim_data.drop_duplicates('stock_name', keep='last').set_index('stock_name')
+
+        if start_date:
+            keep &= transaction_dates >= np.datetime64(start_date, 'D')
+        if end_date:
+            keep &= transaction_dates <= np.datetime64(end_date, 'D')
+        rows = np.flatnonzero(keep)
+
+        dates, date_index = np.unique(transaction_dates[rows], return_inverse=True)
+        tickers, ticker_index = np.unique(sim_data['stock_name'].to_numpy(dtype=str)[rows], return_inverse=True)
+        if not len(rows):
+            tickers = np.unique(sim_data['stock_name'].to_numpy(dtype=str))
 
-        # Ensure start_date and end_date are datetime.date objects for comparison
-        if start_date and end_date:
-            sim_data['transaction_date'] = pd.to_datetime(sim_data['transaction_date']).dt.date
-            start_date = pd.to_datetime(start_date).date() if not isinstance(start_date, datetime.date) else start_date
-            end_date = pd.to_datetime(end_date).date() if not isinstance(end_date, datetime.date) else end_date
-            sim_data = sim_data[(sim_data['transaction_date'] >= start_date) & (sim_data['transaction_date'] <= end_date)]
+        shape = (len(dates), len(tickers))
+        close = np.full(shape, np.nan)
+        present = np.zeros(shape, dtype=bool)
+        close[date_index, ticker_index] = sim_data['closing_price'].to_numpy(dtype=float)[rows]
+        present[date_index, ticker_index] = True
+        last_close = last_rows.loc[tickers, 'closing_price'].to_numpy(dtype=float)
 
-        sim_data_with_signals = pd.concat([self.generate_signals(stock_data, selected_factors) for stock_data in historical_data_list])
-        # Convert 'transaction_date' in sim_data_with_signals to datetime.date for consistent comparison
-        sim_data_with_signals['transaction_date'] = pd.to_datetime(sim_data_with_signals['transaction_date']).dt.date
+        return TradingPanel(dates, tickers, close, present, last_close, rows, date_index, ticker_index)
 
+    @staticmethod
+    def build_trading_panel(sim_data_with_signals, start_date=None, end_date=None):
+        panel = BacktestManager.build_price_panel(sim_data_with_signals, start_date, end_date)
+        panel.set_signals(sim_data_with_signals['buy_signal'].to_numpy(dtype=bool), sim_data_with_signals['sell_signal'].to_numpy(dtype=bool))
+        return panel
+
+    @staticmethod
+    def run_trading_panel(panel, initial_fund, record_trades=True):
+        for _, daily_portfolio_values, trades, shares_held in BacktestManager.iter_trading_panel(panel, initial_fund, record_trades):
+            pass
+        return daily_portfolio_values, trades, shares_held
+
+    @staticmethod
+    def iter_trading_panel(panel, initial_fund, record_trades=True, chunk_days=None):
+        """Run the trading recurrence, yielding (days_done, daily_values, trades, shares_held) every chunk_days days.
+
+        daily_values and the trades ledger are filled in place; only the first days_done values are final.
+        """
         cash_balance = initial_fund
-        shares_held = {data['stock_name'].iloc[0]: 0 for data in historical_data_list}
-        actions = []
-        daily_portfolio_values = []
-
-        unique_dates = sim_data['transaction_date'].unique()  # These are already datetime.date objects
-        for date in unique_dates:
-            daily_data = sim_data[sim_data['transaction_date'] == date]
-            total_buy_signals = 0
-            for stock_name, stock_data in daily_data.groupby('stock_name'):
-                stock_data_signals = sim_data_with_signals[(sim_data_with_signals['stock_name'] == stock_name) &
-                                                            (sim_data_with_signals['transaction_date'] == date)]
-                buy_signals = stock_data_signals[stock_data_signals['buy_signal']]
-                total_buy_signals += len(buy_signals)
-
-            allocation_per_stock = cash_balance / total_buy_signals if total_buy_signals > 0 else 0
-
-            for stock_name, stock_data in daily_data.groupby('stock_name'):
-                stock_data_signals = sim_data_with_signals[(sim_data_with_signals['stock_name'] == stock_name) &
-                                                            (sim_data_with_signals['transaction_date'] == date)]
-                buy_signals = stock_data_signals[stock_data_signals['buy_signal']]
-                sell_signals = stock_data_signals[stock_data_signals['sell_signal']]      
-                if not buy_signals.empty:
-                    for _, row in buy_signals.iterrows():
-                        closing_price = float(row['closing_price'])
+        shares_held = [0] * len(panel.tickers)
+        trades = TradeLedger(panel.dates, panel.tickers)
+        daily_portfolio_values = np.empty(len(panel.dates))
+        chunk_days = chunk_days or max(1, len(panel.dates))
+
+        # Signals are sparse, so gather each day's traded tickers up front. Tickers are
+        # sorted, so walking them in index order keeps the per-day buy/sell/valuation
+        # order (and therefore the float rounding) of the original row loop.
+        trade_days, trade_tickers = np.nonzero(panel.buy | panel.sell)
+        trades_by_day = np.split(trade_tickers, np.searchsorted(trade_days, np.arange(1, len(panel.dates))))
+        buy_counts = panel.buy.sum(axis=1).tolist()
+        close_rows = panel.close.tolist()
+        present_rows = panel.present.tolist()
+        held = []
+
+        for d, traded in enumerate(trades_by_day):
+            close_row = close_rows[d]
+            if len(traded):
+                total_buy_signals = buy_counts[d]
+                allocation_per_stock = cash_balance / total_buy_signals if total_buy_signals > 0 else 0
+                for j in traded.tolist():
+                    closing_price = close_row[j]
+                    if panel.buy[d, j]:
                         num_shares_to_buy = int(allocation_per_stock // closing_price) if allocation_per_stock > 0 else 0
                         if num_shares_to_buy > 0:
                             cost = num_shares_to_buy * closing_price
                             cash_balance -= cost
-                            shares_held[stock_name] += num_shares_to_buy
-                            actions.append(f"{date}: Buy {num_shares_to_buy} shares of {stock_name} at ${closing_price:.2f}, Cost: ${cost:.2f}, Cash Balance: ${cash_balance:.2f}")
-
-                if not sell_signals.empty:
-                    for _, row in sell_signals.iterrows():
-                        closing_price = float(row['closing_price'])
-                        num_shares_to_sell = shares_held[stock_name]
+                            shares_held[j] += num_shares_to_buy
+                            if record_trades:
+                                trades.record(d, j, True, num_shares_to_buy, closing_price, cost, cash_balance)
+                    else:
+                        num_shares_to_sell = shares_held[j]
                         if num_shares_to_sell > 0:
                             sale_proceeds = num_shares_to_sell * closing_price
                             cash_balance += sale_proceeds
-                            shares_held[stock_name] = 0
-                            actions.append(f"{date}: Sell {num_shares_to_sell} shares of {stock_name} at ${closing_price:.2f}, Received: ${sale_proceeds:.2f}, Cash Balance: ${cash_balance:.2f}")
+                            shares_held[j] = 0
+                            if record_trades:
+                                trades.record(d, j, False, num_shares_to_sell, closing_price, sale_proceeds, cash_balance)
+                held = [j for j, shares in enumerate(shares_held) if shares > 0]
 
             date_portfolio_value = cash_balance
-            for stock, shares in shares_held.items():
-                stock_data = sim_data_with_signals[(sim_data_with_signals['stock_name'] == stock) & (sim_data_with_signals['transaction_date'] == date)]
-                if not stock_data.empty:
-                    closing_price = float(stock_data.iloc[0]['closing_price'])
-                    date_portfolio_value += shares * closing_price
-            daily_portfolio_values.append(date_portfolio_value)
+            present_row = present_rows[d]
+            for j in held:
+                if present_row[j]:
+                    date_portfolio_value += shares_held[j] * close_row[j]
+            daily_portfolio_values[d] = date_portfolio_value
+
+            if (d + 1) % chunk_days == 0 and d + 1 < len(panel.dates):
+                yield d + 1, daily_portfolio_values, trades, shares_held
 
+        yield len(panel.dates), daily_portfolio_values, trades, shares_held
+
+    @staticmethod
+    def performance_metrics(daily_portfolio_values, initial_fund):
         days = max(1, len(daily_portfolio_values) - 1)
         final_portfolio_value = daily_portfolio_values[-1]
         annualized_return = ((final_portfolio_value / initial_fund) ** (252 / days)) - 1
 
-        daily_returns = [((daily_portfolio_values[i] - daily_portfolio_values[i - 1]) / daily_portfolio_values[i - 1]) for i in range(1, len(daily_portfolio_values))]
-        excess_daily_returns = [r - (0.02 / 252) for r in daily_returns]
+        daily_returns = (daily_portfolio_values[1:] - daily_portfolio_values[:-1]) / daily_portfolio_values[:-1]
+        excess_daily_returns = daily_returns - (0.02 / 252)
         sharpe_ratio = np.mean(excess_daily_returns) / np.std(excess_daily_returns) * np.sqrt(252)
+        return final_portfolio_value, annualized_return, sharpe_ratio
+
+    def stream_simulation(self, portfolio_name, initial_fund=10000.00, start_date=None, end_date=None, selected_factors=None, chunk_days=63):
+        """Run simulate_trading step by step, yielding a SimulationProgress after each stage and every chunk_days trading days."""
+        yield SimulationProgress("Loading price data...", 0.0)
+        # Rows before start_date are loaded only as indicator warm-up; the panel trades from start_date
+        historical_data_list, _ = self.get_simulation_data(portfolio_name, self.warm_up_start(start_date, selected_factors), end_date)
+
+        signal_frames = []
+        for i, stock_data in enumerate(historical_data_list):
+            yield SimulationProgress(f"Generating signals for {stock_data['stock_name'].iloc[0]}...", 0.05 + 0.25 * i / len(historical_data_list))
+            with self.stage("Generate signals"):
+                signal_frames.append(self.generate_signals(stock_data, selected_factors))
+
+        with self.stage("Build trading panel"):
+            sim_data_with_signals = pd.concat(signal_frames)
+            panel = self.build_trading_panel(sim_data_with_signals, start_date, end_date)
+
+        trading_steps = self.iter_trading_panel(panel, initial_fund, chunk_days=chunk_days)
+        if self.profiler:
+            # Only time spent inside the trading loop counts, not the caller's work between chunks
+            trading_steps = self.profiler.timed_iter("Trading loop", trading_steps)
+        trades_streamed = 0
+        for days_done, daily_portfolio_values, trades, shares_held in trading_steps:
+            if days_done < len(panel.dates):
+                yield SimulationProgress(f"Simulating trades through {panel.dates[days_done - 1]}...", 0.3 + 0.7 * days_done / len(panel.dates),
+                                         panel.dates[:days_done], daily_portfolio_values[:days_done], trades.to_frame(trades_streamed))
+                trades_streamed = len(trades)
+
+        with self.stage("Performance metrics"):
+            final_portfolio_value, annualized_return, sharpe_ratio = self.performance_metrics(daily_portfolio_values, initial_fund)
+            shares_held = np.asarray(shares_held, dtype=np.int64)
+            holding = shares_held > 0
+            result = BacktestResult(initial_fund, panel.dates, daily_portfolio_values, trades,
+                                    panel.tickers[holding], shares_held[holding], panel.last_close[holding],
+                                    final_portfolio_value, annualized_return, sharpe_ratio)
+        yield SimulationProgress("Done", 1.0, panel.dates, daily_portfolio_values, trades.to_frame(trades_streamed), result)
+
+    def simulate_trading(self, portfolio_name, initial_fund=10000.00, start_date=None, end_date=None, selected_factors=None):
+        for progress in self.stream_simulation(portfolio_name, initial_fund, start_date, end_date, selected_factors, chunk_days=None):
+            pass
+        return progress.result
+
+    def sweep(self, portfolio_name, factor_sets=None, rsi_bounds=((30, 70),), thresholds=(None,), initial_fund=10000.00,
+              start_date=None, end_date=None, max_workers=None):
+        """Backtest every combination of factor set, RSI bounds and vote threshold, ranked by Sharpe ratio.
+
+        factor_sets defaults to all 255 non-empty subsets of SIGNAL_FACTORS. A threshold of None
+        uses the simulator's default of a third of the selected factors.
+        """
+        if factor_sets is None:
+            factor_sets = [combination for size in range(1, len(SIGNAL_FACTORS) + 1) for combination in itertools.combinations(SIGNAL_FACTORS, size)]
+        configurations = [(tuple(factors), lower, upper, threshold)
+                          for factors, (lower, upper), threshold in itertools.product(factor_sets, rsi_bounds, thresholds)]
+
+        swept_factors = {factor for factors, _, _, _ in configurations for factor in factors}
+        historical_data_list, _ = self.get_simulation_data(portfolio_name, self.warm_up_start(start_date, swept_factors), end_date)
+        if not historical_data_list or not configurations:
+            return pd.DataFrame(columns=SWEEP_COLUMNS)
+        indicator_frames = [self.indicators(stock_data) for stock_data in historical_data_list]
+        indicator_data = pd.concat(indicator_frames)
+        panel = self.build_price_panel(indicator_data, start_date, end_date)
+        factor_votes = _sweep_factor_votes(indicator_frames, rsi_bounds)
+
+        max_workers = max_workers or BACKTEST_WORKERS
+        if max_workers == 1:
+            _init_sweep_worker(panel, factor_votes, len(indicator_data), initial_fund)
+            rows = _run_sweep_chunk(configurations)
+        else:
+            chunk_size = -(-len(configurations) // (max_workers * 4))
+            chunks = [configurations[i:i + chunk_size] for i in range(0, len(configurations), chunk_size)]
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_sweep_worker,
+                                     initargs=(panel, factor_votes, len(indicator_data), initial_fund)) as pool:
+                rows = [row for chunk_rows in pool.map(_run_sweep_chunk, chunks) for row in chunk_rows]
+
+        ranked = pd.DataFrame(rows, columns=SWEEP_COLUMNS)
+        ranked.sort_values('Sharpe Ratio', ascending=False, na_position='last', kind='stable', inplace=True)
+        ranked.index = pd.RangeIndex(1, len(ranked) + 1, name='Rank')
+        return ranked
+
+    def simulate_all_portfolios(self, initial_fund=10000.00, start_date=None, end_date=None, selected_factors=None, max_workers=None):
+        """Backtest every portfolio of the user with the same settings.
+
+        Returns a comparison table indexed by portfolio name and a frame of daily values
+        with one column per portfolio. Portfolios with no prices in the range are left out.
+        """
+        portfolio_tickers, ticker_data = self.get_all_simulation_data(self.warm_up_start(start_date, selected_factors), end_date)
+        # Portfolios whose tickers have no stored prices are left out, as before
+        portfolio_series = {portfolio_name: [stock_name for stock_name in stock_names if stock_name in ticker_data]
+                            for portfolio_name, stock_names in portfolio_tickers.items()}
+        portfolio_series = {portfolio_name: stock_names for portfolio_name, stock_names in portfolio_series.items() if stock_names}
+        if not portfolio_series:
+            return pd.DataFrame(columns=COMPARISON_COLUMNS), pd.DataFrame()
+
+        # Prices are shared between portfolios, so each ticker's signals are generated once, here, where the
+        # indicator cache lives; workers only get each portfolio's trading panel
+        unique_names = dict.fromkeys(stock_name for stock_names in portfolio_series.values() for stock_name in stock_names)
+        signal_frames = {stock_name: self.generate_signals(ticker_data[stock_name], selected_factors) for stock_name in unique_names}
+        panels = [self.build_trading_panel(pd.concat([signal_frames[stock_name] for stock_name in stock_names]), start_date, end_date)
+                  for stock_names in portfolio_series.values()]
+
+        max_workers = max_workers or BACKTEST_WORKERS
+        if max_workers == 1 or len(panels) == 1:
+            runs = [_run_panel(panel, initial_fund) for panel in panels]
+        else:
+            try:
+                runs = list(_worker_pool(max_workers).map(_run_panel, panels, itertools.repeat(initial_fund)))
+            except BrokenProcessPool:
+                # A worker died; the next call starts a fresh pool
+                _discard_worker_pool(max_workers)
+                raise
+
+        runs = {portfolio_name: run for portfolio_name, run in zip(portfolio_series, runs) if run is not None}
+        if not runs:
+            return pd.DataFrame(columns=COMPARISON_COLUMNS), pd.DataFrame()
+        comparison = pd.DataFrame([metrics for _, _, metrics in runs.values()], columns=COMPARISON_COLUMNS, index=pd.Index(list(runs), name='Portfolio'))
+        daily_values_df = pd.concat([pd.Series(values, index=pd.DatetimeIndex(dates.astype('datetime64[ns]')), name=portfolio_name)
+                                     for portfolio_name, (dates, values, _) in runs.items()], axis=1)
+        return comparison, daily_values_df
+
+    def robustness_test(self, portfolio_name, n_paths=1000, block_size=20, initial_fund=10000.00, start_date=None, end_date=None,
+                        selected_factors=None, seed=None, max_bytes=monte_carlo.MONTE_CARLO_MAX_BYTES):
+        """Run the factor-vote strategy over block-bootstrapped resamples of the portfolio's daily returns.
+
+        Paths are simulated together as (dates x paths x tickers) arrays, max_bytes worth of paths
+        at a time. Returns one row per path with its final value, Sharpe ratio and max drawdown.
+        """
+        # Indicators are recomputed on each synthetic path, so only the range's closes are needed
+        historical_data_list, _ = self.get_simulation_data(portfolio_name, start_date, end_date)
+        if not historical_data_list:
+            return pd.DataFrame(columns=ROBUSTNESS_COLUMNS)
+        panel = self.build_price_panel(pd.concat(historical_data_list), start_date, end_date)
+        if len(panel.dates) < 2:
+            return pd.DataFrame(columns=ROBUSTNESS_COLUMNS)
+
+        # Gaps are filled so every synthetic path can trade every ticker on every date
+        closes = pd.DataFrame(panel.close).ffill().bfill().to_numpy()
+        log_returns = np.log(closes[1:] / closes[:-1])
+        rng = np.random.default_rng(seed)
+        chunk_size = monte_carlo.paths_per_chunk(len(panel.dates), len(panel.tickers), max_bytes)
+
+        metrics = []
+        for start in range(0, n_paths, chunk_size):
+            close = monte_carlo.synthetic_closes(closes[0], log_returns, min(chunk_size, n_paths - start), block_size, rng)
+            votes = self.factor_votes(monte_carlo.path_indicators(close, selected_factors), selected_factors)
+            _, _, buy_signal, sell_signal = self.tally_votes(votes, selected_factors, close.shape)
+            values = monte_carlo.simulate_paths(close, buy_signal, sell_signal, initial_fund)
+            metrics.append(np.column_stack(monte_carlo.path_metrics(values, initial_fund)))
+        return pd.DataFrame(np.concatenate(metrics), columns=ROBUSTNESS_COLUMNS)
+
+
+_sweep_state = {}
+
+
+def _sweep_factor_votes(indicator_frames, rsi_bounds):
+    # Indicators are derived once per ticker; only the RSI votes depend on the swept bounds
+    votes = {}
+    for lower, upper in dict.fromkeys(rsi_bounds):
+        per_ticker = [BacktestManager.factor_votes(stock_data, SIGNAL_FACTORS, lower, upper) for stock_data in indicator_frames]
+        for factor in SIGNAL_FACTORS:
+            key = (factor, lower, upper) if factor == 'Relative Strength Index (RSI)' else factor
+            if key not in votes:
+                votes[key] = (np.concatenate([ticker_votes[factor][0] for ticker_votes in per_ticker]),
+                              np.concatenate([ticker_votes[factor][1] for ticker_votes in per_ticker]))
+    return votes
+
+
+def _init_sweep_worker(panel, factor_votes, length, initial_fund):
+    _sweep_state.update(panel=panel, factor_votes=factor_votes, length=length, initial_fund=initial_fund)
+
+
+def _run_sweep_chunk(configurations):
+    panel = _sweep_state['panel']
+    factor_votes = _sweep_state['factor_votes']
+    initial_fund = _sweep_state['initial_fund']
+    rows = []
+    for factors, lower, upper, threshold in configurations:
+        votes = {factor: factor_votes[(factor, lower, upper) if factor == 'Relative Strength Index (RSI)' else factor] for factor in factors}
+        _, _, buy_signal, sell_signal = BacktestManager.tally_votes(votes, factors, _sweep_state['length'], threshold)
+        panel.set_signals(buy_signal, sell_signal)
+        daily_portfolio_values, _, _ = BacktestManager.run_trading_panel(panel, initial_fund, record_trades=False)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            final_portfolio_value, annualized_return, sharpe_ratio = BacktestManager.performance_metrics(daily_portfolio_values, initial_fund)
+        rows.append((', '.join(factors), lower, upper, round(len(factors) / 3) if threshold is None else threshold,
+                     final_portfolio_value, annualized_return, sharpe_ratio))
+    return rows
+
+
+_worker_pools = {}
+_worker_pools_lock = threading.Lock()
+
+
+def _worker_pool(max_workers):
+    """A pool of max_workers processes, started on first use and shared by every session."""
+    with _worker_pools_lock:
+        pool = _worker_pools.get(max_workers)
+        if pool is None:
+            # Spawned rather than forked, since the Streamlit server runs many threads
+            pool = _worker_pools[max_workers] = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+        return pool
+
+
+def _discard_worker_pool(max_workers):
+    with _worker_pools_lock:
+        pool = _worker_pools.pop(max_workers, None)
+    if pool is not None:
+        pool.shutdown(wait=False)
+
 
-        results = [
-            f"Final Portfolio Value: ${final_portfolio_value:.2f}",
-            f"Annualized Return: {annualized_return * 100:.2f}%",
-            f"Sharpe Ratio: {sharpe_ratio:.2f}",
-            ""
-        ]
-        dates = sim_data['transaction_date'].unique()
-        daily_values_df = pd.DataFrame({'Portfolio Value': daily_portfolio_values}, index=pd.to_datetime(dates))
-
-        final_holdings_value = 0
-        for stock, shares in shares_held.items():
-            if shares > 0:  # Only consider non-zero holdings
-                final_price = sim_data_with_signals[sim_data_with_signals['stock_name'] == stock]['closing_price'].iloc[-1]
-                stock_value = shares * final_price
-                final_holdings_value += stock_value
-                actions.append(f"{shares} shares of {stock} worth ${stock_value:.2f}")
-        return results, actions, daily_values_df
+def _run_panel(panel, initial_fund):
+    if not len(panel.dates):
+        # No bars in the range; the caller leaves the portfolio out
+        return None
+    daily_portfolio_values, _, _ = BacktestManager.run_trading_panel(panel, initial_fund, record_trades=False)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        metrics = BacktestManager.performance_metrics(daily_portfolio_values, initial_fund)
+    return panel.dates, daily_portfolio_values, metrics
@@ -0,0 +1,91 @@
+import threading
+import numpy as np
+
+from src.config.settings import INDICATOR_CACHE_MAX_BYTES
+from src.utils.lru_cache import MemoryBoundedLRU
+
+
+def frame_nbytes(frame):
+    return int(frame.memory_usage(index=True, deep=True).sum())
+
+
+class IndicatorCache:
+    """Process-wide cache of per-ticker indicator frames.
+
+    Entries are keyed by (ticker, first date, last transaction date, bar count, close checksum,
+    indicator parameters), so an unchanged history is a hit no matter which portfolio or session asks
+    for it. When a ticker gains new bars the cached frame for its previous history is
+    extended instead of being recomputed from scratch. Only a history loaded from the same first
+    date is extended; loads start where the selected factors' warm-up needs them to, so each
+    start is tracked separately.
+    """
+
+    def __init__(self, max_bytes):
+        self._frames = MemoryBoundedLRU(max_bytes, frame_nbytes)
+        self._latest = {}
+        self._lock = threading.Lock()
+        self.extensions = 0
+
+    @staticmethod
+    def _key(stock_data, params):
+        dates = stock_data['transaction_date']
+        checksum = float(stock_data['closing_price'].to_numpy(dtype=float).sum())
+        return (stock_data['stock_name'].iloc[0], dates.iloc[0], dates.iloc[-1], len(stock_data), checksum, params)
+
+    @staticmethod
+    def _latest_key(key):
+        # (ticker, first date, indicator parameters)
+        return key[0], key[1], key[5]
+
+    def _cached_prefix(self, key, stock_data):
+        with self._lock:
+            cached_key = self._latest.get(self._latest_key(key))
+        cached = self._frames.peek(cached_key) if cached_key else None
+        if cached is None or len(cached) >= len(stock_data):
+            return None
+        prefix = stock_data.iloc[:len(cached)]
+        if not (np.array_equal(cached['transaction_date'].to_numpy(), prefix['transaction_date'].to_numpy())
+                and np.array_equal(cached['closing_price'].to_numpy(dtype=float), prefix['closing_price'].to_numpy(dtype=float))):
+            return None
+        return cached
+
+    def get_indicators(self, stock_data, compute, extend, params):
+        """Return a copy of stock_data with indicator columns, computing as little as possible.
+
+        compute(stock_data) derives indicators for a full history and extend(cached, new_rows)
+        appends indicators for bars that follow an already cached history.
+        """
+        if stock_data.empty:
+            return compute(stock_data)
+        key = self._key(stock_data, params)
+        indicator_data = self._frames.get(key)
+        if indicator_data is None:
+            cached = self._cached_prefix(key, stock_data)
+            if cached is not None:
+                indicator_data = extend(cached, stock_data.iloc[len(cached):].copy())
+                with self._lock:
+                    self.extensions += 1
+            else:
+                indicator_data = compute(stock_data.copy())
+            if self._frames.put(key, indicator_data):
+                with self._lock:
+                    self._latest[self._latest_key(key)] = key
+                    # Starts whose frames were evicted are forgotten, so the index stays as small as the cache
+                    if len(self._latest) > 2 * len(self._frames):
+                        self._latest = {latest: cached_key for latest, cached_key in self._latest.items() if cached_key in self._frames}
+        indicator_data = indicator_data.copy()
+        indicator_data.index = stock_data.index
+        return indicator_data
+
+    def clear(self):
+        self._frames.clear()
+        with self._lock:
+            self._latest.clear()
+
+    def stats(self):
+        stats = self._frames.stats()
+        stats['extensions'] = self.extensions
+        return stats
+
+
+indicator_cache = IndicatorCache(INDICATOR_CACHE_MAX_BYTES)
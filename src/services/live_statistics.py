@@ -1,24 +1,25 @@
-from src.database.connection import get_db_connection
+from src.database.connection import get_pool
 import streamlit as st
 
 class LiveStatistics:
     def __init__(self):
-        self.db_connection = get_db_connection()
-        self.cursor = self.db_connection.cursor(buffered=True)
+        self.pool = get_pool()
 
     def count_all_portfolios(self):
         query = "SELECT COUNT(*) FROM Portfolio"
-        self.cursor.execute(query)
-        (count,) = self.cursor.fetchone()
+        with self.pool.cursor() as cursor:
+            cursor.execute(query)
+            (count,) = cursor.fetchone()
         return count
 
     def count_all_stocks(self):
         query = """
         SELECT COUNT(DISTINCT stock_name)
-        FROM StockData
+        FROM StockPrice
         """
-        self.cursor.execute(query)
-        (count,) = self.cursor.fetchone()
+        with self.pool.cursor() as cursor:
+            cursor.execute(query)
+            (count,) = cursor.fetchone()
         return count
 
     @staticmethod
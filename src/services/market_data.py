@@ -0,0 +1,156 @@
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from pandas.tseries.holiday import (AbstractHolidayCalendar, GoodFriday, Holiday, USLaborDay, USMartinLutherKingJr, USMemorialDay,
+                                    USPresidentsDay, USThanksgivingDay, nearest_workday, sunday_to_monday)
+
+from src.config.settings import MARKET_DATA_DIR
+
+# First date downloaded for a ticker with no stored prices
+HISTORY_START = "2020-01-01"
+
+HISTORY_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']
+
+
+def empty_history():
+    return pd.DataFrame(columns=HISTORY_COLUMNS, index=pd.DatetimeIndex([], name='Date'))
+
+
+def clean_history(stock_data):
+    """Fill gaps the way the app always has: forward, then backward for leading gaps."""
+    if stock_data.empty:
+        return stock_data
+    stock_data = stock_data.ffill().bfill()
+    if 'Volume' in stock_data:
+        stock_data['Volume'] = stock_data['Volume'].astype('int64')
+    return stock_data
+
+
+class ExchangeHolidayCalendar(AbstractHolidayCalendar):
+    """The NYSE's regular full-day closures.
+
+    Only closures every year are listed; a missing one (a national day of mourning, say) just
+    means its empty download is asked for again, while an extra one would skip a trading day.
+    """
+    rules = [
+        # The exchange stays open on a Friday 31 December when New Year's Day is a Saturday
+        Holiday("New Year's Day", month=1, day=1, observance=sunday_to_monday),
+        USMartinLutherKingJr,
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday('Juneteenth', month=6, day=19, start_date='2022-01-01', observance=nearest_workday),
+        Holiday('Independence Day', month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday('Christmas Day', month=12, day=25, observance=nearest_workday),
+    ]
+
+
+TRADING_CALENDAR = np.busdaycalendar(holidays=ExchangeHolidayCalendar().holidays('2000-01-01', '2100-12-31').to_numpy().astype('datetime64[D]'))
+
+
+def trading_days(start_date, end_date):
+    """The number of exchange trading days from start_date up to end_date (exclusive)."""
+    return int(np.busday_count(start_date, end_date, busdaycal=TRADING_CALENDAR))
+
+
+def synced_through(received_through, today):
+    """How far a download up to today (exclusive) is complete, given the last date it returned bars for.
+
+    yfinance returns no bars rather than raising when a download fails, so only weekends and
+    exchange holidays after the last bar count as having none; missing trading days are asked for again.
+    """
+    if trading_days(received_through + timedelta(days=1), today):
+        return received_through
+    return today - timedelta(days=1)
+
+
+class MarketDataProvider(ABC):
+    """Daily bars for many tickers per call.
+
+    history() returns {ticker: frame} in the layout of yfinance's Ticker.history (a Date index
+    and HISTORY_COLUMNS). end_date is exclusive and defaults to today. A ticker with no bars in
+    the range, or that the source does not know, gets an empty frame. A ticker a batch request
+    failed for is left out, so callers can retry it on its own.
+    """
+    @abstractmethod
+    def history(self, tickers, start_date=HISTORY_START, end_date=None):
+        pass
+
+
+class YFinanceProvider(MarketDataProvider):
+    def history(self, tickers, start_date=HISTORY_START, end_date=None):
+        tickers = list(dict.fromkeys(tickers))
+        # Evaluated per call so a long-running process keeps asking for today
+        end_date = end_date or datetime.now().date()
+        if len(tickers) == 1:
+            stock = yf.Ticker(tickers[0])
+            return {tickers[0]: clean_history(stock.history(start=start_date, end=end_date))}
+        if not tickers:
+            return {}
+
+        # One request for the whole batch, split per ticker afterwards
+        data = yf.download(tickers, start=start_date, end=end_date, group_by='ticker', actions=True,
+                           auto_adjust=True, threads=True, progress=False)
+        downloaded = set(data.columns.get_level_values(0)) if data is not None and not data.empty else set()
+        histories = {}
+        for ticker in tickers:
+            if ticker not in downloaded:
+                continue
+            # The batch shares one date index; drop the dates this ticker did not trade
+            stock_data = data[ticker].dropna(how='all', subset=['Open', 'High', 'Low', 'Close'])
+            # yfinance reports a ticker that failed within a batch as all-NaN columns, not as an error
+            if stock_data.empty:
+                continue
+            histories[ticker] = clean_history(stock_data.copy())
+        return histories
+
+
+class LocalFileProvider(MarketDataProvider):
+    """Bars read from a directory of <ticker>.parquet or <ticker>.csv fixtures, for offline runs, tests and benchmarks.
+
+    Each file holds one ticker's whole history in the Ticker.history layout; save() writes one.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, ticker, extension):
+        return os.path.join(self.directory, quote(ticker, safe='') + extension)
+
+    def read(self, ticker):
+        if os.path.exists(self.path(ticker, '.parquet')):
+            stock_data = pd.read_parquet(self.path(ticker, '.parquet'))
+        elif os.path.exists(self.path(ticker, '.csv')):
+            stock_data = pd.read_csv(self.path(ticker, '.csv'), index_col=0, parse_dates=True)
+        else:
+            return empty_history()
+        stock_data.index = pd.DatetimeIndex(stock_data.index, name='Date')
+        return stock_data
+
+    def save(self, ticker, stock_data, file_format='parquet'):
+        os.makedirs(self.directory, exist_ok=True)
+        stock_data = stock_data.copy()
+        # Dates only; yfinance stamps bars in the exchange's timezone
+        stock_data.index = pd.DatetimeIndex(stock_data.index).tz_localize(None).normalize().rename('Date')
+        if file_format == 'parquet':
+            stock_data.to_parquet(self.path(ticker, '.parquet'))
+        else:
+            stock_data.to_csv(self.path(ticker, '.csv'))
+
+    def history(self, tickers, start_date=HISTORY_START, end_date=None):
+        start, end = pd.Timestamp(start_date), pd.Timestamp(end_date or datetime.now().date())
+        histories = {}
+        for ticker in dict.fromkeys(tickers):
+            stock_data = self.read(ticker)
+            histories[ticker] = clean_history(stock_data[(stock_data.index >= start) & (stock_data.index < end)])
+        return histories
+
+
+def get_provider():
+    return LocalFileProvider(MARKET_DATA_DIR) if MARKET_DATA_DIR else YFinanceProvider()
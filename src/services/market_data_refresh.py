@@ -0,0 +1,149 @@
+"""Keep stored prices current, outside the app.
+
+    python -m src.services.market_data_refresh --once   # run one refresh cycle
+    python -m src.services.market_data_refresh          # run a cycle every MARKET_DATA_REFRESH_INTERVAL seconds
+
+Each cycle refreshes every ticker held in any portfolio exactly once, however many portfolios
+and users hold it, downloading only the days after its TickerSync watermark. Tickers due from the
+same date are downloaded together, MARKET_DATA_BATCH_SIZE at a time. Each ticker's new bars and
+watermark are committed together, so an interrupted cycle resumes where it stopped.
+A MySQL named lock keeps concurrent workers (one per app host, say) from refreshing at once.
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+
+import mysql.connector
+
+from src.config.settings import MARKET_DATA_BATCH_SIZE, MARKET_DATA_REFRESH_INTERVAL
+from src.services.market_data import synced_through, trading_days
+from src.services.portfolio_service import HISTORY_START, PortfolioManager
+
+REFRESH_LOCK = 'backtestai_market_data_refresh'
+
+
+class MarketDataRefresher:
+    def __init__(self, portfolio_manager=None):
+        self.portfolio_manager = portfolio_manager or PortfolioManager()
+        self.pool = self.portfolio_manager.pool
+
+    def due_tickers(self, today):
+        """[(stock_name, first missing date)] for every held ticker not yet synced through yesterday."""
+        with self.pool.cursor() as cursor:
+            # Tickers refreshed before TickerSync existed fall back to their last stored bar
+            cursor.execute("""
+                SELECT held.stock_name, ts.synced_through,
+                       (SELECT MAX(sp.transaction_date) FROM StockPrice sp WHERE sp.stock_name = held.stock_name)
+                FROM (SELECT DISTINCT stock_name FROM PortfolioTicker) held
+                LEFT JOIN TickerSync ts ON ts.stock_name = held.stock_name
+                WHERE ts.synced_through IS NULL OR ts.synced_through < %s
+                ORDER BY held.stock_name
+            """, (today - timedelta(days=1),))
+            rows = cursor.fetchall()
+
+        due = []
+        for stock_name, synced_through, last_transaction_date in rows:
+            watermark = synced_through or last_transaction_date
+            start_date = watermark + timedelta(days=1) if watermark else datetime.strptime(HISTORY_START, '%Y-%m-%d').date()
+            if start_date < today:
+                due.append((stock_name, start_date))
+        return due
+
+    def store_history(self, stock_name, stock_data, start_date, today):
+        """Store stock_name's bars downloaded from start_date up to today with its new watermark; returns the bars added.
+
+        The watermark stops at the last bar received if trading days after it came back empty, so they
+        are asked for again next cycle; a download with no bars at all for such days fails.
+        """
+        received_through = stock_data.index.max().date() if not stock_data.empty else start_date - timedelta(days=1)
+        watermark = synced_through(received_through, today)
+        if stock_data.empty and watermark == received_through:
+            raise ValueError(f"No bars returned for the trading days from {start_date}")
+        histories = {stock_name: stock_data} if not stock_data.empty else {}
+        self.portfolio_manager.ingest_price_history(histories, synced_through={stock_name: watermark})
+        return len(stock_data)
+
+    def refresh_tickers(self, stock_names, start_date, today, refreshed, failed):
+        """Download stock_names from start_date up to today in one batch and store each, recording outcomes in refreshed and failed."""
+        if not trading_days(start_date, today):
+            # Only a weekend or exchange holiday is missing, which has no bars to download
+            self.portfolio_manager.ingest_price_history({}, synced_through={stock_name: today - timedelta(days=1) for stock_name in stock_names})
+            refreshed.update((stock_name, 0) for stock_name in stock_names)
+            return
+        start, end = start_date.strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d')
+        try:
+            histories = self.portfolio_manager.get_stock_histories(stock_names, start, end)
+        except Exception:
+            # A batch that fails outright is retried ticker by ticker, so one bad symbol does not fail the rest
+            histories = {}
+        for stock_name in stock_names:
+            try:
+                # Tickers the batch left out failed within it and are retried on their own as well
+                stock_data = histories[stock_name] if stock_name in histories else self.portfolio_manager.get_stock_data(stock_name, start, end)
+                refreshed[stock_name] = self.store_history(stock_name, stock_data, start_date, today)
+            except Exception as e:
+                # yfinance raises a variety of errors; one bad ticker must not stop the rest
+                failed[stock_name] = str(e)
+
+    def run_cycle(self, today=None):
+        """Refresh every due ticker once. Returns ({stock_name: bars added}, {stock_name: error}), or None if another worker holds the lock."""
+        today = today or datetime.now().date()
+        with self.pool.connection() as lock_connection:
+            lock_cursor = lock_connection.cursor()
+            lock_cursor.execute("SELECT GET_LOCK(%s, 0)", (REFRESH_LOCK,))
+            if not lock_cursor.fetchone()[0]:
+                lock_cursor.close()
+                return None
+            try:
+                refreshed, failed = {}, {}
+                by_start_date = {}
+                for stock_name, start_date in self.due_tickers(today):
+                    by_start_date.setdefault(start_date, []).append(stock_name)
+                for start_date, stock_names in sorted(by_start_date.items()):
+                    for batch in range(0, len(stock_names), MARKET_DATA_BATCH_SIZE):
+                        self.refresh_tickers(stock_names[batch:batch + MARKET_DATA_BATCH_SIZE], start_date, today, refreshed, failed)
+                return refreshed, failed
+            finally:
+                lock_cursor.execute("SELECT RELEASE_LOCK(%s)", (REFRESH_LOCK,))
+                lock_cursor.fetchone()
+                lock_cursor.close()
+
+
+def report(outcome):
+    if outcome is None:
+        print("Another refresh is running; skipped this cycle.")
+        return
+    refreshed, failed = outcome
+    for stock_name, error in failed.items():
+        print(f"  {stock_name}: {error}", file=sys.stderr)
+    print(f"{datetime.now():%Y-%m-%d %H:%M:%S} refreshed {len(refreshed)} ticker(s), "
+          f"{sum(refreshed.values())} new bar(s), {len(failed)} failure(s).")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh stored market data for every held ticker.")
+    parser.add_argument('--once', action='store_true', help="Run a single cycle and exit.")
+    parser.add_argument('--interval', type=float, default=MARKET_DATA_REFRESH_INTERVAL, help="Seconds between cycles.")
+    args = parser.parse_args(argv)
+
+    refresher = MarketDataRefresher()
+    while True:
+        started = time.monotonic()
+        try:
+            report(refresher.run_cycle())
+        except mysql.connector.Error as e:
+            # The database may be back by the next cycle
+            print(f"Refresh cycle failed: {e}", file=sys.stderr)
+            if args.once:
+                return 1
+        if args.once:
+            return 0
+        try:
+            time.sleep(max(0.0, args.interval - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+import numpy as np
+
+from src.config.settings import MONTE_CARLO_MAX_BYTES
+
+# Peak number of float64 (dates x tickers) arrays held per path while a chunk runs:
+# synthetic closes, the indicators behind the selected factors, votes and trading state
+ARRAYS_PER_PATH = 28
+
+
+def paths_per_chunk(n_dates, n_tickers, max_bytes=MONTE_CARLO_MAX_BYTES):
+    return max(1, int(max_bytes // (ARRAYS_PER_PATH * 8 * max(1, n_dates) * max(1, n_tickers))))
+
+
+def block_bootstrap(log_returns, n_paths, block_size, rng):
+    """Resample whole dates in blocks of block_size, returning an array of shape (dates, paths, tickers).
+
+    Every ticker draws from the same dates, so cross-sectional correlation is kept.
+    """
+    n_dates = len(log_returns)
+    block_size = max(1, min(block_size, n_dates))
+    n_blocks = -(-n_dates // block_size)
+    starts = rng.integers(0, n_dates - block_size + 1, size=(n_paths, n_blocks))
+    dates = (starts[:, :, None] + np.arange(block_size)).reshape(n_paths, -1)[:, :n_dates]
+    return log_returns[dates.T]
+
+
+def synthetic_closes(first_close, log_returns, n_paths, block_size, rng):
+    resampled = block_bootstrap(log_returns, n_paths, block_size, rng)
+    growth = np.concatenate([np.zeros((1, n_paths, len(first_close))), np.cumsum(resampled, axis=0)])
+    return first_close * np.exp(growth)
+
+
+def _window_sums(values, window):
+    # Trailing sums along time. NaNs only ever lead a series (indicator warm-up), so the
+    # result is NaN until a full window of valid dates has been seen.
+    warm_up = int(np.isnan(values).any(axis=tuple(range(1, values.ndim))).sum())
+    result = np.full(values.shape, np.nan)
+    if warm_up + window > len(values):
+        return result
+    sums = np.cumsum(values[warm_up:], axis=0)
+    sums[window:] -= sums[:-window].copy()
+    result[warm_up + window - 1:] = sums[window - 1:]
+    return result
+
+
+def rolling_mean(values, window):
+    return _window_sums(values, window) / window
+
+
+def rolling_std(values, window):
+    mean = rolling_mean(values, window)
+    squares = _window_sums(values * values, window)
+    variance = (squares - window * mean * mean) / (window - 1)
+    return np.sqrt(np.maximum(variance, 0.0))
+
+
+def ewm(values, span):
+    alpha = 2 / (span + 1)
+    result = np.empty(values.shape)
+    result[0] = values[0]
+    for t in range(1, len(values)):
+        result[t] = (1 - alpha) * result[t - 1] + alpha * values[t]
+    return result
+
+
+def path_indicators(close, selected_factors):
+    """The indicators of BacktestManager.add_indicators needed by selected_factors, over (dates, paths, tickers) closes."""
+    indicators = {'closing_price': close}
+    previous = np.concatenate([np.full((1,) + close.shape[1:], np.nan), close[:-1]])
+    if {'Daily Return', 'Volatility'} & set(selected_factors):
+        indicators['Daily_Return'] = close / previous - 1
+    if 'Log Return' in selected_factors:
+        indicators['Log_Return'] = np.log(close / previous)
+    if 'Moving Average' in selected_factors:
+        indicators['MA_7'] = rolling_mean(close, 7)
+        indicators['MA_30'] = rolling_mean(close, 30)
+    if 'Volatility' in selected_factors:
+        indicators['Volatility'] = rolling_std(indicators['Daily_Return'], 30)
+        indicators['Volatility_MA_30'] = rolling_mean(indicators['Volatility'], 30)
+    if 'Relative Strength Index (RSI)' in selected_factors:
+        delta = close - previous
+        gain = rolling_mean(np.where(delta > 0, delta, 0.0), 14)
+        loss = rolling_mean(np.where(delta < 0, -delta, 0.0), 14)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            indicators['RSI'] = 100 - (100 / (1 + gain / loss))
+    if {'Exponential Moving Average (EMA)', 'Moving Average Convergence/Divergence (MACD)'} & set(selected_factors):
+        indicators['EMA12'] = ewm(close, 12)
+        indicators['EMA26'] = ewm(close, 26)
+    if 'Moving Average Convergence/Divergence (MACD)' in selected_factors:
+        indicators['MACD'] = indicators['EMA12'] - indicators['EMA26']
+        indicators['MACD_signal'] = ewm(indicators['MACD'], 9)
+    if 'Bollinger Bands' in selected_factors:
+        sma20 = rolling_mean(close, 20)
+        std20 = rolling_std(close, 20)
+        indicators['Upper_Band'] = sma20 + 2 * std20
+        indicators['Lower_Band'] = sma20 - 2 * std20
+    return indicators
+
+
+def simulate_paths(close, buy, sell, initial_fund):
+    """The simulate_trading allocation rules applied to every path at once; returns daily values of shape (dates, paths)."""
+    n_dates, n_paths, n_tickers = close.shape
+    cash = np.full(n_paths, float(initial_fund))
+    shares = np.zeros((n_paths, n_tickers))
+    values = np.empty((n_dates, n_paths))
+    for t in range(n_dates):
+        price = close[t]
+        buy_count = buy[t].sum(axis=1)
+        allocation = np.divide(cash, buy_count, out=np.zeros(n_paths), where=buy_count > 0)
+        bought = np.where(buy[t], np.floor(allocation[:, None] / price), 0.0)
+        cash -= (bought * price).sum(axis=1)
+        shares += bought
+        sold = sell[t] & (shares > 0)
+        cash += np.where(sold, shares * price, 0.0).sum(axis=1)
+        shares[sold] = 0.0
+        values[t] = cash + (shares * price).sum(axis=1)
+    return values
+
+
+def path_metrics(values, initial_fund):
+    """Final value, Sharpe ratio and max drawdown of each path in a (dates, paths) value array."""
+    daily_returns = values[1:] / values[:-1] - 1
+    excess_daily_returns = daily_returns - (0.02 / 252)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe_ratio = excess_daily_returns.mean(axis=0) / excess_daily_returns.std(axis=0) * np.sqrt(252)
+    max_drawdown = (values / np.maximum.accumulate(values, axis=0) - 1).min(axis=0)
+    return values[-1], sharpe_ratio, max_drawdown
@@ -1,53 +1,70 @@
 import numpy as np
-import yfinance as yf
 import mysql.connector
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from src.database.connection import get_db_connection
+from src.config.settings import INGEST_BATCH_ROWS, MARKET_DATA_WORKERS
+from src.database.connection import get_pool
+from src.services.market_data import HISTORY_START, get_provider, synced_through
+from src.services.portfolio_summary import portfolio_summaries
+from src.services.price_cache import price_cache
+
+PRICE_INSERT = """
+    INSERT INTO StockPrice (stock_name, transaction_date, open_price, high_price, low_price, closing_price, volume, dividends, stock_splits)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+    open_price = VALUES(open_price), high_price = VALUES(high_price),
+    low_price = VALUES(low_price), closing_price = VALUES(closing_price),
+    volume = VALUES(volume), dividends = VALUES(dividends), stock_splits = VALUES(stock_splits)
+"""
+
+# Prices of a ticker are complete through synced_through; only ever moves forward
+SYNC_UPSERT = """
+    INSERT INTO TickerSync (stock_name, synced_through, synced_at)
+    VALUES (%s, %s, NOW())
+    ON DUPLICATE KEY UPDATE synced_through = GREATEST(synced_through, VALUES(synced_through)), synced_at = VALUES(synced_at)
+"""
+
+# Marks a change to a portfolio's simulation inputs; see migrations/004_portfolio_data_version.sql
+VERSION_BUMP = "UPDATE Portfolio SET data_version = data_version + 1 WHERE portfolio_id = %s"
 
 class PortfolioManager:
-    def __init__(self, user_id=None):
-        self.db_connection = get_db_connection()
-        self.cursor = self.db_connection.cursor()
+    def __init__(self, user_id=None, provider=None):
+        self.pool = get_pool()
         self.user_id = user_id
+        self.provider = provider or get_provider()
 
-    def get_stock_data(self, stock_name, start_date="2020-01-01", end_date=datetime.now().date()):
-        stock = yf.Ticker(stock_name)
-        df = stock.history(start=start_date, end=end_date)
-        if df.empty:
-            return df
-        df.ffill(inplace=True)
-        df.bfill(inplace=True)
-        return df
-    
-    def is_valid_ticker(self, ticker_symbol):
-        stock = yf.Ticker(ticker_symbol)
-        # Check if the ticker symbol returns any historical data
-        try:
-            return not stock.history(period="5d").empty
-        except:
-            return False
+    def get_stock_data(self, stock_name, start_date=HISTORY_START, end_date=None):
+        # end_date is exclusive and defaults to today
+        return self.get_stock_histories([stock_name], start_date, end_date)[stock_name]
+
+    def get_stock_histories(self, stock_names, start_date=HISTORY_START, end_date=None):
+        """{stock_name: history frame} for all stock_names, downloaded in one batch."""
+        return self.provider.history(stock_names, start_date, end_date)
     
     def get_portfolio_id(self, portfolio_name):
         query = """
             SELECT portfolio_id FROM Portfolio
             WHERE user_id = %s AND portfolio_name = %s;
         """
-        self.cursor.execute(query, (self.user_id, portfolio_name))
-        result = self.cursor.fetchone()
+        with self.pool.cursor() as cursor:
+            cursor.execute(query, (self.user_id, portfolio_name))
+            result = cursor.fetchone()
         return result[0] if result else None
     
     def add_portfolio(self, portfolio_name, description=None):
         creation_date = datetime.now()
-        self.cursor.execute("SELECT COUNT(*) FROM Portfolio WHERE user_id = %s AND portfolio_name = %s", (self.user_id, portfolio_name,))
-        if self.cursor.fetchone()[0] > 0:
-            return False, f"Portfolio '{portfolio_name}' already exists."
+        with self.pool.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM Portfolio WHERE user_id = %s AND portfolio_name = %s", (self.user_id, portfolio_name,))
+            if cursor.fetchone()[0] > 0:
+                return False, f"Portfolio '{portfolio_name}' already exists."
         try:
-            self.cursor.execute(
-                "INSERT INTO Portfolio (user_id, portfolio_name, creation_date, description) VALUES (%s, %s, %s, %s)",
-                (self.user_id, portfolio_name, creation_date, description)
-            )
-            self.db_connection.commit()
+            with self.pool.transaction() as cursor:
+                cursor.execute(
+                    "INSERT INTO Portfolio (user_id, portfolio_name, creation_date, description) VALUES (%s, %s, %s, %s)",
+                    (self.user_id, portfolio_name, creation_date, description)
+                )
+            portfolio_summaries.invalidate(self.user_id)
             return True, f"Portfolio '{portfolio_name}' successfully created."
         except mysql.connector.Error as err:
             return False, f"Failed to create portfolio '{portfolio_name}': {str(err)}"
@@ -57,164 +74,243 @@ class PortfolioManager:
             portfolio_id = self.get_portfolio_id(portfolio_name)
             if portfolio_id:
                 delete_query = "DELETE FROM Portfolio WHERE user_id = %s AND portfolio_id = %s"
-                self.cursor.execute(delete_query, (self.user_id, portfolio_id,))
-                self.db_connection.commit()
+                with self.pool.transaction() as cursor:
+                    cursor.execute(delete_query, (self.user_id, portfolio_id,))
+                portfolio_summaries.invalidate(self.user_id)
                 return True, f"Portfolio '{portfolio_name}' and all associated stocks have been removed successfully."
             else:
                 return False, f"Portfolio '{portfolio_name}' does not exist."
         except Exception as e:
             return False, f"Failed to remove portfolio '{portfolio_name}': {str(e)}"
 
+    def create_portfolio_with_stocks(self, portfolio_name, description=None, stock_symbols=(), progress=None):
+        """Create a portfolio already holding stock_symbols, committed as one unit of work.
+
+        Returns (success, message, {stock_symbol: (success, message)}). Invalid tickers are left
+        out and reported; if any write fails, nothing is kept, not even the portfolio.
+        """
+        stock_symbols = list(dict.fromkeys(stock_symbols))
+        with self.pool.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM Portfolio WHERE user_id = %s AND portfolio_name = %s", (self.user_id, portfolio_name,))
+            if cursor.fetchone()[0] > 0:
+                return False, f"Portfolio '{portfolio_name}' already exists.", {}
+
+        results, histories, synced_through = self.download_stocks(stock_symbols, progress)
+        added = [stock_symbol for stock_symbol in stock_symbols if results[stock_symbol] is None]
+        try:
+            with self.pool.unit_of_work() as work:
+                portfolio_id = work.execute(
+                    "INSERT INTO Portfolio (user_id, portfolio_name, creation_date, description) VALUES (%s, %s, %s, %s)",
+                    (self.user_id, portfolio_name, datetime.now(), description)
+                ).lastrowid
+                self.write_price_history(work, histories, [(portfolio_id, stock_symbol) for stock_symbol in added], synced_through)
+                work.after_commit(lambda: portfolio_summaries.invalidate(self.user_id))
+        except mysql.connector.Error as err:
+            return False, f"Failed to create portfolio '{portfolio_name}': {str(err)}", {}
+        for stock_symbol in added:
+            results[stock_symbol] = (True, f"Stock '{stock_symbol}' data added and linked to portfolio '{portfolio_name}'.")
+        return True, f"Portfolio '{portfolio_name}' successfully created.", results
+
     def add_stock_to_portfolio(self, portfolio_name, stock_symbol):
+        return self.add_stocks_to_portfolio(portfolio_name, [stock_symbol])[stock_symbol]
+
+    def add_stocks_to_portfolio(self, portfolio_name, stock_symbols, progress=None):
+        """Add several tickers at once; returns {stock_symbol: (success, message)} in the order given.
+
+        Prices are downloaded as in download_stocks, and everything downloaded is then written
+        in one unit of work.
+        """
+        stock_symbols = list(dict.fromkeys(stock_symbols))
         portfolio_id = self.get_portfolio_id(portfolio_name)
         if not portfolio_id:
-            return False, f"Portfolio '{portfolio_name}' does not exist."
-        if not self.is_valid_ticker(stock_symbol):
-            return False, f"Invalid stock: '{stock_symbol}'."
+            return {stock_symbol: (False, f"Portfolio '{portfolio_name}' does not exist.") for stock_symbol in stock_symbols}
+        existing_stocks = set(self.fetch_all_stocks(portfolio_id))
+        candidates = [stock_symbol for stock_symbol in stock_symbols if stock_symbol not in existing_stocks]
+        results, histories, synced_through = self.download_stocks(candidates, progress)
+        for stock_symbol in stock_symbols:
+            if stock_symbol in existing_stocks:
+                results[stock_symbol] = (False, f"Stock '{stock_symbol}' is already in the portfolio '{portfolio_name}'.")
+        results = {stock_symbol: results[stock_symbol] for stock_symbol in stock_symbols}
+
+        added = [stock_symbol for stock_symbol in stock_symbols if results[stock_symbol] is None]
+        if added:
+            try:
+                self.ingest_price_history(histories, [(portfolio_id, stock_symbol) for stock_symbol in added], synced_through)
+            except mysql.connector.Error as err:
+                return {stock_symbol: result or (False, f"Failed to add stock '{stock_symbol}': {str(err)}") for stock_symbol, result in results.items()}
+        for stock_symbol in added:
+            results[stock_symbol] = (True, f"Stock '{stock_symbol}' data added and linked to portfolio '{portfolio_name}'.")
+        return results
+
+    def download_stocks(self, stock_symbols, progress=None):
+        """Fetch the prices stock_symbols lack, concurrently on up to MARKET_DATA_WORKERS threads.
+
+        Returns ({stock_symbol: None, or (False, message) if it cannot be added}, {stock_symbol: new bars},
+        {stock_symbol: synced-through date}). progress(stock_symbol, done, total) is called from
+        the calling thread as each download finishes.
+        """
+        results = {stock_symbol: None for stock_symbol in stock_symbols}
+        # Prices are shared between portfolios, so a ticker someone already holds only needs its newest bars
+        last_transaction_dates = self.last_price_dates(list(stock_symbols))
+        today = datetime.now().date()
+        downloads = {}
+        for stock_symbol in stock_symbols:
+            last_transaction_date = last_transaction_dates.get(stock_symbol)
+            if last_transaction_date is None:
+                downloads[stock_symbol] = ()
+            elif last_transaction_date + timedelta(days=1) < today:
+                downloads[stock_symbol] = ((last_transaction_date + timedelta(days=1)).strftime('%Y-%m-%d'), today)
+
+        histories = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(MARKET_DATA_WORKERS, len(downloads)))) as executor:
+            futures = {executor.submit(self.get_stock_data, stock_symbol, *date_range): stock_symbol for stock_symbol, date_range in downloads.items()}
+            for done, future in enumerate(as_completed(futures), 1):
+                stock_symbol = futures[future]
+                try:
+                    stock_data = future.result()
+                except Exception:
+                    stock_data = None
+                if stock_data is not None and not stock_data.empty:
+                    histories[stock_symbol] = stock_data
+                elif not downloads[stock_symbol]:
+                    # The full download doubles as the validity check: an unknown symbol has no history
+                    results[stock_symbol] = (False, f"Invalid stock: '{stock_symbol}'.")
+                # A failed update of a ticker with stored prices is left to the refresh worker
+                if progress:
+                    progress(stock_symbol, done, len(downloads))
+
+        return results, histories, {stock_symbol: synced_through(stock_data.index.max().date(), today) for stock_symbol, stock_data in histories.items()}
         
-        existing_stocks = self.fetch_all_stocks(portfolio_id)
-        if stock_symbol in existing_stocks:
-            return False, f"Stock '{stock_symbol}' is already in the portfolio '{portfolio_name}'."
-        stock_data = self.get_stock_data(stock_symbol)
-        if stock_data.empty:
-            return False, "No data available for '{stock_symbol}'."
-
-        for index, row in stock_data.iterrows():
-            stock_splits = row['Stock Splits'] if 'Stock Splits' in row else 0
-            # Insert stock data into StockData table
-            self.cursor.execute("""
-                INSERT INTO StockData (stock_name, transaction_date, open_price, high_price, low_price, closing_price, volume, dividends, stock_splits)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE 
-                open_price = VALUES(open_price), high_price = VALUES(high_price),
-                low_price = VALUES(low_price), closing_price = VALUES(closing_price),
-                volume = VALUES(volume), dividends = VALUES(dividends), stock_splits = VALUES(stock_splits)
-            """, (stock_symbol, index.date(), row['Open'], row['High'], row['Low'], row['Close'], row['Volume'], row['Dividends'], stock_splits))
-            self.db_connection.commit()
-
-            # Link the latest stock_data_id with the portfolio
-            stock_data_id = self.cursor.lastrowid
-            self.cursor.execute("""
-                INSERT INTO PortfolioStock (portfolio_id, stock_data_id)
+    @staticmethod
+    def price_rows(stock_symbol, stock_data):
+        """StockPrice rows for a yfinance history frame, built column by column instead of with iterrows()."""
+        count = len(stock_data)
+        zeros = [0] * count
+        return list(zip(
+            [stock_symbol] * count,
+            stock_data.index.date.tolist(),
+            stock_data['Open'].tolist(),
+            stock_data['High'].tolist(),
+            stock_data['Low'].tolist(),
+            stock_data['Close'].tolist(),
+            stock_data['Volume'].tolist(),
+            stock_data['Dividends'].tolist() if 'Dividends' in stock_data else zeros,
+            stock_data['Stock Splits'].tolist() if 'Stock Splits' in stock_data else zeros,
+        ))
+
+    def last_price_dates(self, stock_symbols):
+        """{stock_symbol: last stored transaction date} for the symbols that have stored prices."""
+        if not stock_symbols:
+            return {}
+        placeholders = ', '.join(['%s'] * len(stock_symbols))
+        with self.pool.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT stock_name, MAX(transaction_date) FROM StockPrice
+                WHERE stock_name IN ({placeholders})
+                GROUP BY stock_name
+            """, tuple(stock_symbols))
+            return dict(cursor.fetchall())
+
+    def ingest_price_history(self, histories, memberships=(), synced_through=None):
+        """Upsert the bars of {stock_symbol: yfinance frame} and add (portfolio_id, stock_symbol) memberships in one unit of work."""
+        with self.pool.unit_of_work() as work:
+            self.write_price_history(work, histories, memberships, synced_through)
+
+    def write_price_history(self, work, histories, memberships=(), synced_through=None):
+        """The writes of ingest_price_history, as part of a larger unit of work.
+
+        synced_through, {stock_symbol: date}, advances the tickers' TickerSync watermarks in the same transaction,
+        which also bumps the data_version of the portfolios gaining a ticker and of every portfolio holding one of the tickers.
+        Bars go out in multi-row INSERTs of INGEST_BATCH_ROWS rows. Everything is rolled back if any statement fails.
+        Once committed, the tickers' local price cache files are rewritten, and the cached summaries
+        of this user and of every user holding the tickers are dropped.
+        """
+        for stock_symbol, stock_data in histories.items():
+            rows = self.price_rows(stock_symbol, stock_data)
+            for start in range(0, len(rows), INGEST_BATCH_ROWS):
+                work.executemany(PRICE_INSERT, rows[start:start + INGEST_BATCH_ROWS])
+        if memberships:
+            work.executemany("""
+                INSERT INTO PortfolioTicker (portfolio_id, stock_name)
                 VALUES (%s, %s)
-                ON DUPLICATE KEY UPDATE stock_data_id = VALUES(stock_data_id)
-            """, (portfolio_id, stock_data_id))
-            self.db_connection.commit()
-        return True, f"Stock '{stock_symbol}' data added and linked to portfolio '{portfolio_name}'."
-        
+                ON DUPLICATE KEY UPDATE stock_name = VALUES(stock_name)
+            """, list(memberships))
+            work.executemany(VERSION_BUMP, [(portfolio_id,) for portfolio_id in sorted({portfolio_id for portfolio_id, _ in memberships})])
+            work.after_commit(lambda: portfolio_summaries.invalidate(self.user_id))
+        if histories:
+            placeholders = ', '.join(['%s'] * len(histories))
+            work.execute(f"""
+                UPDATE Portfolio p JOIN PortfolioTicker pt ON pt.portfolio_id = p.portfolio_id
+                SET p.data_version = p.data_version + 1
+                WHERE pt.stock_name IN ({placeholders})
+            """, tuple(histories))
+            work.after_commit(lambda: self.refresh_cached_prices(list(histories)))
+        if synced_through:
+            work.executemany(SYNC_UPSERT, list(synced_through.items()))
+
+    def refresh_cached_prices(self, stock_symbols):
+        portfolio_summaries.invalidate_tickers(stock_symbols)
+        # Rewrite the local price cache of the changed tickers from what was stored
+        try:
+            price_cache.fetch(self.pool, stock_symbols)
+        except mysql.connector.Error:
+            price_cache.invalidate(stock_symbols)
+
     def remove_stock_from_portfolio(self, portfolio_name, stock_symbol):
-    # Fetch the portfolio_id
+        return self.remove_stocks_from_portfolio(portfolio_name, [stock_symbol])[stock_symbol]
+
+    def remove_stocks_from_portfolio(self, portfolio_name, stock_symbols):
+        """Remove several tickers with one DELETE in one unit of work; returns {stock_symbol: (success, message)}."""
+        stock_symbols = list(dict.fromkeys(stock_symbols))
         portfolio_id = self.get_portfolio_id(portfolio_name)
         if not portfolio_id:
-            return False, f"Portfolio '{portfolio_name}' does not exist."
+            return {stock_symbol: (False, f"Portfolio '{portfolio_name}' does not exist.") for stock_symbol in stock_symbols}
+        if not stock_symbols:
+            return {}
 
+        placeholders = ', '.join(['%s'] * len(stock_symbols))
         try:
-            # Fetch stock_data_ids associated with this stock_name
-            self.cursor.execute("""
-                SELECT sd.stock_data_id 
-                FROM StockData sd
-                JOIN PortfolioStock ps ON sd.stock_data_id = ps.stock_data_id
-                WHERE sd.stock_name = %s AND ps.portfolio_id = %s
-            """, (stock_symbol, portfolio_id))
-
-            stock_data_ids = [row[0] for row in self.cursor.fetchall()]
-
-            if not stock_data_ids:
-                return False, f"No data for stock '{stock_symbol}' in portfolio '{portfolio_name}'."
-
-            # Remove associations from PortfolioStock
-            for stock_data_id in stock_data_ids:
-                self.cursor.execute("""
-                    DELETE FROM PortfolioStock 
-                    WHERE portfolio_id = %s AND stock_data_id = %s
-                """, (portfolio_id, stock_data_id))
-                self.db_connection.commit()
-
-            return True, f"Stock '{stock_symbol}' removed from portfolio '{portfolio_name}'."
+            # Prices stay in StockPrice for any other portfolio holding the tickers
+            with self.pool.unit_of_work() as work:
+                held = {row[0] for row in work.execute(f"""
+                    SELECT stock_name FROM PortfolioTicker
+                    WHERE portfolio_id = %s AND stock_name IN ({placeholders})
+                    FOR UPDATE
+                """, (portfolio_id, *stock_symbols)).fetchall()}
+                if held:
+                    removed = sorted(held)
+                    work.execute(f"""
+                        DELETE FROM PortfolioTicker
+                        WHERE portfolio_id = %s AND stock_name IN ({', '.join(['%s'] * len(removed))})
+                    """, (portfolio_id, *removed))
+                    work.execute(VERSION_BUMP, (portfolio_id,))
+                    work.after_commit(lambda: portfolio_summaries.invalidate(self.user_id))
         except Exception as e:
-            return False, str(e)
+            return {stock_symbol: (False, str(e)) for stock_symbol in stock_symbols}
+        return {stock_symbol: (True, f"Stock '{stock_symbol}' removed from portfolio '{portfolio_name}'.") if stock_symbol in held
+                else (False, f"No data for stock '{stock_symbol}' in portfolio '{portfolio_name}'.")
+                for stock_symbol in stock_symbols}
         
-    def get_last_login_date(self, user_id):
-        """Retrieve the last login date of a user."""
-        query = "SELECT last_login FROM User WHERE user_id = %s"
-        try:
-            self.cursor.execute(query, (user_id,))
-            last_login = self.cursor.fetchone()[0]
-            return last_login
-        except mysql.connector.Error as err:
-            return None
-
-    def update_stock_data(self):
-        today = datetime.now().date()
-        last_login = self.get_last_login_date(self.user_id)  # You need to implement this method
-
-        # Check if last login is more than two days before today
-        if last_login and (today - last_login.date()).days > 2:
-            self.cursor.execute("SELECT DISTINCT ps.portfolio_id FROM PortfolioStock ps JOIN Portfolio p ON ps.portfolio_id = p.portfolio_id WHERE p.user_id = %s", (self.user_id,))
-            portfolio_ids = [item[0] for item in self.cursor.fetchall()]
-
-            for portfolio_id in portfolio_ids:
-                self.cursor.execute("""
-                    SELECT DISTINCT sd.stock_name, MAX(sd.transaction_date) as last_transaction_date
-                    FROM StockData sd
-                    JOIN PortfolioStock ps ON sd.stock_data_id = ps.stock_data_id
-                    WHERE ps.portfolio_id = %s
-                    GROUP BY sd.stock_name
-                """, (portfolio_id,))
-                
-                stocks_data = self.cursor.fetchall()
-
-                for stock_name, last_transaction_date in stocks_data:
-                    if last_transaction_date is not None:
-                        # Only update from the day after the last transaction date to today
-                        start_date = (last_transaction_date + timedelta(days=1)).strftime('%Y-%m-%d')
-                    else:
-                        # If there's no transaction data, use a default start date
-                        start_date = "2020-01-01"
-                    
-                    stock_data = self.get_stock_data(stock_name, start_date, today.strftime('%Y-%m-%d'))
-                    if not stock_data.empty:
-                        for index, row in stock_data.iterrows():
-                            self.cursor.execute("""
-                                INSERT INTO StockData (stock_name, transaction_date, open_price, high_price, low_price, closing_price, volume, dividends, stock_splits)
-                                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                                ON DUPLICATE KEY UPDATE 
-                                open_price = VALUES(open_price), high_price = VALUES(high_price),
-                                low_price = VALUES(low_price), closing_price = VALUES(closing_price),
-                                volume = VALUES(volume), dividends = VALUES(dividends), stock_splits = VALUES(stock_splits)
-                            """, (stock_name, index.strftime('%Y-%m-%d'), row['Open'], row['High'], row['Low'], row['Close'], row['Volume'], row.get('Dividends', 0), row.get('Stock Splits', 0)))
-                            self.db_connection.commit()
+    def fetch_portfolio_summaries(self):
+        """PortfolioSummary of each of the user's portfolios, oldest first, from one query and cached per user."""
+        return portfolio_summaries.load(self.pool, self.user_id)
 
     def fetch_portfolio_names(self):
-        query = "SELECT portfolio_name FROM Portfolio WHERE user_id = %s"
-        self.cursor.execute(query, (self.user_id,))
-        portfolio_names = [item[0] for item in self.cursor.fetchall()]
-        return portfolio_names
-    
+        return [summary.portfolio_name for summary in self.fetch_portfolio_summaries()]
     
     def fetch_all_portfolios(self):
-        query = "SELECT portfolio_id, portfolio_name, creation_date, description FROM Portfolio WHERE user_id = %s"
-        self.cursor.execute(query, (self.user_id,))
-        portfolios_data = self.cursor.fetchall()
-        
-        portfolios_info = [] 
-        
-        for portfolio_id, portfolio_name, creation_date, description in portfolios_data:
-            stocks = self.fetch_all_stocks(portfolio_id)
-            portfolios_info.append((portfolio_name, creation_date, stocks, description))
-        
-        return portfolios_info
+        return [(summary.portfolio_name, summary.creation_date, summary.stocks, summary.description)
+                for summary in self.fetch_portfolio_summaries()]
 
     def fetch_all_stocks(self, portfolio_id):
         try:
-            # Adjusted to fetch stock names via the StockData association in PortfolioStock
-            self.cursor.execute("""
-                SELECT DISTINCT sd.stock_name
-                FROM StockData sd
-                JOIN PortfolioStock ps ON sd.stock_data_id = ps.stock_data_id
-                WHERE ps.portfolio_id = %s
-            """, (portfolio_id,))
-            stocks_data = self.cursor.fetchall()
+            with self.pool.cursor() as cursor:
+                cursor.execute("""
+                    SELECT stock_name
+                    FROM PortfolioTicker
+                    WHERE portfolio_id = %s
+                """, (portfolio_id,))
+                stocks_data = cursor.fetchall()
             return [stock[0] for stock in stocks_data]
         except Exception as e:
             return []
@@ -0,0 +1,109 @@
+import collections
+import time
+
+from src.config.settings import PORTFOLIO_SUMMARY_CACHE_MAX_BYTES, PORTFOLIO_SUMMARY_TTL
+from src.utils.lru_cache import MemoryBoundedLRU
+
+# One row per (portfolio, ticker), or one row with a NULL ticker for an empty portfolio.
+# The per-ticker lookups are primary-key range reads of StockPrice, not scans.
+SUMMARY_QUERY = """
+    SELECT p.portfolio_id, p.portfolio_name, p.creation_date, p.description, p.data_version, pt.stock_name,
+           (SELECT MIN(sp.transaction_date) FROM StockPrice sp WHERE sp.stock_name = pt.stock_name),
+           (SELECT MAX(sp.transaction_date) FROM StockPrice sp WHERE sp.stock_name = pt.stock_name),
+           (SELECT sp.closing_price FROM StockPrice sp WHERE sp.stock_name = pt.stock_name
+            ORDER BY sp.transaction_date DESC LIMIT 1)
+    FROM Portfolio p
+    LEFT JOIN PortfolioTicker pt ON pt.portfolio_id = p.portfolio_id
+    WHERE p.user_id = %s
+    ORDER BY p.portfolio_id, pt.stock_name
+"""
+
+class PortfolioSummary(collections.namedtuple('PortfolioSummary', [
+        'portfolio_id', 'portfolio_name', 'creation_date', 'description', 'data_version',
+        'stocks', 'first_date', 'last_date', 'latest_closes'])):
+    """A portfolio with its tickers, the date range their stored prices cover and each ticker's latest close.
+
+    data_version changes whenever the portfolio's tickers or their prices do.
+    """
+    __slots__ = ()
+
+    @property
+    def stock_count(self):
+        return len(self.stocks)
+
+
+def build_summaries(rows):
+    """PortfolioSummary per portfolio, oldest first, from the rows of SUMMARY_QUERY."""
+    summaries = {}
+    for portfolio_id, portfolio_name, creation_date, description, data_version, stock_name, first_date, last_date, latest_close in rows:
+        summary = summaries.get(portfolio_id)
+        if summary is None:
+            summary = summaries[portfolio_id] = PortfolioSummary(portfolio_id, portfolio_name, creation_date, description, data_version, [], None, None, {})
+        if stock_name is None:
+            continue
+        summary.stocks.append(stock_name)
+        if latest_close is not None:
+            summary.latest_closes[stock_name] = float(latest_close)
+        if first_date is not None and (summary.first_date is None or first_date < summary.first_date):
+            summaries[portfolio_id] = summary = summary._replace(first_date=first_date)
+        if last_date is not None and (summary.last_date is None or last_date > summary.last_date):
+            summaries[portfolio_id] = summary = summary._replace(last_date=last_date)
+    return list(summaries.values())
+
+
+def summaries_nbytes(entry):
+    # A rough footprint: a few hundred bytes per portfolio and per ticker is plenty for names, dates and closes
+    _, summaries = entry
+    return sum(400 + 200 * len(summary.stocks) for summary in summaries) + 100
+
+
+class PortfolioSummaryCache:
+    """Process-wide cache of each user's portfolio summaries, keyed by user_id.
+
+    Portfolio and membership writes drop the writing user's entry; new prices drop the entry of
+    every user holding the ticker. Entries also expire after ttl seconds, so prices stored by
+    the refresh worker, another process, show up without a write here.
+    """
+
+    def __init__(self, max_bytes, ttl):
+        self._entries = MemoryBoundedLRU(max_bytes, summaries_nbytes)
+        self.ttl = ttl
+
+    def get(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            return None
+        return entry[1]
+
+    def load(self, pool, user_id):
+        """The user's summaries, from the cache or else from one SUMMARY_QUERY."""
+        summaries = self.get(user_id)
+        if summaries is None:
+            with pool.cursor() as cursor:
+                cursor.execute(SUMMARY_QUERY, (user_id,))
+                summaries = build_summaries(cursor.fetchall())
+            self.put(user_id, summaries)
+        return summaries
+
+    def put(self, user_id, summaries):
+        self._entries.put(user_id, (time.monotonic(), summaries))
+
+    def invalidate(self, user_id):
+        self._entries.pop(user_id)
+
+    def invalidate_tickers(self, stock_names):
+        stock_names = set(stock_names)
+
+        def holds(user_id):
+            entry = self._entries.peek(user_id)
+            return entry is not None and any(stock_names.intersection(summary.stocks) for summary in entry[1])
+        self._entries.discard_where(holds)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return self._entries.stats()
+
+
+portfolio_summaries = PortfolioSummaryCache(PORTFOLIO_SUMMARY_CACHE_MAX_BYTES, PORTFOLIO_SUMMARY_TTL)
@@ -0,0 +1,169 @@
+import os
+import tempfile
+import threading
+import urllib.parse
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+
+from src.config.settings import PRICE_CACHE_DIR
+
+# One record per stored bar, in StockPrice column order
+BAR_DTYPE = np.dtype([
+    ('transaction_date', 'datetime64[D]'),
+    ('open_price', 'float64'),
+    ('high_price', 'float64'),
+    ('low_price', 'float64'),
+    ('closing_price', 'float64'),
+    ('volume', 'int64'),
+    ('dividends', 'float64'),
+    ('stock_splits', 'float64'),
+])
+
+# Numeric NULLs come back as 0, so every column decodes straight into a typed array
+PRICE_QUERY = """
+    SELECT sp.stock_name, sp.transaction_date,
+           COALESCE(sp.open_price, 0), COALESCE(sp.high_price, 0), COALESCE(sp.low_price, 0), COALESCE(sp.closing_price, 0),
+           COALESCE(sp.volume, 0), COALESCE(sp.dividends, 0), COALESCE(sp.stock_splits, 0)
+    FROM StockPrice sp
+    WHERE sp.stock_name IN ({placeholders})
+    ORDER BY sp.stock_name, sp.transaction_date
+"""
+
+
+def decode_rows(rows):
+    """{stock_name: BAR_DTYPE array} from PRICE_QUERY rows fetched with a raw cursor.
+
+    A raw cursor returns every value as the bytes MySQL sent, so no Decimal or date object is
+    created per cell: dates are fixed-width 'YYYY-MM-DD' text parsed by NumPy in one call, and
+    float() and int() parse the numeric text directly.
+    """
+    if not rows:
+        return {}
+    bars = np.empty(len(rows), dtype=BAR_DTYPE)
+    bars['transaction_date'] = np.frombuffer(b''.join(map(itemgetter(1), rows)), dtype='S10').astype('datetime64[D]')
+    for column, field in enumerate(BAR_DTYPE.names[1:], start=2):
+        parse = int if BAR_DTYPE[field].kind == 'i' else float
+        bars[field] = np.fromiter(map(parse, map(itemgetter(column), rows)), dtype=BAR_DTYPE[field], count=len(rows))
+
+    # Rows arrive ordered by ticker; split where the name changes
+    names = list(map(itemgetter(0), rows))
+    starts = [0] + [row for row in range(1, len(rows)) if names[row] != names[row - 1]] + [len(rows)]
+    return {bytes(names[start]).decode(): bars[start:end] for start, end in zip(starts[:-1], starts[1:])}
+
+
+def history_frames(histories, start_date=None, end_date=None):
+    """The bars of {stock_name: bars} between start_date and end_date (inclusive) in the get_simulation_data column layout.
+
+    Returns one frame of every ticker, ticker by ticker in name order, and a row slice of it per
+    ticker that has bars in the range. The frame is built once from the concatenated arrays,
+    which is far cheaper than a DataFrame per ticker.
+    """
+    stock_names, parts = [], []
+    for stock_name in sorted(histories):
+        bars = histories[stock_name]
+        dates = bars['transaction_date']
+        first = np.searchsorted(dates, np.datetime64(start_date, 'D')) if start_date else 0
+        last = np.searchsorted(dates, np.datetime64(end_date, 'D'), side='right') if end_date else len(bars)
+        if last > first:
+            stock_names.append(stock_name)
+            parts.append(bars[first:last])
+
+    bars = np.concatenate(parts) if parts else np.zeros(0, dtype=BAR_DTYPE)
+    lengths = [len(part) for part in parts]
+    columns = {'stock_name': np.repeat(np.array(stock_names, dtype=object), lengths),
+               'transaction_date': bars['transaction_date'].astype('datetime64[ns]')}
+    columns.update((field, bars[field]) for field in BAR_DTYPE.names[1:])
+    frame = pd.DataFrame(columns)
+    bounds = np.cumsum([0] + lengths)
+    return frame, [frame.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+class PriceCache:
+    """Each ticker's full price history as a memory-mapped .npy file, in front of MySQL.
+
+    MySQL stays the source of truth. A file is only used while its last bar is the ticker's
+    last stored transaction date; otherwise the history is fetched again and the file replaced.
+    Files are written to a temporary name and renamed, so readers never see a partial file and
+    a reader still mapping the old file keeps a consistent copy. Without a directory nothing is
+    written and every load goes to MySQL.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, stock_name):
+        return os.path.join(self.directory, urllib.parse.quote(stock_name, safe='') + '.npy')
+
+    def load(self, stock_name, last_transaction_date):
+        """The cached bars of stock_name if they end at last_transaction_date, else None."""
+        if not self.directory:
+            return None
+        try:
+            bars = np.load(self.path(stock_name), mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        if bars.dtype != BAR_DTYPE or not len(bars) or bars['transaction_date'][-1] != np.datetime64(last_transaction_date, 'D'):
+            return None
+        return bars
+
+    def store(self, stock_name, bars):
+        # The cache is best effort; a full or read-only disk only costs the next load a query
+        if not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(descriptor, 'wb') as cache_file:
+                np.save(cache_file, bars)
+            os.replace(temporary_path, self.path(stock_name))
+        except OSError:
+            pass
+
+    def invalidate(self, stock_names):
+        if not self.directory:
+            return
+        for stock_name in stock_names:
+            try:
+                os.remove(self.path(stock_name))
+            except OSError:
+                pass
+
+    def fetch(self, pool, stock_names):
+        """{stock_name: bars} read from MySQL for stock_names, written to the cache."""
+        if not stock_names:
+            return {}
+        with pool.cursor(raw=True) as cursor:
+            cursor.execute(PRICE_QUERY.format(placeholders=', '.join(['%s'] * len(stock_names))), tuple(stock_names))
+            histories = decode_rows(cursor.fetchall())
+        for stock_name, bars in histories.items():
+            self.store(stock_name, bars)
+        return histories
+
+    def bars(self, pool, last_transaction_dates):
+        """{stock_name: bars} for {stock_name: last stored transaction date}, from the cache where it is current.
+
+        Tickers without stored prices (a None date) are left out. Stale ones are fetched on a
+        connection borrowed from pool.
+        """
+        histories, stale = {}, []
+        for stock_name, last_transaction_date in last_transaction_dates.items():
+            if last_transaction_date is None:
+                continue
+            bars = self.load(stock_name, last_transaction_date)
+            if bars is None:
+                stale.append(stock_name)
+            else:
+                histories[stock_name] = bars
+        with self._lock:
+            self.hits += len(histories)
+            self.misses += len(stale)
+        histories.update(self.fetch(pool, stale))
+        return histories
+
+
+price_cache = PriceCache(PRICE_CACHE_DIR)
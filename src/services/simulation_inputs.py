@@ -0,0 +1,47 @@
+import pandas as pd
+
+from src.config.settings import SIMULATION_INPUT_CACHE_MAX_BYTES
+from src.services.indicator_cache import frame_nbytes
+from src.utils.lru_cache import MemoryBoundedLRU
+
+
+def inputs_nbytes(inputs):
+    # The per-ticker frames are row slices of one frame the size of sim_data
+    _, sim_data = inputs
+    return 2 * frame_nbytes(sim_data)
+
+
+def input_key(portfolio_id, data_version, start_date, end_date):
+    # Callers pass dates, Timestamps or strings; the same day must map to the same entry
+    start_date = pd.Timestamp(start_date).date() if start_date is not None else None
+    end_date = pd.Timestamp(end_date).date() if end_date is not None else None
+    return portfolio_id, data_version, start_date, end_date
+
+
+class SimulationInputCache:
+    """Process-wide cache of get_simulation_data results, shared by every session.
+
+    Entries are keyed by (portfolio_id, data_version, start day, end day). Every write that
+    changes a portfolio's tickers or their prices, the refresh worker's included, bumps its
+    data_version, so a stale entry is never looked up again; storing a newer version drops the
+    portfolio's older ones right away. Cached frames are shared between callers and must not be modified.
+    """
+
+    def __init__(self, max_bytes):
+        self._entries = MemoryBoundedLRU(max_bytes, inputs_nbytes)
+
+    def get(self, portfolio_id, data_version, start_date=None, end_date=None):
+        return self._entries.get(input_key(portfolio_id, data_version, start_date, end_date))
+
+    def put(self, portfolio_id, data_version, start_date, end_date, inputs):
+        self._entries.discard_where(lambda key: key[0] == portfolio_id and key[1] < data_version)
+        self._entries.put(input_key(portfolio_id, data_version, start_date, end_date), inputs)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return self._entries.stats()
+
+
+simulation_inputs = SimulationInputCache(SIMULATION_INPUT_CACHE_MAX_BYTES)
@@ -0,0 +1,43 @@
+import numpy as np
+
+
+def lttb(x, y, threshold):
+    """Indices of the threshold points of the series (x, y) kept by Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept. The points in between are split into
+    threshold - 2 buckets, and each bucket keeps the point that forms the largest triangle
+    with the point kept from the previous bucket and the average of the next bucket. Peaks
+    and troughs therefore survive. A series of at most threshold points is returned whole.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # Bucket i holds the points edges[i] up to edges[i + 1]; the first and last points sit outside every bucket
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    counts = np.diff(edges)
+    average_x = np.add.reduceat(x[:n - 1], edges[:-1]) / counts
+    average_y = np.add.reduceat(y[:n - 1], edges[:-1]) / counts
+    # The point after the last bucket is the final point itself
+    next_x = np.append(average_x[1:], x[-1]).tolist()
+    next_y = np.append(average_y[1:], y[-1]).tolist()
+
+    # Buckets of daily prices hold a handful of points, where plain floats beat per-bucket array operations
+    xs, ys, edges = x.tolist(), y.tolist(), edges.tolist()
+    selected = [0]
+    previous = 0
+    for bucket in range(threshold - 2):
+        ax, ay = xs[previous], ys[previous]
+        dx, dy = ax - next_x[bucket], next_y[bucket] - ay
+        # Twice the triangle areas; the factor does not change which point is largest
+        largest, chosen = -1.0, edges[bucket]
+        for point in range(edges[bucket], edges[bucket + 1]):
+            area = abs(dx * (ys[point] - ay) - (ax - xs[point]) * dy)
+            if area > largest:
+                largest, chosen = area, point
+        previous = chosen
+        selected.append(previous)
+    selected.append(n - 1)
+    return np.array(selected)
@@ -0,0 +1,111 @@
+import collections
+import contextlib
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+
+from src.config.settings import PROFILE_SAMPLE_INTERVAL
+
+
+class SimulationProfiler:
+    """Per-stage wall-clock timings plus a sampled call profile of one run.
+
+    Stages accumulate, so a stage entered several times (once per streamed chunk, say)
+    reports its total. While running, a daemon thread samples the profiled thread's stack
+    every sample_interval seconds.
+    """
+    def __init__(self, sample_interval=PROFILE_SAMPLE_INTERVAL):
+        self.sample_interval = sample_interval
+        self.stage_seconds = {}
+        self.stacks = collections.Counter()
+        self.wall_seconds = 0.0
+        self._started = None
+        self._thread_id = None
+        self._sampler = None
+        self._stop = threading.Event()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + time.perf_counter() - start
+
+    def timed_iter(self, name, iterable):
+        """Iterate, counting only the time spent producing items towards stage name."""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._started = time.perf_counter()
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample, name='simulation-profiler', daemon=True)
+        self._sampler.start()
+        return self
+
+    def stop(self):
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+            self.wall_seconds += time.perf_counter() - self._started
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _sample(self):
+        while not self._stop.wait(self.sample_interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    @property
+    def samples(self):
+        return sum(self.stacks.values())
+
+    def breakdown(self):
+        """One row per stage, in the order stages first ran, plus whatever the stages did not cover."""
+        stages = dict(self.stage_seconds)
+        unattributed = self.wall_seconds - sum(stages.values())
+        if unattributed > 0:
+            stages['Other'] = unattributed
+        breakdown = pd.DataFrame({'Stage': list(stages), 'Seconds': list(stages.values())})
+        breakdown['Share'] = breakdown['Seconds'] / (self.wall_seconds or breakdown['Seconds'].sum() or 1)
+        return breakdown
+
+    def top_functions(self, limit=15):
+        """Functions by sampled self time (leaf frames) and total time (anywhere on the stack)."""
+        own, total = collections.Counter(), collections.Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for function in set(frames):
+                total[function] += count
+        samples = self.samples or 1
+        return pd.DataFrame(
+            [(function, own[function] / samples, total[function] / samples) for function, _ in total.most_common()],
+            columns=['Function', 'Self', 'Total'],
+        ).sort_values('Self', ascending=False).head(limit).reset_index(drop=True)
+
+    def collapsed_stacks(self):
+        """The sampled profile in collapsed-stack format, readable by flamegraph.pl and speedscope."""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
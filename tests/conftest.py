@@ -0,0 +1,103 @@
+import mysql.connector
+import pytest
+
+from src.database.connection import ConnectionPool
+from src.services.portfolio_summary import portfolio_summaries
+from src.services.price_cache import price_cache
+from src.services.simulation_inputs import simulation_inputs
+
+
+@pytest.fixture(autouse=True)
+def isolated_price_cache(tmp_path, monkeypatch):
+    # Keep tests from reading or writing the user's local price cache
+    monkeypatch.setattr(price_cache, 'directory', str(tmp_path / 'prices'))
+
+
+@pytest.fixture(autouse=True)
+def empty_process_caches():
+    # Summaries and simulation inputs are cached for the whole process
+    portfolio_summaries.clear()
+    simulation_inputs.clear()
+    yield
+    portfolio_summaries.clear()
+    simulation_inputs.clear()
+
+
+class FakeCursor:
+    """Records every statement, whitespace-collapsed, and answers reads from queued results or from respond(query, params)."""
+    def __init__(self, results=(), respond=None, fail_on=None):
+        self.statements = []
+        self.results = list(results)
+        self.respond = respond
+        self.fail_on = fail_on
+        self.rows = []
+        self.rowcount = 0
+        self.lastrowid = None
+        self.closed = False
+
+    @property
+    def queries(self):
+        return [query for query, params in self.statements]
+
+    def execute(self, query, params=()):
+        query = ' '.join(query.split())
+        if self.fail_on and self.fail_on in query:
+            raise mysql.connector.Error("statement failed")
+        self.statements.append((query, params))
+        if self.respond:
+            self.rows = self.respond(query, params)
+
+    def executemany(self, query, rows):
+        self.execute(query, rows)
+
+    def fetchall(self):
+        if self.respond:
+            return self.rows
+        return self.results.pop(0) if self.results else []
+
+    def fetchone(self):
+        rows = self.fetchall()
+        return rows[0] if rows else None
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    """Hands out fake_cursor, or a fresh FakeCursor per call when none is given, and counts commits and rollbacks."""
+    def __init__(self, cursor=None, alive=True):
+        self.fake_cursor = cursor
+        self.alive = alive
+        self.in_transaction = False
+        self.closed = False
+        self.commits = 0
+        self.rollbacks = 0
+        self.cursors = []
+
+    def cursor(self, **kwargs):
+        self.cursors.append(self.fake_cursor or FakeCursor())
+        return self.cursors[-1]
+
+    def start_transaction(self):
+        self.in_transaction = True
+
+    def commit(self):
+        self.commits += 1
+        self.in_transaction = False
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def ping(self, reconnect=False):
+        if not self.alive:
+            raise mysql.connector.InterfaceError("gone away")
+
+    def close(self):
+        self.closed = True
+
+
+def fake_pool(cursor=None, size=1):
+    """A pool over one FakeConnection sharing cursor; returns (pool, connection)."""
+    connection = FakeConnection(cursor or FakeCursor())
+    return ConnectionPool(lambda: connection, size=size), connection
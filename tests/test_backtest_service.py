@@ -0,0 +1,387 @@
+import datetime
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.services.backtest_service import FACTOR_WARM_UP_BARS, SIGNAL_FACTORS, BacktestManager
+from src.services.indicator_cache import indicator_cache
+from src.services.portfolio_summary import PortfolioSummary, portfolio_summaries
+from tests.conftest import FakeCursor, fake_pool
+
+
+@pytest.fixture
+def manager():
+    # Skip __init__ so no database connection is opened
+    manager = BacktestManager.__new__(BacktestManager)
+    manager.user_id = 1
+    return manager
+
+
+def make_stock_data(stock_name='AAA', periods=300, seed=0):
+    rng = np.random.default_rng(seed)
+    closes = np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.02, periods))), 2)
+    dates = pd.bdate_range('2020-01-01', periods=periods).date
+    return pd.DataFrame({
+        'stock_name': stock_name,
+        'transaction_date': dates,
+        'open_price': closes,
+        'high_price': closes,
+        'low_price': closes,
+        'closing_price': closes,
+        'volume': 1000,
+        'dividends': 0.0,
+        'stock_splits': 0,
+    })
+
+
+def reference_votes(stock_data, selected_factors):
+    """The original bar-by-bar voting loop, kept as the parity oracle."""
+    stock_data = stock_data.copy()
+    stock_data['buy_signal'] = False
+    stock_data['sell_signal'] = False
+    stock_data['Buy_Votes'] = 0
+    stock_data['Sell_Votes'] = 0
+    daily_return_avg = stock_data['Daily_Return'].mean()
+    threshold = round(len(selected_factors) / 3)
+    for i in range(1, len(stock_data)):
+        buy_votes = 0
+        sell_votes = 0
+        if 'Relative Strength Index (RSI)' in selected_factors:
+            if stock_data['RSI'].iloc[i] < 30: buy_votes += 1
+            if stock_data['RSI'].iloc[i] > 70: sell_votes += 1
+        if 'Moving Average Convergence/Divergence (MACD)' in selected_factors:
+            if stock_data['MACD'].iloc[i] > stock_data['MACD_signal'].iloc[i]: buy_votes += 1
+            if stock_data['MACD'].iloc[i] < stock_data['MACD_signal'].iloc[i]: sell_votes += 1
+        if 'Bollinger Bands' in selected_factors:
+            if stock_data['closing_price'].iloc[i] < stock_data['Lower_Band'].iloc[i]: buy_votes += 1
+            if stock_data['closing_price'].iloc[i] > stock_data['Upper_Band'].iloc[i]: sell_votes += 1
+        if 'Moving Average' in selected_factors:
+            if stock_data['MA_7'].iloc[i] < stock_data['MA_30'].iloc[i]: buy_votes += 1
+            if stock_data['MA_7'].iloc[i] > stock_data['MA_30'].iloc[i]: sell_votes += 1
+        if 'Daily Return' in selected_factors:
+            if stock_data['Daily_Return'].iloc[i] > daily_return_avg: buy_votes += 1
+            if stock_data['Daily_Return'].iloc[i] < daily_return_avg: sell_votes += 1
+        if 'Volatility' in selected_factors:
+            if stock_data['Volatility'].iloc[i] < stock_data['Volatility'].rolling(window=30).mean().iloc[i]: buy_votes += 1
+            if stock_data['Volatility'].iloc[i] > stock_data['Volatility'].rolling(window=30).mean().iloc[i]: sell_votes += 1
+        if 'Exponential Moving Average (EMA)' in selected_factors:
+            if stock_data['EMA12'].iloc[i] > stock_data['EMA26'].iloc[i]: buy_votes += 1
+            if stock_data['EMA12'].iloc[i] < stock_data['EMA26'].iloc[i]: sell_votes += 1
+        if 'Log Return' in selected_factors:
+            if stock_data['Log_Return'].iloc[i] > 0: buy_votes += 1
+            if stock_data['Log_Return'].iloc[i] < 0: sell_votes += 1
+
+        stock_data.loc[stock_data.index[i], 'Buy_Votes'] = buy_votes
+        stock_data.loc[stock_data.index[i], 'Sell_Votes'] = sell_votes
+        if buy_votes > sell_votes + threshold:
+            stock_data.loc[stock_data.index[i], 'buy_signal'] = True
+        if sell_votes > buy_votes + threshold:
+            stock_data.loc[stock_data.index[i], 'sell_signal'] = True
+    return stock_data
+
+
+@pytest.mark.parametrize('selected_factors', [SIGNAL_FACTORS, []] + [[factor] for factor in SIGNAL_FACTORS]
+                         + [list(pair) for pair in itertools.combinations(SIGNAL_FACTORS, 2)][::5])
+def test_generate_signals_matches_reference_loop(manager, selected_factors):
+    signals = manager.generate_signals(make_stock_data(), selected_factors)
+    expected = reference_votes(signals, selected_factors)
+
+    for column in ['Buy_Votes', 'Sell_Votes', 'buy_signal', 'sell_signal']:
+        pd.testing.assert_series_equal(signals[column], expected[column])
+
+
+def test_generate_signals_keeps_group_index(manager):
+    stock_data = make_stock_data(periods=80)
+    stock_data.index = stock_data.index + 500
+    signals = manager.generate_signals(stock_data, SIGNAL_FACTORS)
+    expected = reference_votes(signals, SIGNAL_FACTORS)
+
+    assert signals.loc[500, 'Buy_Votes'] == 0 and signals.loc[500, 'Sell_Votes'] == 0
+    pd.testing.assert_frame_equal(signals[['Buy_Votes', 'Sell_Votes', 'buy_signal', 'sell_signal']],
+                                  expected[['Buy_Votes', 'Sell_Votes', 'buy_signal', 'sell_signal']])
+
+
+def make_simulation_data():
+    frames = [make_stock_data('MSFT', periods=400, seed=1),
+              make_stock_data('AAPL', periods=400, seed=2).drop(index=range(100, 130)),
+              make_stock_data('NVDA', periods=300, seed=3).assign(transaction_date=pd.bdate_range('2020-05-01', periods=300).date)]
+    sim_data = pd.concat(frames, ignore_index=True)
+    historical_data_list = [group[1] for group in sim_data.groupby('stock_name')]
+    sim_data.sort_values(by='transaction_date', inplace=True)
+    return historical_data_list, sim_data
+
+
+def reference_simulation(manager, historical_data_list, sim_data, initial_fund, start_date, end_date, selected_factors):
+    """The original per-date filtering loop of simulate_trading, kept as the parity oracle."""
+    if start_date and end_date:
+        sim_data = sim_data[(sim_data['transaction_date'] >= start_date) & (sim_data['transaction_date'] <= end_date)]
+    sim_data_with_signals = pd.concat([manager.generate_signals(stock_data, selected_factors) for stock_data in historical_data_list])
+    sim_data_with_signals['transaction_date'] = pd.to_datetime(sim_data_with_signals['transaction_date']).dt.date
+
+    cash_balance = initial_fund
+    shares_held = {data['stock_name'].iloc[0]: 0 for data in historical_data_list}
+    actions = []
+    daily_portfolio_values = []
+    for date in sim_data['transaction_date'].unique():
+        daily_data = sim_data[sim_data['transaction_date'] == date]
+        total_buy_signals = 0
+        for stock_name, _ in daily_data.groupby('stock_name'):
+            rows = sim_data_with_signals[(sim_data_with_signals['stock_name'] == stock_name) & (sim_data_with_signals['transaction_date'] == date)]
+            total_buy_signals += len(rows[rows['buy_signal']])
+        allocation_per_stock = cash_balance / total_buy_signals if total_buy_signals > 0 else 0
+        for stock_name, _ in daily_data.groupby('stock_name'):
+            rows = sim_data_with_signals[(sim_data_with_signals['stock_name'] == stock_name) & (sim_data_with_signals['transaction_date'] == date)]
+            for _, row in rows[rows['buy_signal']].iterrows():
+                closing_price = float(row['closing_price'])
+                num_shares_to_buy = int(allocation_per_stock // closing_price) if allocation_per_stock > 0 else 0
+                if num_shares_to_buy > 0:
+                    cost = num_shares_to_buy * closing_price
+                    cash_balance -= cost
+                    shares_held[stock_name] += num_shares_to_buy
+                    actions.append((str(date), stock_name, 'Buy', num_shares_to_buy, closing_price, cost, cash_balance))
+            for _, row in rows[rows['sell_signal']].iterrows():
+                closing_price = float(row['closing_price'])
+                num_shares_to_sell = shares_held[stock_name]
+                if num_shares_to_sell > 0:
+                    sale_proceeds = num_shares_to_sell * closing_price
+                    cash_balance += sale_proceeds
+                    shares_held[stock_name] = 0
+                    actions.append((str(date), stock_name, 'Sell', num_shares_to_sell, closing_price, sale_proceeds, cash_balance))
+        date_portfolio_value = cash_balance
+        for stock, shares in shares_held.items():
+            rows = sim_data_with_signals[(sim_data_with_signals['stock_name'] == stock) & (sim_data_with_signals['transaction_date'] == date)]
+            if not rows.empty:
+                date_portfolio_value += shares * float(rows.iloc[0]['closing_price'])
+        daily_portfolio_values.append(date_portfolio_value)
+
+    holdings = []
+    for stock, shares in shares_held.items():
+        if shares > 0:
+            final_price = sim_data_with_signals[sim_data_with_signals['stock_name'] == stock]['closing_price'].iloc[-1]
+            holdings.append((stock, shares, final_price, shares * final_price))
+    return actions, holdings, daily_portfolio_values
+
+
+@pytest.mark.parametrize('start_date, end_date', [(None, None), (datetime.date(2020, 3, 2), datetime.date(2021, 1, 29))])
+@pytest.mark.parametrize('selected_factors', [SIGNAL_FACTORS, ['Moving Average', 'Exponential Moving Average (EMA)', 'Log Return'], ['Log Return', 'Daily Return']])
+def test_simulate_trading_matches_reference_loop(manager, monkeypatch, start_date, end_date, selected_factors):
+    monkeypatch.setattr(manager, 'get_simulation_data', lambda portfolio_name, *date_range: make_simulation_data())
+    result = manager.simulate_trading('Tech', 10000.00, start_date, end_date, selected_factors)
+    expected_trades, expected_holdings, expected_values = reference_simulation(manager, *make_simulation_data(), 10000.00, start_date, end_date, selected_factors)
+
+    trades = result.trades_df.astype({'Date': str})
+    assert (trades['Side'] == 'Sell').any()
+    assert list(trades.itertuples(index=False, name=None)) == expected_trades
+    assert list(result.holdings_df.itertuples(index=False, name=None)) == expected_holdings
+    assert result.daily_values.tolist() == expected_values
+    assert result.daily_values_df['Portfolio Value'].tolist() == expected_values
+    assert result.final_portfolio_value == expected_values[-1]
+
+
+def test_simulate_trading_loads_the_warm_up_and_range_only(manager, monkeypatch):
+    start_date, end_date = datetime.date(2020, 9, 1), datetime.date(2021, 1, 29)
+    requests = []
+
+    def bounded(historical_data_list, sim_data, start, end):
+        historical_data_list = [stock_data[stock_data['transaction_date'].between(start, end)] for stock_data in historical_data_list]
+        return historical_data_list, sim_data[sim_data['transaction_date'].between(start, end)]
+
+    def get_simulation_data(portfolio_name, start=None, end=None):
+        requests.append((start, end))
+        return bounded(*make_simulation_data(), start, end)
+    monkeypatch.setattr(manager, 'get_simulation_data', get_simulation_data)
+    result = manager.simulate_trading('Tech', 10000.00, start_date, end_date, SIGNAL_FACTORS)
+
+    warm_up_start = manager.warm_up_start(start_date, SIGNAL_FACTORS)
+    assert requests == [(warm_up_start, end_date)]
+    historical_data_list, sim_data = bounded(*make_simulation_data(), warm_up_start, end_date)
+    expected_trades, expected_holdings, expected_values = reference_simulation(manager, historical_data_list, sim_data, 10000.00, start_date, end_date, SIGNAL_FACTORS)
+    assert list(result.trades_df.astype({'Date': str}).itertuples(index=False, name=None)) == expected_trades
+    # Holdings are valued at the last close on or before end_date
+    assert list(result.holdings_df.itertuples(index=False, name=None)) == expected_holdings
+    assert result.daily_values.tolist() == expected_values
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_sweep_ranks_configurations_like_single_runs(manager, monkeypatch, max_workers):
+    monkeypatch.setattr(manager, 'get_simulation_data', lambda portfolio_name, *date_range: make_simulation_data())
+    factor_sets = [SIGNAL_FACTORS, ['Relative Strength Index (RSI)', 'Log Return']]
+    ranked = manager.sweep('Tech', factor_sets, rsi_bounds=[(30, 70), (40, 60)], thresholds=[None, 0], max_workers=max_workers)
+
+    assert len(ranked) == 8
+    assert ranked['Sharpe Ratio'].is_monotonic_decreasing
+    for _, row in ranked.iterrows():
+        factors = row['Factors'].split(', ')
+        historical_data_list, _ = make_simulation_data()
+        signals = pd.concat([manager.generate_signals(stock_data, factors, row['RSI Lower'], row['RSI Upper'], row['Threshold'])
+                             for stock_data in historical_data_list])
+        daily_values, _, _ = manager.run_trading_panel(manager.build_trading_panel(signals), 10000.00, record_trades=False)
+        assert row['Final Portfolio Value'] == daily_values[-1]
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_simulate_all_portfolios_matches_single_runs(manager, monkeypatch, max_workers):
+    _, sim_data = make_simulation_data()
+    portfolios = {'Tech': sim_data, 'Chips': sim_data[sim_data['stock_name'] != 'MSFT']}
+    portfolio_tickers = {name: sorted(data['stock_name'].unique()) for name, data in portfolios.items()}
+    monkeypatch.setattr(manager, 'get_all_simulation_data', lambda *date_range: (portfolio_tickers, dict(list(sim_data.groupby('stock_name')))))
+    comparison, daily_values_df = manager.simulate_all_portfolios(selected_factors=SIGNAL_FACTORS, max_workers=max_workers)
+
+    assert list(comparison.index) == ['Tech', 'Chips']
+    for portfolio_name, data in portfolios.items():
+        monkeypatch.setattr(manager, 'get_simulation_data', lambda name, *date_range, data=data: ([group for _, group in data.copy().groupby('stock_name')], data))
+        result = manager.simulate_trading(portfolio_name, selected_factors=SIGNAL_FACTORS)
+        assert daily_values_df[portfolio_name].dropna().tolist() == result.daily_values.tolist()
+        assert comparison.loc[portfolio_name].tolist() == [result.final_portfolio_value, result.annualized_return, result.sharpe_ratio]
+
+
+def test_simulate_all_portfolios_shares_the_indicator_cache(manager, monkeypatch):
+    _, sim_data = make_simulation_data()
+    # Every ticker is held by two portfolios
+    portfolio_tickers = {'Tech': ['AAPL', 'MSFT', 'NVDA'], 'Chips': ['AAPL', 'NVDA'], 'Software': ['MSFT']}
+    monkeypatch.setattr(manager, 'get_all_simulation_data', lambda *date_range: (portfolio_tickers, dict(list(sim_data.groupby('stock_name')))))
+    indicator_cache.clear()
+    misses = indicator_cache.stats()['misses']
+    hits = indicator_cache.stats()['hits']
+    manager.simulate_all_portfolios(selected_factors=SIGNAL_FACTORS, max_workers=2)
+    manager.simulate_all_portfolios(selected_factors=['Moving Average'], max_workers=2)
+
+    # Indicators are computed once per ticker, and a second run with other factors reuses them
+    assert indicator_cache.stats()['misses'] - misses == 3
+    assert indicator_cache.stats()['hits'] - hits == 3
+
+
+def test_simulate_all_portfolios_leaves_out_portfolios_without_bars_in_range(manager, monkeypatch):
+    _, sim_data = make_simulation_data()
+    # NVDA's prices start in May 2020, after the simulated range ends
+    portfolio_tickers = {'Tech': ['AAPL', 'MSFT'], 'Late': ['NVDA']}
+    monkeypatch.setattr(manager, 'get_all_simulation_data', lambda *date_range: (portfolio_tickers, dict(list(sim_data.groupby('stock_name')))))
+    comparison, daily_values_df = manager.simulate_all_portfolios(start_date=datetime.date(2020, 2, 3), end_date=datetime.date(2020, 4, 1),
+                                                                  selected_factors=SIGNAL_FACTORS, max_workers=1)
+
+    assert list(comparison.index) == ['Tech'] and list(daily_values_df.columns) == ['Tech']
+
+
+def test_stream_simulation_yields_progressive_chunks(manager, monkeypatch):
+    monkeypatch.setattr(manager, 'get_simulation_data', lambda portfolio_name, *date_range: make_simulation_data())
+    steps = list(manager.stream_simulation('Tech', selected_factors=SIGNAL_FACTORS, chunk_days=50))
+    result = manager.simulate_trading('Tech', selected_factors=SIGNAL_FACTORS)
+
+    fractions = [step.fraction for step in steps]
+    assert fractions == sorted(fractions) and fractions[-1] == 1.0
+    assert [step.done for step in steps].count(True) == 1 and steps[-1].done
+    chunks = [step for step in steps if step.values is not None and not step.done]
+    assert [len(step.values) for step in chunks] == list(range(50, len(result.dates), 50))
+    assert chunks[0].values.tolist() == result.daily_values[:50].tolist()
+    streamed_trades = pd.concat([step.new_trades for step in steps if step.new_trades is not None], ignore_index=True)
+    pd.testing.assert_frame_equal(streamed_trades, result.trades_df)
+    assert steps[-1].result.daily_values.tolist() == result.daily_values.tolist()
+
+
+class PriceTable:
+    """Answers the data version, last-date and price queries from a frame of StockPrice rows."""
+    def __init__(self, stock_data, data_version=0):
+        self.stock_data = stock_data
+        self.data_version = data_version
+
+    def respond(self, query, params):
+        if 'SELECT data_version FROM Portfolio' in query:
+            return [(self.data_version,)]
+        if 'FROM PortfolioTicker' in query:
+            last_dates = self.stock_data.groupby('stock_name')['transaction_date'].max()
+            return list(last_dates.items())
+        # As a raw cursor returns them: every value as the text MySQL sent
+        return [tuple(str(value).encode() for value in row)
+                for row in self.stock_data[self.stock_data['stock_name'].isin(params)].itertuples(index=False, name=None)]
+
+
+def price_cursor(manager, stock_data, data_version=0):
+    prices = PriceTable(stock_data, data_version)
+    cursor = FakeCursor(respond=prices.respond)
+    manager.pool, _ = fake_pool(cursor)
+    return prices, cursor
+
+
+def cache_summary(user_id, data_version):
+    portfolio_summaries.put(user_id, [PortfolioSummary(7, 'Tech', None, None, data_version, ['AAA', 'BBB'], None, None, {})])
+
+
+def test_simulation_data_is_served_from_the_price_cache(manager):
+    stock_data = pd.concat([make_stock_data('AAA', seed=1), make_stock_data('BBB', seed=2)], ignore_index=True)
+    prices, cursor = price_cursor(manager, stock_data)
+    cache_summary(manager.user_id, 0)
+
+    historical_data_list, sim_data = manager.get_simulation_data('Tech')
+    assert sum('FROM StockPrice sp WHERE sp.stock_name IN' in query for query in cursor.queries) == 1
+    assert [frame['stock_name'].iloc[0] for frame in historical_data_list] == ['AAA', 'BBB']
+    assert historical_data_list[0]['closing_price'].tolist() == stock_data.loc[stock_data['stock_name'] == 'AAA', 'closing_price'].tolist()
+    assert sim_data['transaction_date'].is_monotonic_increasing and len(sim_data) == len(stock_data)
+
+    # Unchanged last dates are served from the cache, sliced to the requested range
+    start_date, end_date = datetime.date(2020, 6, 1), datetime.date(2020, 9, 30)
+    historical_data_list, _ = manager.get_simulation_data('Tech', start_date, end_date)
+    assert sum('FROM StockPrice sp WHERE sp.stock_name IN' in query for query in cursor.queries) == 1
+    dates = historical_data_list[1]['transaction_date'].dt.date
+    assert dates.min() >= start_date and dates.max() <= end_date
+    assert len(dates) == stock_data.loc[stock_data['stock_name'] == 'BBB', 'transaction_date'].between(start_date, end_date).sum()
+
+    # A new bar bumps the portfolio's data version and makes the ticker's cached history stale
+    new_bar = stock_data[stock_data['stock_name'] == 'AAA'].tail(1).assign(transaction_date=datetime.date(2030, 1, 2))
+    prices.stock_data = pd.concat([stock_data, new_bar], ignore_index=True)
+    prices.data_version = 1
+    historical_data_list, _ = manager.get_simulation_data('Tech')
+    assert cursor.queries[-1].endswith('ORDER BY sp.stock_name, sp.transaction_date') and len(historical_data_list[0]) == 301
+
+
+def test_repeated_loads_of_a_data_version_only_look_up_the_version(manager):
+    stock_data = make_stock_data('AAA', seed=1)
+    _, cursor = price_cursor(manager, stock_data, data_version=3)
+    cache_summary(manager.user_id, 3)
+
+    first = manager.get_simulation_data('Tech')
+    queries = len(cursor.queries)
+    assert manager.get_simulation_data('Tech')[1] is first[1]
+    assert cursor.queries[queries:] == ['SELECT data_version FROM Portfolio WHERE portfolio_id = %s']
+    # Another date range is a separate entry
+    manager.get_simulation_data('Tech', datetime.date(2020, 6, 1))
+    assert len(cursor.queries) > queries + 2
+
+
+def test_simulation_data_follows_versions_bumped_outside_the_app(manager):
+    prices, _ = price_cursor(manager, make_stock_data('AAA', seed=1), data_version=3)
+    # The cached summary still says version 3 after the refresh worker bumped it
+    cache_summary(manager.user_id, 3)
+    first = manager.get_simulation_data('Tech')
+    prices.data_version = 4
+    assert manager.get_simulation_data('Tech')[1] is not first[1]
+
+
+def test_simulation_data_cache_keys_dates_by_day(manager):
+    price_cursor(manager, make_stock_data('AAA', seed=1))
+    cache_summary(manager.user_id, 0)
+    first = manager.get_simulation_data('Tech', datetime.date(2020, 6, 1), datetime.date(2020, 9, 30))
+    for start_date, end_date in [(pd.Timestamp('2020-06-01'), '2020-09-30'), ('2020-06-01', pd.Timestamp('2020-09-30'))]:
+        assert manager.get_simulation_data('Tech', start_date, end_date)[1] is first[1]
+    assert manager.get_simulation_data('Unknown')[0] == []
+
+
+def test_warm_up_settles_indicators_by_range_start(manager):
+    stock_data = make_stock_data('MSFT', periods=700, seed=4)
+    start_date = stock_data['transaction_date'].iloc[500]
+    full = manager.add_indicators(stock_data.copy())
+    for factor, bars in FACTOR_WARM_UP_BARS.items():
+        warm_up_dates = stock_data['transaction_date'].between(manager.warm_up_start(start_date, [factor]), start_date, inclusive='left')
+        assert bars <= warm_up_dates.sum() <= bars * 1.1 + 10
+    assert manager.warm_up_start(None, SIGNAL_FACTORS) is None
+
+    start = full['transaction_date'] >= start_date
+    warm_up_start = manager.warm_up_start(start_date, SIGNAL_FACTORS)
+    trimmed = manager.add_indicators(stock_data[stock_data['transaction_date'] >= warm_up_start].copy())
+    trimmed = trimmed[trimmed['transaction_date'] >= start_date]
+    rolling = ['MA_7', 'MA_30', 'Volatility', 'Volatility_MA_30', 'RSI', 'Upper_Band', 'Lower_Band']
+    np.testing.assert_allclose(trimmed[rolling].to_numpy(), full.loc[start, rolling].to_numpy(), rtol=1e-9)
+    # EMAs keep a trace of where they started, bounded by the warm-up to well under a cent
+    ewm = ['EMA12', 'EMA26', 'MACD', 'MACD_signal']
+    np.testing.assert_allclose(trimmed[ewm].to_numpy(), full.loc[start, ewm].to_numpy(), atol=1e-2)
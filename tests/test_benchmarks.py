@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+
+from benchmarks.run import compare
+from benchmarks.synthetic_data import STOCK_DATA_COLUMNS, as_yfinance_history, synthetic_ohlcv
+
+
+def test_synthetic_ohlcv_is_deterministic():
+    first = synthetic_ohlcv(3, 1, seed=7)
+    pd.testing.assert_frame_equal(first, synthetic_ohlcv(3, 1, seed=7))
+    assert not first.equals(synthetic_ohlcv(3, 1, seed=8))
+
+
+def test_synthetic_ohlcv_shape_and_bars():
+    stock_data = synthetic_ohlcv(4, 2)
+    assert list(stock_data.columns) == STOCK_DATA_COLUMNS
+    assert len(stock_data) == 4 * 2 * 252
+    assert stock_data.groupby('stock_name')['transaction_date'].is_monotonic_increasing.all()
+    assert (stock_data['high_price'] >= stock_data[['open_price', 'closing_price']].max(axis=1)).all()
+    assert (stock_data['low_price'] <= stock_data[['open_price', 'closing_price']].min(axis=1)).all()
+
+    history = as_yfinance_history(stock_data[stock_data['stock_name'] == 'SYN000'])
+    assert list(history.columns) == ['Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']
+    assert len(history) == 2 * 252
+
+
+@pytest.mark.parametrize('n_tickers, years', [(0, 1), (501, 1), (1, 0), (1, 21)])
+def test_synthetic_ohlcv_bounds(n_tickers, years):
+    with pytest.raises(ValueError):
+        synthetic_ohlcv(n_tickers, years)
+
+
+def test_compare_flags_only_slowdowns_past_tolerance():
+    params = {'tickers': 5, 'years': 2}
+    baseline = {'benchmarks': {
+        'signals': {'median_s': 1.0, 'params': params},
+        'simulation_cold': {'median_s': 1.0, 'params': params},
+        'simulation_warm': {'median_s': 1.0, 'params': {'tickers': 50, 'years': 2}},
+    }}
+    results = {'benchmarks': {
+        'signals': {'median_s': 1.2, 'params': params},
+        'simulation_cold': {'median_s': 1.5, 'params': params},
+        # Different dataset from the baseline, so not comparable
+        'simulation_warm': {'median_s': 9.0, 'params': params},
+        'db_load': {'median_s': 9.0, 'params': params},
+    }}
+    assert [name for name, *_ in compare(results, baseline, 0.25)] == ['simulation_cold']
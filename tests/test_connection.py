@@ -0,0 +1,92 @@
+import threading
+
+import mysql.connector
+import pytest
+
+from src.database.connection import ConnectionPool
+from tests.conftest import FakeConnection
+
+
+class Connector:
+    def __init__(self):
+        self.connections = []
+
+    def __call__(self):
+        self.connections.append(FakeConnection())
+        return self.connections[-1]
+
+
+def test_connections_are_reused():
+    connect = Connector()
+    pool = ConnectionPool(connect, size=2)
+    for _ in range(5):
+        with pool.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    assert len(connect.connections) == 1
+    assert all(cursor.closed for cursor in connect.connections[0].cursors)
+    stats = pool.stats()
+    assert stats['borrowed'] == 5 and stats['opened'] == 1 and stats['in_use'] == 0 and stats['idle'] == 1
+
+
+def test_borrowers_wait_for_a_free_connection_then_time_out():
+    pool = ConnectionPool(Connector(), size=1, timeout=0.05)
+    connection = pool.acquire()
+    with pytest.raises(mysql.connector.errors.PoolError):
+        pool.acquire()
+
+    threading.Timer(0.01, pool.release, (connection,)).start()
+    pool.timeout = 5
+    assert pool.acquire() is connection
+    stats = pool.stats()
+    assert stats['waits'] == 2 and stats['timeouts'] == 1 and stats['peak_in_use'] == 1
+
+
+def test_stale_connections_are_replaced_after_a_failed_ping():
+    connect = Connector()
+    pool = ConnectionPool(connect, size=1, ping_after=0)
+    with pool.connection() as first:
+        pass
+    first.alive = False
+    with pool.connection() as second:
+        assert second is not first
+    assert first.closed and pool.stats()['replaced'] == 1
+
+
+def test_transaction_commits_or_rolls_back():
+    connect = Connector()
+    pool = ConnectionPool(connect, size=1)
+    with pool.transaction() as cursor:
+        cursor.execute("INSERT INTO Portfolio VALUES (%s)", (1,))
+    with pytest.raises(ValueError):
+        with pool.transaction() as cursor:
+            raise ValueError("failed part-way")
+    connection = connect.connections[0]
+    assert connection.commits == 1 and connection.rollbacks == 1 and not connection.in_transaction
+
+
+def test_unit_of_work_runs_after_commit_work_only_once_committed():
+    connect = Connector()
+    pool = ConnectionPool(connect, size=1)
+    events = []
+    with pool.unit_of_work() as work:
+        work.execute("DELETE FROM PortfolioTicker WHERE portfolio_id = %s", (1,))
+        work.executemany("INSERT INTO PortfolioTicker VALUES (%s, %s)", [])
+        work.after_commit(lambda: events.append(connect.connections[0].commits))
+    with pytest.raises(ValueError):
+        with pool.unit_of_work() as work:
+            work.after_commit(lambda: events.append('rolled back'))
+            raise ValueError("failed part-way")
+    assert events == [1]
+    assert connect.connections[0].rollbacks == 1
+
+
+def test_lost_connections_are_discarded():
+    connect = Connector()
+    pool = ConnectionPool(connect, size=1)
+    with pytest.raises(mysql.connector.OperationalError):
+        with pool.cursor():
+            raise mysql.connector.OperationalError("lost connection")
+    assert connect.connections[0].closed
+    with pool.cursor():
+        pass
+    assert len(connect.connections) == 2 and pool.stats()['discarded'] == 1
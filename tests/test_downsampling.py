@@ -0,0 +1,41 @@
+import numpy as np
+
+from src.components.portfolio_overview import OverviewBuilder
+from src.services.price_cache import BAR_DTYPE
+from src.utils.downsampling import lttb
+
+
+def test_lttb_keeps_endpoints_and_extremes():
+    x = np.arange(1000)
+    y = np.sin(x / 50.0)
+    y[321] = 5.0
+    y[654] = -5.0
+    kept = lttb(x, y, 100)
+    assert len(kept) == 100 and kept[0] == 0 and kept[-1] == 999
+    assert (np.diff(kept) > 0).all()
+    assert 321 in kept and 654 in kept
+
+
+def test_lttb_returns_short_series_whole():
+    assert lttb(np.arange(5), np.ones(5), 10).tolist() == [0, 1, 2, 3, 4]
+
+
+class FakeBacktestManager:
+    def __init__(self, histories):
+        self.histories = histories
+        self.calls = []
+
+    def get_price_histories(self, portfolio_name):
+        self.calls.append(portfolio_name)
+        return self.histories
+
+
+def test_price_chart_draws_downsampled_webgl_traces():
+    bars = np.zeros(3000, dtype=BAR_DTYPE)
+    bars['transaction_date'] = np.datetime64('2010-01-01') + np.arange(3000)
+    bars['closing_price'] = np.linspace(10, 20, 3000)
+    backtest_manager = FakeBacktestManager({'MSFT': bars, 'AAPL': bars[:50]})
+
+    fig = OverviewBuilder(None, backtest_manager).price_chart('Tech')
+    assert backtest_manager.calls == ['Tech']
+    assert [(trace.type, trace.name, len(trace.y)) for trace in fig.data] == [('scattergl', 'AAPL', 50), ('scattergl', 'MSFT', 800)]
@@ -0,0 +1,26 @@
+from benchmarks.explain_queries import ExplainingCursor, full_scans
+from tests.conftest import FakeCursor
+
+
+def test_only_selects_are_explained():
+    cursor, explain_cursor, plans = FakeCursor(results=[[('MSFT', 1)]]), FakeCursor(results=[[{'table': 'StockPrice', 'type': 'ref'}]]), []
+    wrapped = ExplainingCursor(cursor, explain_cursor, plans)
+    wrapped.execute("\n  SELECT * FROM StockPrice WHERE stock_name = %s", ('MSFT',))
+    wrapped.execute("DELETE FROM PortfolioTicker WHERE portfolio_id = %s", (1,))
+
+    assert explain_cursor.statements == [("EXPLAIN SELECT * FROM StockPrice WHERE stock_name = %s", ('MSFT',))]
+    assert len(cursor.statements) == 2
+    assert plans == [("SELECT * FROM StockPrice WHERE stock_name = %s", [{'table': 'StockPrice', 'type': 'ref'}])]
+    assert wrapped.fetchall() == [('MSFT', 1)]
+
+
+def test_full_scans_are_flagged():
+    plans = [
+        ("SELECT COUNT(*) FROM Portfolio", [{'table': 'Portfolio', 'type': 'index'}]),
+        ("SELECT stock_name FROM PortfolioTicker WHERE portfolio_id = %s", [{'table': 'PortfolioTicker', 'type': 'index'}]),
+        ("SELECT * FROM StockPrice sp WHERE sp.stock_name IN (SELECT ...)", [{'table': '<subquery2>', 'type': 'ALL'},
+                                                                               {'table': 'sp', 'type': 'ref'}]),
+        ("SELECT * FROM StockPrice", [{'table': 'StockPrice', 'type': 'ALL'}]),
+    ]
+    assert [(table, access_type) for _, table, access_type in full_scans(plans)] == [('PortfolioTicker', 'index'), ('StockPrice', 'ALL')]
+    assert [table for _, table, _ in full_scans(plans, allow=['StockPrice'])] == ['PortfolioTicker']
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.services.backtest_service import INDICATOR_PARAMS, BacktestManager
+from src.services.indicator_cache import IndicatorCache
+from tests.test_backtest_service import make_stock_data
+
+INDICATOR_COLUMNS = ['Daily_Return', 'Log_Return', 'MA_7', 'MA_30', 'Volatility', 'Volatility_MA_30', 'RSI',
+                     'EMA12', 'EMA26', 'MACD', 'MACD_signal', 'SMA20', 'Upper_Band', 'Lower_Band']
+
+
+def get_indicators(cache, stock_data):
+    return cache.get_indicators(stock_data, BacktestManager.add_indicators, BacktestManager.extend_indicators, INDICATOR_PARAMS)
+
+
+def test_unchanged_history_is_a_hit():
+    cache = IndicatorCache(max_bytes=64 * 1024 * 1024)
+    first = get_indicators(cache, make_stock_data('AAPL'))
+    second = get_indicators(cache, make_stock_data('AAPL'))
+
+    pd.testing.assert_frame_equal(first, second)
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_returned_frames_do_not_alias_the_cache():
+    cache = IndicatorCache(max_bytes=64 * 1024 * 1024)
+    indicator_data = get_indicators(cache, make_stock_data('AAPL'))
+    indicator_data['RSI'] = 0.0
+
+    assert not (get_indicators(cache, make_stock_data('AAPL'))['RSI'] == 0.0).all()
+
+
+@pytest.mark.parametrize('new_bars', [1, 5, 90])
+def test_new_bars_extend_the_cached_history(new_bars):
+    cache = IndicatorCache(max_bytes=64 * 1024 * 1024)
+    full_history = make_stock_data('AAPL', periods=300 + new_bars)
+    get_indicators(cache, full_history.iloc[:300].copy())
+    extended = get_indicators(cache, full_history.copy())
+
+    assert cache.stats()['extensions'] == 1
+    expected = BacktestManager.add_indicators(full_history.copy())
+    np.testing.assert_allclose(extended[INDICATOR_COLUMNS].to_numpy(), expected[INDICATOR_COLUMNS].to_numpy(), rtol=1e-9, atol=1e-12)
+    pd.testing.assert_index_equal(extended.index, full_history.index)
+
+
+def test_histories_from_different_starts_are_extended_separately():
+    cache = IndicatorCache(max_bytes=64 * 1024 * 1024)
+    full_history = make_stock_data('AAPL', periods=400)
+    # Two factor selections load the ticker from different warm-up starts, and both gain a bar
+    for start in [0, 100]:
+        get_indicators(cache, full_history.iloc[start:399].copy())
+    for start in [0, 100]:
+        get_indicators(cache, full_history.iloc[start:].copy())
+
+    assert cache.stats()['extensions'] == 2
+
+
+def test_changed_history_is_recomputed():
+    cache = IndicatorCache(max_bytes=64 * 1024 * 1024)
+    get_indicators(cache, make_stock_data('AAPL', periods=300, seed=0))
+    revised = make_stock_data('AAPL', periods=310, seed=1)
+    result = get_indicators(cache, revised)
+
+    assert cache.stats()['extensions'] == 0
+    pd.testing.assert_frame_equal(result, BacktestManager.add_indicators(revised.copy()))
+
+
+def test_least_recently_used_tickers_are_evicted_under_the_memory_cap():
+    single_entry = IndicatorCache(max_bytes=64 * 1024 * 1024)
+    get_indicators(single_entry, make_stock_data('AAPL'))
+    cache = IndicatorCache(max_bytes=int(single_entry.stats()['bytes'] * 2.5))
+
+    for ticker in ['AAPL', 'MSFT', 'AAPL', 'NVDA']:
+        get_indicators(cache, make_stock_data(ticker))
+    get_indicators(cache, make_stock_data('AAPL'))
+
+    stats = cache.stats()
+    assert stats['evictions'] == 1 and stats['entries'] == 2
+    assert stats['bytes'] <= stats['max_bytes']
+    assert stats['hits'] == 2
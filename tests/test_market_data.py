@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+
+from src.services import market_data
+from src.services.market_data import HISTORY_COLUMNS, LocalFileProvider, YFinanceProvider
+
+
+def make_history(start='2024-01-01', periods=10):
+    dates = pd.bdate_range(start, periods=periods, name='Date')
+    close = [100.0 + day for day in range(periods)]
+    return pd.DataFrame({'Open': close, 'High': close, 'Low': close, 'Close': close,
+                         'Volume': 1000, 'Dividends': 0.0, 'Stock Splits': 0.0}, index=dates)
+
+
+@pytest.mark.parametrize('file_format', ['parquet', 'csv'])
+def test_local_provider_round_trips_and_filters_the_range(tmp_path, file_format):
+    provider = LocalFileProvider(str(tmp_path))
+    provider.save('BRK.B', make_history(), file_format)
+
+    histories = provider.history(['BRK.B', 'NOPE'], '2024-01-03', '2024-01-10')
+    assert list(histories) == ['BRK.B', 'NOPE']
+    # end_date is exclusive
+    assert histories['BRK.B'].index.strftime('%Y-%m-%d').tolist() == ['2024-01-03', '2024-01-04', '2024-01-05', '2024-01-08', '2024-01-09']
+    assert list(histories['BRK.B'].columns) == HISTORY_COLUMNS
+    assert histories['NOPE'].empty
+
+
+def test_local_provider_strips_exchange_timezones(tmp_path):
+    provider = LocalFileProvider(str(tmp_path))
+    history = make_history()
+    history.index = history.index.tz_localize('America/New_York')
+    provider.save('MSFT', history, 'csv')
+    assert provider.history(['MSFT'], '2024-01-01', '2024-02-01')['MSFT'].index.equals(make_history().index)
+
+
+def test_yfinance_provider_downloads_a_batch_in_one_call(monkeypatch):
+    history = make_history(periods=3)
+    # A shared date index: NVDA has no bar on the first day, TSLA failed within the batch and AAPL is missing
+    nvda = history.copy()
+    nvda.iloc[0] = float('nan')
+    tsla = history * float('nan')
+    batch = pd.concat({'MSFT': history, 'NVDA': nvda, 'TSLA': tsla}, axis=1)
+    calls = []
+
+    def download(tickers, **kwargs):
+        calls.append(tickers)
+        return batch
+    monkeypatch.setattr(market_data.yf, 'download', download)
+
+    histories = YFinanceProvider().history(['MSFT', 'NVDA', 'TSLA', 'AAPL', 'MSFT'], '2024-01-01', '2024-01-10')
+    assert calls == [['MSFT', 'NVDA', 'TSLA', 'AAPL']]
+    assert len(histories['MSFT']) == 3 and len(histories['NVDA']) == 2
+    assert histories['NVDA']['Volume'].dtype == 'int64'
+    # Failed tickers are left out rather than passed off as having no bars
+    assert list(histories) == ['MSFT', 'NVDA']
+
+
+@pytest.mark.parametrize('received_through, expected, today', [
+    # Friday's bar downloaded on Monday: only the weekend is missing
+    ('2024-03-08', '2024-03-10', '2024-03-11'),
+    # Thursday's bar last: Friday came back empty and is asked for again
+    ('2024-03-07', '2024-03-07', '2024-03-11'),
+    # Friday's bar downloaded on Tuesday after Labor Day: the holiday has no bars either
+    ('2026-09-04', '2026-09-07', '2026-09-08'),
+])
+def test_only_weekends_and_holidays_without_bars_count_as_synced(received_through, expected, today):
+    today = pd.Timestamp(today).date()
+    assert market_data.synced_through(pd.Timestamp(received_through).date(), today) == pd.Timestamp(expected).date()
@@ -0,0 +1,139 @@
+import datetime
+
+import pandas as pd
+
+from src.database.connection import ConnectionPool
+from src.services import market_data_refresh
+from src.services.market_data_refresh import MarketDataRefresher
+from tests.conftest import FakeConnection, FakeCursor
+
+TODAY = datetime.date(2024, 3, 11)
+
+
+class Database:
+    def __init__(self, held, locked=False):
+        # (stock_name, synced_through, last stored transaction date)
+        self.held = held
+        self.locked = locked
+        self.queries = []
+
+    def respond(self, query, params):
+        self.queries.append((query, params))
+        if 'GET_LOCK' in query:
+            return [(0 if self.locked else 1,)]
+        if 'RELEASE_LOCK' in query:
+            return [(1,)]
+        return self.held
+
+
+class FakePortfolioManager:
+    def __init__(self, database, fail=(), left_out=(), bars_until=None):
+        self.pool = ConnectionPool(lambda: FakeConnection(FakeCursor(respond=database.respond)), size=2)
+        self.fail = fail
+        self.left_out = left_out
+        # Downloads silently return no bars on or after bars_until, as yfinance does on errors
+        self.bars_until = bars_until
+        self.downloads = []
+        self.batches = []
+        self.ingested = []
+
+    def get_stock_histories(self, stock_names, start_date, end_date):
+        self.batches.append(list(stock_names))
+        if set(stock_names) & set(self.fail):
+            raise ValueError("batch download failed")
+        return {stock_name: self.get_stock_data(stock_name, start_date, end_date) for stock_name in stock_names if stock_name not in self.left_out}
+
+    def get_stock_data(self, stock_name, start_date, end_date):
+        if stock_name in self.fail:
+            raise ValueError("download failed")
+        self.downloads.append((stock_name, start_date, end_date))
+        dates = pd.bdate_range(start_date, end_date, inclusive='left')
+        if self.bars_until:
+            dates = dates[dates < self.bars_until]
+        return pd.DataFrame({'Close': 1.0}, index=dates)
+
+    def ingest_price_history(self, histories, memberships=(), synced_through=None):
+        self.ingested.append(({stock_name: len(frame) for stock_name, frame in histories.items()}, synced_through))
+
+
+def test_due_tickers_start_after_their_watermark():
+    database = Database([
+        ('AAPL', datetime.date(2024, 3, 1), datetime.date(2024, 3, 1)),
+        ('MSFT', None, datetime.date(2024, 3, 7)),
+        ('NVDA', None, None),
+    ])
+    refresher = MarketDataRefresher(FakePortfolioManager(database))
+    assert refresher.due_tickers(TODAY) == [
+        ('AAPL', datetime.date(2024, 3, 2)),
+        ('MSFT', datetime.date(2024, 3, 8)),
+        ('NVDA', datetime.date(2020, 1, 1)),
+    ]
+    assert database.queries[0][1] == (datetime.date(2024, 3, 10),)
+
+
+def test_cycle_refreshes_each_ticker_once_and_survives_failures():
+    database = Database([('AAPL', datetime.date(2024, 3, 6), None), ('BAD', datetime.date(2024, 3, 6), None),
+                         ('MSFT', datetime.date(2024, 3, 8), None)])
+    portfolio_manager = FakePortfolioManager(database, fail=('BAD',))
+    refreshed, failed = MarketDataRefresher(portfolio_manager).run_cycle(TODAY)
+
+    assert refreshed == {'AAPL': 2, 'MSFT': 0} and list(failed) == ['BAD']
+    # Tickers due from the same date share a download; the failed batch was retried one ticker at a time
+    # MSFT is only missing a weekend, so nothing is downloaded for it
+    assert portfolio_manager.batches == [['AAPL', 'BAD']]
+    assert portfolio_manager.downloads == [('AAPL', '2024-03-07', '2024-03-11')]
+    # A weekend without bars still moves the watermark to yesterday
+    assert portfolio_manager.ingested == [({'AAPL': 2}, {'AAPL': datetime.date(2024, 3, 10)}),
+                                          ({}, {'MSFT': datetime.date(2024, 3, 10)})]
+    assert database.queries[-1][0] == 'SELECT RELEASE_LOCK(%s)'
+
+
+def test_missing_weekday_bars_do_not_advance_the_watermark_past_them():
+    database = Database([('AAPL', datetime.date(2024, 3, 1), None), ('MSFT', datetime.date(2024, 3, 6), None)])
+    # A failed download: bars stop on Wednesday 6 March, and none arrive for MSFT at all
+    portfolio_manager = FakePortfolioManager(database, bars_until='2024-03-07')
+    refreshed, failed = MarketDataRefresher(portfolio_manager).run_cycle(TODAY)
+
+    assert refreshed == {'AAPL': 3} and list(failed) == ['MSFT']
+    # AAPL is synced through its last bar, so Thursday and Friday are asked for again next cycle
+    assert portfolio_manager.ingested == [({'AAPL': 3}, {'AAPL': datetime.date(2024, 3, 6)})]
+
+
+def test_a_monday_holiday_is_synced_without_a_download():
+    database = Database([('AAPL', datetime.date(2026, 9, 6), None)])
+    portfolio_manager = FakePortfolioManager(database)
+    # Tuesday after Labor Day: only the holiday is missing
+    refreshed, failed = MarketDataRefresher(portfolio_manager).run_cycle(datetime.date(2026, 9, 8))
+
+    assert refreshed == {'AAPL': 0} and not failed
+    assert portfolio_manager.batches == [] and portfolio_manager.downloads == []
+    assert portfolio_manager.ingested == [({}, {'AAPL': datetime.date(2026, 9, 7)})]
+    # An empty download over the weekend and the holiday is not a failure either
+    refresher = MarketDataRefresher(portfolio_manager)
+    assert refresher.store_history('AAPL', pd.DataFrame(), datetime.date(2026, 9, 5), datetime.date(2026, 9, 8)) == 0
+
+
+def test_cycle_splits_large_batches(monkeypatch):
+    monkeypatch.setattr(market_data_refresh, 'MARKET_DATA_BATCH_SIZE', 2)
+    database = Database([(stock_name, datetime.date(2024, 3, 6), None) for stock_name in ['A', 'B', 'C', 'D', 'E']])
+    portfolio_manager = FakePortfolioManager(database)
+    refreshed, failed = MarketDataRefresher(portfolio_manager).run_cycle(TODAY)
+    assert portfolio_manager.batches == [['A', 'B'], ['C', 'D'], ['E']]
+    assert list(refreshed) == ['A', 'B', 'C', 'D', 'E'] and not failed
+
+
+def test_tickers_left_out_of_a_batch_are_retried_alone():
+    database = Database([('AAPL', datetime.date(2024, 3, 6), None), ('MSFT', datetime.date(2024, 3, 6), None)])
+    portfolio_manager = FakePortfolioManager(database, left_out=('MSFT',))
+    refreshed, failed = MarketDataRefresher(portfolio_manager).run_cycle(TODAY)
+
+    assert portfolio_manager.batches == [['AAPL', 'MSFT']]
+    assert portfolio_manager.downloads[-1] == ('MSFT', '2024-03-07', '2024-03-11')
+    assert refreshed == {'AAPL': 2, 'MSFT': 2} and not failed
+
+
+def test_cycle_is_skipped_while_another_worker_holds_the_lock():
+    database = Database([('AAPL', datetime.date(2024, 3, 6), None)], locked=True)
+    portfolio_manager = FakePortfolioManager(database)
+    assert MarketDataRefresher(portfolio_manager).run_cycle(TODAY) is None
+    assert portfolio_manager.downloads == [] and len(database.queries) == 1
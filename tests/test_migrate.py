@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from src.database.migrate import MIGRATION_CHECKS, MIGRATIONS_DIR, SCHEMA_PATH, initialize, migrate, migration_files, schema_statements, split_statements
+from tests.conftest import FakeConnection, FakeCursor
+
+
+class MigrationState:
+    """Answers SHOW TABLES, SchemaMigration reads and the migration checks from fixed state."""
+    def __init__(self, tables=(), applied=(), in_effect=()):
+        self.tables = tables
+        self.applied = applied
+        self.in_effect = in_effect
+
+    def respond(self, query, params):
+        if query == 'SHOW TABLES':
+            return [(table,) for table in self.tables]
+        if query.startswith('SELECT name FROM SchemaMigration'):
+            return [(name,) for name in self.applied]
+        return [(int(any(query == ' '.join(MIGRATION_CHECKS[name].split()) for name in self.in_effect)),)]
+
+
+def migration_cursor(**state):
+    return FakeCursor(respond=MigrationState(**state).respond)
+
+
+MIGRATION_NAMES = [file_name[:-len('.sql')] for file_name in migration_files()]
+
+
+def test_schema_no_longer_records_migrations_itself():
+    # Running schema.sql against an existing database must not mark migrations applied
+    with open(SCHEMA_PATH) as schema_file:
+        assert 'SchemaMigration' not in schema_file.read()
+    assert set(MIGRATION_CHECKS) == set(MIGRATION_NAMES)
+
+
+def test_init_creates_the_schema_and_records_every_migration():
+    cursor = migration_cursor()
+    initialize(FakeConnection(cursor))
+    assert cursor.queries[1:1 + len(schema_statements())] == [' '.join(statement.split()) for statement in schema_statements()]
+    assert cursor.statements[-1] == ("INSERT INTO SchemaMigration (name, applied_at) VALUES (%s, NOW())", [(name,) for name in MIGRATION_NAMES])
+
+
+def test_init_refuses_a_database_with_tables():
+    cursor = migration_cursor(tables=['Portfolio', 'StockData', 'User'])
+    with pytest.raises(RuntimeError, match='Portfolio, StockData, User'):
+        initialize(FakeConnection(cursor))
+    assert cursor.queries == ['SHOW TABLES']
+
+
+def test_migrate_refuses_migrations_recorded_but_not_in_effect():
+    # An old database that schema.sql marked as migrated: StockData is still there and data_version is missing
+    cursor = migration_cursor(applied=MIGRATION_NAMES, in_effect=['002_hot_query_indexes', '003_ticker_sync'])
+    with pytest.raises(RuntimeError, match="'001_shared_price_store', '004_portfolio_data_version'"):
+        migrate(FakeConnection(cursor))
+
+
+def test_split_statements_drops_comments():
+    statements = split_statements("-- a comment; with a semicolon\nCREATE TABLE A (x INT);\n\n-- another\nDROP TABLE B;\n")
+    assert statements == ['CREATE TABLE A (x INT)', 'DROP TABLE B']
+
+
+def test_migrations_parse():
+    for file_name in migration_files():
+        with open(os.path.join(MIGRATIONS_DIR, file_name)) as migration_file:
+            assert split_statements(migration_file.read())
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.services import monte_carlo
+from src.services.backtest_service import SIGNAL_FACTORS, BacktestManager
+from tests.test_backtest_service import make_stock_data, manager
+
+INDICATOR_COLUMNS = ['Daily_Return', 'Log_Return', 'MA_7', 'MA_30', 'Volatility', 'Volatility_MA_30', 'RSI',
+                     'EMA12', 'EMA26', 'MACD', 'MACD_signal', 'Upper_Band', 'Lower_Band']
+
+
+def make_portfolio():
+    frames = [make_stock_data(ticker, periods=260, seed=seed) for seed, ticker in enumerate(['AAPL', 'MSFT', 'NVDA'])]
+    return frames, pd.concat(frames, ignore_index=True)
+
+
+def test_path_indicators_match_the_pandas_indicators():
+    stock_data = make_stock_data(periods=260)
+    expected = BacktestManager.add_indicators(stock_data.copy())
+    indicators = monte_carlo.path_indicators(stock_data['closing_price'].to_numpy(dtype=float)[:, None, None], SIGNAL_FACTORS)
+
+    for column in INDICATOR_COLUMNS:
+        np.testing.assert_allclose(indicators[column][:, 0, 0], expected[column].to_numpy(), rtol=1e-7, atol=1e-9, err_msg=column)
+
+
+def test_simulate_paths_replays_the_historical_path(manager, monkeypatch):
+    frames, sim_data = make_portfolio()
+    monkeypatch.setattr(manager, 'get_simulation_data', lambda portfolio_name, *date_range: ([frame.copy() for frame in frames], sim_data))
+    result = manager.simulate_trading('Tech', selected_factors=SIGNAL_FACTORS)
+
+    panel = manager.build_price_panel(sim_data)
+    close = panel.close[:, None, :]
+    votes = manager.factor_votes(monte_carlo.path_indicators(close, SIGNAL_FACTORS), SIGNAL_FACTORS)
+    _, _, buy_signal, sell_signal = manager.tally_votes(votes, SIGNAL_FACTORS, close.shape)
+    values = monte_carlo.simulate_paths(close, buy_signal, sell_signal, 10000.00)
+
+    np.testing.assert_allclose(values[:, 0], result.daily_values, rtol=1e-9)
+
+
+def test_block_bootstrap_draws_whole_dates_in_blocks():
+    log_returns = np.arange(100, dtype=float)[:, None] * np.array([1.0, -1.0])
+    resampled = monte_carlo.block_bootstrap(log_returns, n_paths=4, block_size=10, rng=np.random.default_rng(0))
+
+    assert resampled.shape == (100, 4, 2)
+    np.testing.assert_array_equal(resampled[:, :, 1], -resampled[:, :, 0])
+    blocks = resampled[:, :, 0].reshape(10, 10, 4)
+    assert (np.diff(blocks, axis=1) == 1).all()
+
+
+@pytest.mark.parametrize('max_bytes', [1, 2 ** 40])
+def test_robustness_test_is_reproducible_and_chunk_independent(manager, monkeypatch, max_bytes):
+    frames, sim_data = make_portfolio()
+    monkeypatch.setattr(manager, 'get_simulation_data', lambda portfolio_name, *date_range: ([frame.copy() for frame in frames], sim_data))
+    expected = manager.robustness_test('Tech', n_paths=12, selected_factors=SIGNAL_FACTORS, seed=7)
+    paths = manager.robustness_test('Tech', n_paths=12, selected_factors=SIGNAL_FACTORS, seed=7, max_bytes=max_bytes)
+
+    assert list(paths.columns) == ['Final Portfolio Value', 'Sharpe Ratio', 'Max Drawdown']
+    assert len(paths) == 12 and paths['Final Portfolio Value'].nunique() > 1
+    assert (paths['Max Drawdown'] <= 0).all()
+    pd.testing.assert_frame_equal(paths, expected)
+
+
+@pytest.mark.parametrize('selected_factors', [['Relative Strength Index (RSI)'], ['Moving Average', 'Bollinger Bands']])
+def test_robustness_test_runs_without_return_based_factors(manager, monkeypatch, selected_factors):
+    frames, sim_data = make_portfolio()
+    monkeypatch.setattr(manager, 'get_simulation_data', lambda portfolio_name, *date_range: ([frame.copy() for frame in frames], sim_data))
+    paths = manager.robustness_test('Tech', n_paths=10, selected_factors=selected_factors, seed=3)
+
+    assert len(paths) == 10 and paths['Final Portfolio Value'].notna().all()
@@ -0,0 +1,185 @@
+import datetime
+
+import mysql.connector
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.services import portfolio_service
+from src.services.portfolio_service import PortfolioManager
+from tests.conftest import FakeCursor, fake_pool
+
+
+def make_manager(cursor=None):
+    # Skip __init__ so no database connection is opened
+    manager = PortfolioManager.__new__(PortfolioManager)
+    manager.pool, connection = fake_pool(cursor)
+    manager.user_id = 1
+    return manager, connection
+
+
+def make_history(periods=250, seed=0):
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, periods)))
+    return pd.DataFrame({
+        'Open': closes, 'High': closes * 1.01, 'Low': closes * 0.99, 'Close': closes,
+        'Volume': rng.integers(1000, 5000, periods), 'Dividends': 0.0, 'Stock Splits': 0.0,
+    }, index=pd.bdate_range('2022-01-03', periods=periods, tz='America/New_York', name='Date'))
+
+
+def test_price_rows_match_iterrows():
+    history = make_history()
+    expected = [('MSFT', index.date(), row['Open'], row['High'], row['Low'], row['Close'], row['Volume'], row['Dividends'], row['Stock Splits'])
+                for index, row in history.iterrows()]
+    assert PortfolioManager.price_rows('MSFT', history) == expected
+    assert PortfolioManager.price_rows('MSFT', history.drop(columns='Stock Splits'))[0][-1] == 0
+
+
+def test_ingestion_batches_rows_in_one_transaction(monkeypatch):
+    monkeypatch.setattr(portfolio_service, 'INGEST_BATCH_ROWS', 100)
+    manager, connection = make_manager()
+    manager.ingest_price_history({'MSFT': make_history(250), 'AAPL': make_history(30, seed=1)}, [(7, 'MSFT'), (7, 'AAPL')])
+
+    inserts = [params for query, params in connection.fake_cursor.statements if query.startswith('INSERT INTO StockPrice')]
+    assert [len(rows) for rows in inserts] == [100, 100, 50, 30]
+    assert inserts[0][0][:2] == ('MSFT', datetime.date(2022, 1, 3))
+    memberships = [params for query, params in connection.fake_cursor.statements if query.startswith('INSERT INTO PortfolioTicker')]
+    assert memberships == [[(7, 'MSFT'), (7, 'AAPL')]]
+    # The portfolio gaining tickers, and every portfolio holding them, get a new data version
+    bumps = [params for query, params in connection.fake_cursor.statements if query.startswith('UPDATE Portfolio')]
+    assert bumps == [[(7,)], ('MSFT', 'AAPL')]
+    assert connection.commits == 1
+    # The committed histories are read back into the price cache
+    assert connection.fake_cursor.statements[-1][0].startswith('SELECT sp.stock_name') and connection.fake_cursor.statements[-1][1] == ('MSFT', 'AAPL')
+
+
+def test_ingestion_rolls_back_on_failure():
+    manager, connection = make_manager(FakeCursor(fail_on='PortfolioTicker'))
+    with pytest.raises(mysql.connector.Error):
+        manager.ingest_price_history({'MSFT': make_history()}, [(7, 'MSFT')])
+    assert connection.commits == 0 and connection.rollbacks == 1
+
+
+def stub_lookups(manager, monkeypatch, downloads):
+    monkeypatch.setattr(manager, 'get_portfolio_id', lambda portfolio_name: 7)
+    monkeypatch.setattr(manager, 'fetch_all_stocks', lambda portfolio_id: [])
+
+    def get_stock_data(stock_symbol, start_date="2020-01-01", end_date=None):
+        downloads.append(start_date)
+        history = make_history()
+        return history[history.index.strftime('%Y-%m-%d') >= start_date]
+    monkeypatch.setattr(manager, 'get_stock_data', get_stock_data)
+
+
+def test_add_stock_reports_failed_ingestion(monkeypatch):
+    manager, connection = make_manager(FakeCursor(fail_on='INSERT INTO StockPrice'))
+    stub_lookups(manager, monkeypatch, [])
+
+    success, message = manager.add_stock_to_portfolio('Tech', 'MSFT')
+    assert not success and 'MSFT' in message
+    assert connection.rollbacks == 1
+
+
+def test_add_stock_held_elsewhere_downloads_only_new_bars(monkeypatch):
+    manager, connection = make_manager(FakeCursor(results=[[('MSFT', datetime.date(2022, 12, 1))]]))
+    downloads = []
+    stub_lookups(manager, monkeypatch, downloads)
+
+    success, _ = manager.add_stock_to_portfolio('Tech', 'MSFT')
+    assert success and downloads == ['2022-12-02']
+    inserts = [params for query, params in connection.fake_cursor.statements if query.startswith('INSERT INTO StockPrice')]
+    assert [len(rows) for rows in inserts] == [11]
+    memberships = [params for query, params in connection.fake_cursor.statements if query.startswith('INSERT INTO PortfolioTicker')]
+    assert memberships == [[(7, 'MSFT')]]
+    watermarks = [params for query, params in connection.fake_cursor.statements if query.startswith('INSERT INTO TickerSync')]
+    # The stubbed download stops short of today, so MSFT is synced only through its last bar
+    assert watermarks == [[('MSFT', datetime.date(2022, 12, 16))]]
+
+
+def test_add_new_stock_reuses_the_history_download_as_validation(monkeypatch):
+    manager, connection = make_manager()
+    downloads = []
+    stub_lookups(manager, monkeypatch, downloads)
+
+    success, _ = manager.add_stock_to_portfolio('Tech', 'MSFT')
+    assert success and downloads == ['2020-01-01']
+    inserts = [params for query, params in connection.fake_cursor.statements if query.startswith('INSERT INTO StockPrice')]
+    assert [len(rows) for rows in inserts] == [len(make_history())]
+
+
+def test_add_unknown_stock_is_rejected_without_writes(monkeypatch):
+    manager, connection = make_manager()
+    stub_lookups(manager, monkeypatch, [])
+    monkeypatch.setattr(manager, 'get_stock_data', lambda stock_symbol, *args: make_history().iloc[:0])
+
+    assert manager.add_stock_to_portfolio('Tech', 'NOPE') == (False, "Invalid stock: 'NOPE'.")
+    assert connection.commits == 0
+    assert not any(query.startswith('INSERT') for query, params in connection.fake_cursor.statements)
+
+
+def test_bulk_add_downloads_concurrently_and_writes_once(monkeypatch):
+    manager, connection = make_manager(FakeCursor(results=[[('AAPL', datetime.date(2022, 12, 1))]]))
+    downloads = []
+    stub_lookups(manager, monkeypatch, downloads)
+    monkeypatch.setattr(manager, 'fetch_all_stocks', lambda portfolio_id: ['NVDA'])
+    get_stock_data = manager.get_stock_data
+    monkeypatch.setattr(manager, 'get_stock_data', lambda stock_symbol, *date_range: make_history().iloc[:0] if stock_symbol == 'NOPE' else get_stock_data(stock_symbol, *date_range))
+    progress = []
+
+    results = manager.add_stocks_to_portfolio('Tech', ['MSFT', 'NOPE', 'NVDA', 'AAPL', 'MSFT'], lambda *step: progress.append(step))
+    assert list(results) == ['MSFT', 'NOPE', 'NVDA', 'AAPL']
+    assert [success for success, _ in results.values()] == [True, False, False, True]
+    assert results['NOPE'][1] == "Invalid stock: 'NOPE'." and 'already' in results['NVDA'][1]
+    # MSFT in full, AAPL from the day after its last stored bar; NOPE was not recorded by the stub
+    assert sorted(downloads) == ['2020-01-01', '2022-12-02']
+    assert sorted(stock_symbol for stock_symbol, _, _ in progress) == ['AAPL', 'MSFT', 'NOPE'] and progress[-1][1:] == (3, 3)
+
+    memberships = [params for query, params in connection.fake_cursor.statements if query.startswith('INSERT INTO PortfolioTicker')]
+    assert memberships == [[(7, 'MSFT'), (7, 'AAPL')]]
+    assert connection.commits == 1
+
+
+def test_bulk_add_reports_a_failed_write_for_every_ticker(monkeypatch):
+    manager, connection = make_manager(FakeCursor(fail_on='INSERT INTO StockPrice'))
+    stub_lookups(manager, monkeypatch, [])
+    results = manager.add_stocks_to_portfolio('Tech', ['MSFT', 'AAPL'])
+    assert all(not success and stock_symbol in message for stock_symbol, (success, message) in results.items())
+    assert connection.rollbacks == 1
+
+
+def test_remove_stocks_deletes_only_the_memberships_in_one_statement(monkeypatch):
+    manager, connection = make_manager(FakeCursor(results=[[('AAPL',), ('MSFT',)], []]))
+    monkeypatch.setattr(manager, 'get_portfolio_id', lambda portfolio_name: 7)
+    results = manager.remove_stocks_from_portfolio('Tech', ['MSFT', 'NVDA', 'AAPL'])
+    assert [success for success, _ in results.values()] == [True, False, True]
+    assert [(query.split(' WHERE')[0], params) for query, params in connection.fake_cursor.statements] == [
+        ('SELECT stock_name FROM PortfolioTicker', (7, 'MSFT', 'NVDA', 'AAPL')),
+        ('DELETE FROM PortfolioTicker', (7, 'AAPL', 'MSFT')),
+        ('UPDATE Portfolio SET data_version = data_version + 1', (7,)),
+    ]
+    assert connection.commits == 1
+
+    assert not manager.remove_stock_from_portfolio('Tech', 'MSFT')[0]
+
+
+def test_create_portfolio_with_stocks_is_one_unit_of_work(monkeypatch):
+    # No portfolio of that name yet, and no stored prices
+    manager, connection = make_manager(FakeCursor(results=[[(0,)], []]))
+    connection.fake_cursor.lastrowid = 9
+    stub_lookups(manager, monkeypatch, [])
+    monkeypatch.setattr(manager, 'get_stock_data', lambda stock_symbol, *date_range: make_history().iloc[:0] if stock_symbol == 'NOPE' else make_history())
+
+    success, _, results = manager.create_portfolio_with_stocks('Tech', 'Large caps', ['MSFT', 'NOPE', 'AAPL'])
+    assert success and [success for success, _ in results.values()] == [True, False, True]
+    memberships = [params for query, params in connection.fake_cursor.statements if query.startswith('INSERT INTO PortfolioTicker')]
+    assert memberships == [[(9, 'MSFT'), (9, 'AAPL')]]
+    assert connection.commits == 1
+
+
+def test_failed_create_leaves_no_partial_portfolio(monkeypatch):
+    manager, connection = make_manager(FakeCursor(fail_on='INSERT INTO PortfolioTicker', results=[[(0,)], []]))
+    stub_lookups(manager, monkeypatch, [])
+
+    success, message, results = manager.create_portfolio_with_stocks('Tech', None, ['MSFT'])
+    assert not success and 'Tech' in message and results == {}
+    assert connection.commits == 0 and connection.rollbacks == 1
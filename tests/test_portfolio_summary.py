@@ -0,0 +1,59 @@
+import datetime
+
+from src.services.portfolio_summary import PortfolioSummaryCache, build_summaries, portfolio_summaries
+from tests.conftest import FakeCursor
+from tests.test_portfolio_service import make_history, make_manager
+
+JAN_2, JAN_3, MAR_1 = datetime.date(2024, 1, 2), datetime.date(2024, 1, 3), datetime.date(2024, 3, 1)
+
+SUMMARY_ROWS = [
+    (1, 'Tech', datetime.datetime(2024, 1, 1), 'Large caps', 4, 'AAPL', JAN_3, MAR_1, 180.5),
+    (1, 'Tech', datetime.datetime(2024, 1, 1), 'Large caps', 4, 'MSFT', JAN_2, datetime.date(2024, 2, 1), 410.0),
+    (2, 'Empty', datetime.datetime(2024, 2, 1), None, 0, None, None, None, None),
+]
+
+
+def test_build_summaries_collects_tickers_range_and_closes():
+    tech, empty = build_summaries(SUMMARY_ROWS)
+    assert (tech.portfolio_name, tech.data_version, tech.stocks, tech.stock_count) == ('Tech', 4, ['AAPL', 'MSFT'], 2)
+    assert (tech.first_date, tech.last_date) == (JAN_2, MAR_1)
+    assert tech.latest_closes == {'AAPL': 180.5, 'MSFT': 410.0}
+    assert (empty.portfolio_name, empty.stocks, empty.first_date) == ('Empty', [], None)
+
+
+def test_summaries_cost_one_query_until_a_write():
+    manager, connection = make_manager(FakeCursor(results=[SUMMARY_ROWS, SUMMARY_ROWS]))
+    assert manager.fetch_portfolio_names() == ['Tech', 'Empty']
+    assert manager.fetch_all_portfolios()[0] == ('Tech', datetime.datetime(2024, 1, 1), ['AAPL', 'MSFT'], 'Large caps')
+    assert len(connection.fake_cursor.statements) == 1
+
+    manager.ingest_price_history({}, [(1, 'NVDA')])
+    manager.fetch_portfolio_summaries()
+    assert [query.split()[0] for query, params in connection.fake_cursor.statements] == ['SELECT', 'INSERT', 'UPDATE', 'SELECT']
+
+
+def test_writes_drop_the_users_summaries(monkeypatch):
+    manager, connection = make_manager(FakeCursor(results=[[('AAPL',)]]))
+    monkeypatch.setattr(manager, 'get_portfolio_id', lambda portfolio_name: 1)
+    for write in [lambda: manager.remove_stock_from_portfolio('Tech', 'AAPL'), lambda: manager.remove_portfolio('Tech')]:
+        portfolio_summaries.put(manager.user_id, build_summaries(SUMMARY_ROWS))
+        assert write()[0]
+        assert portfolio_summaries.get(manager.user_id) is None
+
+
+def test_new_prices_drop_the_summaries_of_every_holder():
+    portfolio_summaries.put('holder', build_summaries(SUMMARY_ROWS))
+    portfolio_summaries.put('other', build_summaries(SUMMARY_ROWS[2:]))
+    manager, _ = make_manager()
+    manager.ingest_price_history({'MSFT': make_history()})
+    assert portfolio_summaries.get('holder') is None and portfolio_summaries.get('other') is not None
+
+
+def test_summaries_expire_after_the_ttl(monkeypatch):
+    cache = PortfolioSummaryCache(1024 * 1024, ttl=60)
+    clock = [1000.0]
+    monkeypatch.setattr('src.services.portfolio_summary.time.monotonic', lambda: clock[0])
+    cache.put(1, [])
+    assert cache.get(1) == []
+    clock[0] += 61
+    assert cache.get(1) is None
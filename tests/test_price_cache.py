@@ -0,0 +1,48 @@
+import datetime
+from decimal import Decimal
+
+import numpy as np
+
+from src.services.price_cache import BAR_DTYPE, PriceCache, decode_rows, history_frames
+
+
+def raw_rows(stock_name, start, closes):
+    # Rows as a raw cursor returns them, names as bytearray the way the pure-Python connector does
+    return [(bytearray(stock_name.encode()), str(start + datetime.timedelta(days=i)).encode(), str(close).encode(), str(close).encode(),
+             str(close).encode(), str(close).encode(), b'1500', b'0.00', b'0') for i, close in enumerate(closes)]
+
+
+def test_decode_rows_matches_decimal_values():
+    closes = [Decimal('101.25'), Decimal('99.10'), Decimal('0.01')]
+    histories = decode_rows(raw_rows('BRK-B', datetime.date(2023, 5, 1), closes) + raw_rows('MSFT', datetime.date(2023, 5, 2), closes[:1]))
+
+    assert list(histories) == ['BRK-B', 'MSFT']
+    bars = histories['BRK-B']
+    assert bars.dtype == BAR_DTYPE
+    assert bars['closing_price'].tolist() == [float(close) for close in closes]
+    assert bars['transaction_date'].tolist() == [datetime.date(2023, 5, 1), datetime.date(2023, 5, 2), datetime.date(2023, 5, 3)]
+    assert bars['volume'].dtype == np.int64 and bars['volume'][0] == 1500
+    assert len(histories['MSFT']) == 1 and decode_rows([]) == {}
+
+
+def test_cached_history_is_used_only_while_current(tmp_path):
+    cache = PriceCache(str(tmp_path))
+    bars = decode_rows(raw_rows('^GSPC', datetime.date(2023, 5, 1), [1.0, 2.0]))['^GSPC']
+    cache.store('^GSPC', bars)
+
+    assert cache.load('^GSPC', datetime.date(2023, 5, 2))['closing_price'].tolist() == [1.0, 2.0]
+    assert cache.load('^GSPC', datetime.date(2023, 5, 3)) is None
+    cache.invalidate(['^GSPC'])
+    assert cache.load('^GSPC', datetime.date(2023, 5, 2)) is None
+    assert PriceCache('').load('^GSPC', datetime.date(2023, 5, 2)) is None
+
+
+def test_history_frames_slice_each_ticker_to_the_range():
+    histories = decode_rows(raw_rows('AAA', datetime.date(2023, 5, 1), [1.0, 2.0, 3.0]) + raw_rows('BBB', datetime.date(2023, 5, 4), [4.0]))
+    frame, frames = history_frames(histories, datetime.date(2023, 5, 2), datetime.date(2023, 5, 3))
+    assert frame['closing_price'].tolist() == [2.0, 3.0] and len(frames) == 1
+    assert frames[0]['stock_name'].tolist() == ['AAA', 'AAA']
+
+    frame, frames = history_frames(histories)
+    assert [len(ticker_frame) for ticker_frame in frames] == [3, 1] and len(frame) == 4
+    assert list(frame.columns) == ['stock_name'] + list(BAR_DTYPE.names)
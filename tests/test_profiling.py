@@ -0,0 +1,58 @@
+import time
+
+import pytest
+
+from src.services.backtest_service import SIGNAL_FACTORS, BacktestManager
+from src.utils.profiling import SimulationProfiler
+from tests.test_backtest_service import make_stock_data
+
+
+def busy_wait(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_stages_accumulate_and_exclude_consumer_time():
+    profiler = SimulationProfiler(sample_interval=0.001)
+    with profiler:
+        for _ in range(2):
+            with profiler.stage("work"):
+                busy_wait(0.02)
+
+        def producer():
+            for _ in range(3):
+                busy_wait(0.01)
+                yield
+        for _ in profiler.timed_iter("produce", producer()):
+            busy_wait(0.03)
+
+    assert profiler.stage_seconds["work"] == pytest.approx(0.04, abs=0.015)
+    assert profiler.stage_seconds["produce"] == pytest.approx(0.03, abs=0.015)
+    breakdown = profiler.breakdown().set_index('Stage')
+    assert list(breakdown.index) == ["work", "produce", "Other"]
+    assert breakdown['Seconds'].sum() == pytest.approx(profiler.wall_seconds)
+
+
+def test_sampled_stacks_are_collapsed():
+    with SimulationProfiler(sample_interval=0.001) as profiler:
+        busy_wait(0.1)
+    assert profiler.samples > 0
+    lines = profiler.collapsed_stacks().splitlines()
+    stack, count = lines[0].rsplit(' ', 1)
+    assert int(count) > 0
+    assert stack.split(';')[-1].startswith('busy_wait (test_profiling.py')
+    assert profiler.top_functions()['Function'].iloc[0].startswith('busy_wait')
+
+
+def test_simulation_stages_are_recorded():
+    manager = BacktestManager.__new__(BacktestManager)
+    historical_data_list = [make_stock_data('AAA', seed=1), make_stock_data('BBB', seed=2)]
+    manager.get_simulation_data = lambda portfolio_name, *date_range: (historical_data_list, None)
+    unprofiled = manager.simulate_trading('Test', 10000.00, None, None, SIGNAL_FACTORS)
+
+    manager.profiler = SimulationProfiler()
+    with manager.profiler:
+        result = manager.simulate_trading('Test', 10000.00, None, None, SIGNAL_FACTORS)
+    assert list(manager.profiler.stage_seconds) == ["Generate signals", "Build trading panel", "Trading loop", "Performance metrics"]
+    assert result.final_portfolio_value == unprofiled.final_portfolio_value